@@ -0,0 +1,69 @@
+"""
+Activity logging for the admin panel
+"""
+from .models import SystemLog
+from .log_writer import system_log_writer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_actor_display(user):
+    """Return the name shown for the acting user in activity feeds"""
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return 'System'
+    return (user.get_full_name() or user.username)[:150]
+
+
+def activity_entry(activity_type, message, request=None, user=None, level='INFO', category='SYSTEM', **fields):
+    """
+    Build an unsaved, classified SystemLog entry
+
+    Callers that write many entries in their own transaction (e.g. bulk
+    imports) bulk_create these; everything else goes through log_activity.
+    Takes the same arguments as log_activity.
+    """
+    if request is not None:
+        if user is None:
+            user = request.user
+        fields.setdefault('ip_address', request.META.get('REMOTE_ADDR'))
+        fields.setdefault('request_path', request.path)
+        fields.setdefault('request_method', request.method)
+
+    if user is not None and not user.is_authenticated:
+        user = None
+
+    return SystemLog(
+        activity_type=activity_type,
+        message=message,
+        level=level,
+        category=category,
+        user=user,
+        actor_display=get_actor_display(user),
+        **fields
+    )
+
+
+def log_activity(activity_type, message, request=None, user=None, level='INFO', category='SYSTEM', **fields):
+    """
+    Record a classified SystemLog entry
+
+    The entry is handed to the buffered SystemLog writer, so it is inserted
+    in a batch shortly afterwards (immediately for CRITICAL entries).
+
+    Args:
+        activity_type: One of SystemLog.ACTIVITY_TYPES
+        message: Human-readable log message
+        request: Request the activity happened in (optional); supplies the
+            acting user, IP address, path and method
+        user: Acting user when there is no request (optional)
+        level: Log level
+        category: Log category
+        **fields: Any other SystemLog fields (e.g. extra_data)
+
+    Returns:
+        SystemLog: The (possibly not yet saved) log entry
+    """
+    entry = activity_entry(activity_type, message, request=request, user=user, level=level, category=category, **fields)
+    system_log_writer.write(entry)
+    return entry
@@ -0,0 +1,226 @@
+"""
+Fan-out of SystemAnnouncements into communications.Notification rows
+
+Recipients are resolved with one set-based query per target role (plus one
+for explicitly targeted users), streamed as ids and turned into
+notifications with chunked bulk_create. Deliveries run in the
+send_announcements worker (or a background thread when
+SYSTEM_ANNOUNCEMENT_RUN_IN_PROCESS is set), never on the request thread.
+
+Every progress write stamps updated_at, so an announcement left SENDING
+with no progress for SYSTEM_ANNOUNCEMENT_STALE_AFTER seconds belonged to a
+worker that died; the queue claims it again and the delivery resumes.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from communications import counters
+from communications.models import Notification
+
+from .activity import log_activity
+from .models import SystemAnnouncement
+
+logger = logging.getLogger(__name__)
+
+ALL_USERS = 'ALL'
+PRIORITY_NOTIFICATION_TYPES = {
+    'LOW': 'INFO',
+    'MEDIUM': 'INFO',
+    'HIGH': 'WARNING',
+    'URGENT': 'WARNING',
+}
+
+
+def chunk_size():
+    return getattr(settings, 'SYSTEM_ANNOUNCEMENT_CHUNK_SIZE', 2000)
+
+
+def stale_after():
+    return getattr(settings, 'SYSTEM_ANNOUNCEMENT_STALE_AFTER', 600)
+
+
+def role_queryset(role):
+    """
+    Active users holding a role, either as their profile role or through a
+    current RBAC role assignment
+    """
+    now = timezone.now()
+    assigned = (
+        Q(role_assignments__role__name__iexact=role)
+        & Q(role_assignments__is_active=True)
+        & Q(role_assignments__start_date__lte=now)
+        & (Q(role_assignments__end_date__isnull=True) | Q(role_assignments__end_date__gt=now))
+    )
+    return User.objects.filter(is_active=True).filter(Q(profile__role__iexact=role) | assigned)
+
+
+def recipient_querysets(announcement):
+    """One id queryset per target (role or explicit users); everyone when untargeted"""
+    roles = [str(role).strip() for role in announcement.target_roles or [] if str(role).strip()]
+    has_users = announcement.target_users.exists()
+    if any(role.upper() == ALL_USERS for role in roles) or (not roles and not has_users):
+        return [User.objects.filter(is_active=True)]
+
+    querysets = [role_queryset(role) for role in roles]
+    if has_users:
+        querysets.append(User.objects.filter(is_active=True, pk__in=announcement.target_users.values('pk')))
+    return querysets
+
+
+def iter_recipient_ids(announcement):
+    """Stream the distinct ids of every recipient"""
+    seen = set()
+    for queryset in recipient_querysets(announcement):
+        ids = queryset.order_by().values_list('id', flat=True).distinct()
+        for user_id in ids.iterator(chunk_size=chunk_size()):
+            if user_id not in seen:
+                seen.add(user_id)
+                yield user_id
+
+
+def delivered_recipient_ids(announcement):
+    """Recipients who already have this announcement (when resuming a delivery)"""
+    return set(
+        Notification.objects.filter(
+            related_object_type=ContentType.objects.get_for_model(SystemAnnouncement),
+            related_object_id=announcement.pk,
+        ).values_list('recipient_id', flat=True)
+    )
+
+
+def build_notification(announcement, recipient_id, content_type):
+    return Notification(
+        recipient_id=recipient_id,
+        title=announcement.title,
+        message=announcement.message,
+        notification_type=PRIORITY_NOTIFICATION_TYPES.get(announcement.priority, 'INFO'),
+        category='SYSTEM',
+        sender_id=announcement.created_by_id,
+        related_object_type=content_type,
+        related_object_id=announcement.pk,
+        expires_at=announcement.expires_at,
+    )
+
+
+def create_notifications(batch, size):
+    """Insert a chunk of notifications and bump their recipients' unread counters"""
+    with transaction.atomic():
+        Notification.objects.bulk_create(batch, batch_size=size)
+        counters.increment_many([notification.recipient_id for notification in batch], 'notifications')
+
+
+def _save_progress(announcement, *fields):
+    announcement.updated_at = timezone.now()
+    SystemAnnouncement.objects.filter(pk=announcement.pk).update(
+        **{field: getattr(announcement, field) for field in (*fields, 'updated_at')}
+    )
+
+
+def deliver_announcement(announcement):
+    """
+    Create a notification for every recipient of the announcement
+
+    Safe to re-run after a failure: recipients who already have the
+    notification are skipped.
+
+    Returns:
+        SystemAnnouncement: The announcement, SENT or FAILED
+    """
+    if announcement.expires_at and announcement.expires_at <= timezone.now():
+        announcement.delivery_status = 'FAILED'
+        announcement.delivery_error = 'Announcement expired before it was delivered'
+        _save_progress(announcement, 'delivery_status', 'delivery_error')
+        return announcement
+
+    started = time.monotonic()
+    announcement.delivery_status = 'SENDING'
+    announcement.delivery_started_at = timezone.now()
+    announcement.delivery_error = ''
+    _save_progress(announcement, 'delivery_status', 'delivery_started_at', 'delivery_error')
+
+    content_type = ContentType.objects.get_for_model(SystemAnnouncement)
+    size = chunk_size()
+    try:
+        already_delivered = delivered_recipient_ids(announcement)
+        announcement.recipients_total = len(already_delivered)
+        announcement.recipients_delivered = len(already_delivered)
+        batch = []
+        for recipient_id in iter_recipient_ids(announcement):
+            if recipient_id in already_delivered:
+                continue
+            announcement.recipients_total += 1
+            batch.append(build_notification(announcement, recipient_id, content_type))
+            if len(batch) >= size:
+                create_notifications(batch, size)
+                announcement.recipients_delivered += len(batch)
+                batch = []
+                _save_progress(announcement, 'recipients_total', 'recipients_delivered')
+        if batch:
+            create_notifications(batch, size)
+            announcement.recipients_delivered += len(batch)
+    except Exception as e:
+        logger.error(f"Announcement {announcement.pk} delivery failed: {str(e)}")
+        announcement.delivery_status = 'FAILED'
+        announcement.delivery_error = str(e)
+        _save_progress(announcement, 'delivery_status', 'delivery_error', 'recipients_total', 'recipients_delivered')
+        return announcement
+
+    announcement.delivery_status = 'SENT'
+    announcement.delivered_at = timezone.now()
+    _save_progress(announcement, 'delivery_status', 'delivered_at', 'recipients_total', 'recipients_delivered')
+
+    seconds = time.monotonic() - started
+    log_activity(
+        'announcement_sent',
+        f'Announcement delivered: {announcement.title} ({announcement.recipients_delivered} recipients)',
+        user=announcement.created_by,
+        category='SYSTEM',
+        execution_time=seconds,
+        extra_data={'announcement_id': announcement.pk, 'recipients': announcement.recipients_delivered},
+    )
+    return announcement
+
+
+def claim_due_announcement():
+    """
+    Atomically take the oldest queued announcement that is due, or one whose
+    delivery stalled (see stale_after), or None
+    """
+    now = timezone.now()
+    due = Q(delivery_status='QUEUED') & (Q(scheduled_at__isnull=True) | Q(scheduled_at__lte=now))
+    stalled = Q(delivery_status='SENDING', updated_at__lt=now - timedelta(seconds=stale_after()))
+    with transaction.atomic():
+        announcement = (
+            SystemAnnouncement.objects.select_for_update(skip_locked=True)
+            .filter(due | stalled, is_active=True)
+            .order_by('created_at').first()
+        )
+        if announcement is not None:
+            if announcement.delivery_status == 'SENDING':
+                logger.warning(f"Resuming announcement {announcement.pk}, stalled since {announcement.updated_at}")
+            announcement.delivery_status = 'SENDING'
+            announcement.delivery_started_at = now
+            _save_progress(announcement, 'delivery_status', 'delivery_started_at')
+    return announcement
+
+
+def deliver_in_background(announcement):
+    """Deliver on a daemon thread (SYSTEM_ANNOUNCEMENT_RUN_IN_PROCESS)"""
+    def target():
+        try:
+            deliver_announcement(announcement)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=target, name=f'announcement-{announcement.pk}', daemon=True)
+    thread.start()
+    return thread
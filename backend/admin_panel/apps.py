@@ -4,4 +4,16 @@ from django.apps import AppConfig
 class AdminPanelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_panel'
-    verbose_name = 'Admin Panel'
\ No newline at end of file
+    verbose_name = 'Admin Panel'
+
+    def ready(self):
+        from .backup import connect_tombstone_signals
+        from .notification_stream import connect_notification_signals
+        from .search_cache import connect_search_cache_signals
+        from .search_index import connect_search_index_signals
+        from .typeahead import connect_typeahead_signals
+        connect_tombstone_signals()
+        connect_notification_signals()
+        connect_search_index_signals()
+        connect_typeahead_signals()
+        connect_search_cache_signals()
@@ -0,0 +1,550 @@
+"""
+Streaming backup engine for SystemBackup
+
+DATABASE backups stream every model's rows through server-side cursors into
+gzip-compressed NDJSON chunk files, FILES backups write MEDIA_ROOT to a
+tar.gz and FULL backups do both. Each backup gets its own directory under
+SYSTEM_BACKUP_ROOT with a manifest.json describing what it contains.
+
+INCREMENTAL backups only export rows whose updated_at is past the previous
+database backup's watermark, plus tombstones for rows deleted since then.
+Models without updated_at are copied in full, except append-only ones
+(SYSTEM_BACKUP_APPEND_ONLY), which are filtered on their creation time.
+
+Backups are run by the run_backups management command (or, when
+SYSTEM_BACKUP_RUN_IN_PROCESS is set, a background thread), never on the
+request thread.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tarfile
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections, transaction
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.duration import duration_iso_string
+
+from core.row_signals import receivers_suspended
+
+from .activity import log_activity
+from .models import BackupTombstone, SystemBackup
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+FILES_ARCHIVE_NAME = 'files.tar.gz'
+TOMBSTONES_PREFIX = 'tombstones'
+TOMBSTONE_FIELDS = ['model', 'object_pk', 'deleted_at']
+# The search index is derived data; rebuild_search_index recreates it after a restore
+DEFAULT_EXCLUDE = (
+    'admin_panel.systembackup', 'admin_panel.backuptombstone', 'sessions.session',
+    'admin_panel.searchdocument', 'admin_panel.searchterm', 'admin_panel.searchindexversion',
+)
+DEFAULT_APPEND_ONLY = {'admin_panel.systemlog': 'created_at'}
+DATABASE_TYPES = ('FULL', 'DATABASE', 'INCREMENTAL')
+
+# Share of the progress bar given to the database export in FULL backups
+DATABASE_PROGRESS_SHARE = 0.8
+
+
+def backup_root():
+    return Path(getattr(settings, 'SYSTEM_BACKUP_ROOT', Path(settings.PRIVATE_ROOT) / 'backups'))
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def backup_models():
+    """Every concrete, managed model (including M2M through tables) to back up"""
+    exclude = set(getattr(settings, 'SYSTEM_BACKUP_EXCLUDE', DEFAULT_EXCLUDE))
+    return [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy and model_label(model) not in exclude
+    ]
+
+
+def model_fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def append_only_models():
+    return getattr(settings, 'SYSTEM_BACKUP_APPEND_ONLY', DEFAULT_APPEND_ONLY)
+
+
+def watermark_field(model):
+    """
+    Field incremental backups filter the model on
+
+    Returns:
+        str or None: None when the model has to be copied in full
+    """
+    append_only = append_only_models()
+    if model_label(model) in append_only:
+        return append_only[model_label(model)]
+    try:
+        field = model._meta.get_field('updated_at')
+    except FieldDoesNotExist:
+        return None
+    return field.name if getattr(field, 'auto_now', False) else None
+
+
+def tracks_deletes(model):
+    return watermark_field(model) is not None and model_label(model) not in append_only_models()
+
+
+def write_tombstones(using, tombstones):
+    BackupTombstone.objects.using(using).bulk_create(tombstones, batch_size=1000)
+
+
+def record_tombstone(sender, instance, using, **kwargs):
+    """
+    Queue a tombstone for a deleted row
+
+    A delete() always runs in a transaction, so the tombstones of every row
+    it removes are collected and written with one bulk insert when that
+    transaction commits, instead of one INSERT per row.
+    """
+    if receivers_suspended():
+        return
+    tombstone = BackupTombstone(model=model_label(sender), object_pk=str(instance.pk))
+    db = connections[using]
+    if not db.in_atomic_block:
+        write_tombstones(using, [tombstone])
+        return
+    pending = getattr(db, 'pending_tombstones', None)
+    # Commits and rollbacks (including savepoint rollbacks) replace
+    # run_on_commit, discarding the hook a pending batch was queued with
+    if pending is None or pending[0] is not db.run_on_commit or pending[1] != db.savepoint_ids:
+        batch = []
+
+        def flush():
+            if getattr(db, 'pending_tombstones', None) and db.pending_tombstones[2] is batch:
+                db.pending_tombstones = None
+            write_tombstones(using, batch)
+
+        transaction.on_commit(flush, using=using)
+        pending = db.pending_tombstones = (db.run_on_commit, list(db.savepoint_ids), batch)
+    pending[2].append(tombstone)
+
+
+def connect_tombstone_signals():
+    """Record a tombstone whenever a row of an incrementally backed-up model is deleted"""
+    for model in backup_models():
+        if tracks_deletes(model):
+            post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'backup-tombstone-{model_label(model)}')
+
+
+def prune_tombstones():
+    """Drop tombstones older than SYSTEM_BACKUP_TOMBSTONE_RETENTION_DAYS"""
+    days = getattr(settings, 'SYSTEM_BACKUP_TOMBSTONE_RETENTION_DAYS', 35)
+    deleted, _ = BackupTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def backup_chain(backup):
+    """
+    Backups to replay, oldest first, to restore the given backup
+
+    An incremental backup is restored by loading the full backup its chain
+    starts from and then each incremental backup on top of it in order.
+    """
+    chain = [backup]
+    while chain[-1].backup_type == 'INCREMENTAL':
+        base = chain[-1].base_backup
+        if base is None or base.status != 'COMPLETED':
+            raise ValueError(f'Backup #{chain[-1].pk} is missing the backup it builds on')
+        chain.append(base)
+    return list(reversed(chain))
+
+
+def latest_database_backup():
+    """The completed backup the next incremental backup builds on"""
+    return (
+        SystemBackup.objects.filter(status='COMPLETED', backup_type__in=DATABASE_TYPES, watermark__isnull=False)
+        .order_by('-watermark').first()
+    )
+
+
+class BackupJSONEncoder(json.JSONEncoder):
+    """
+    Lossless JSON encoding of values_list() rows
+
+    Unlike DjangoJSONEncoder, datetimes keep their microseconds. Every value
+    is read back with the model field's to_python().
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime, date, dt_time)):
+            return o.isoformat()
+        if isinstance(o, timedelta):
+            return duration_iso_string(o)
+        if isinstance(o, (Decimal, UUID)):
+            return str(o)
+        if isinstance(o, (bytes, memoryview)):
+            return base64.b64encode(bytes(o)).decode('ascii')
+        return super().default(o)
+
+
+def encode_row(row):
+    return json.dumps(row, cls=BackupJSONEncoder, separators=(',', ':'), ensure_ascii=False)
+
+
+class ChunkedWriter:
+    """
+    Writes NDJSON lines to <prefix>.NNNN.ndjson.gz files of at most
+    chunk_rows lines each, keeping a SHA-256 of the uncompressed lines
+    """
+
+    def __init__(self, directory, prefix, chunk_rows, compresslevel):
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.compresslevel = compresslevel
+        self.files = []
+        self.rows = 0
+        self.checksum = hashlib.sha256()
+        self._file = None
+        self._chunk_count = 0
+
+    def write(self, line):
+        if self._file is None or self._chunk_count >= self.chunk_rows:
+            self._open_next()
+        data = (line + '\n').encode('utf-8')
+        self._file.write(data)
+        self.checksum.update(data)
+        self._chunk_count += 1
+        self.rows += 1
+
+    def _open_next(self):
+        self.close()
+        name = f'{self.prefix}.{len(self.files):04d}.ndjson.gz'
+        self._file = gzip.open(self.directory / name, 'wb', compresslevel=self.compresslevel)
+        self.files.append(name)
+        self._chunk_count = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ProgressReporter:
+    """
+    Records SystemBackup progress at most once per interval
+
+    On PostgreSQL the export runs inside one REPEATABLE READ transaction, so
+    progress is written through a separate autocommit connection to be
+    visible while the export is still running.
+    """
+
+    def __init__(self, backup, interval=1.0):
+        self.backup = backup
+        self.interval = interval
+        self._last = 0.0
+        if connection.vendor == 'postgresql':
+            self._connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        else:
+            self._connection = connection
+
+    def update(self, progress, rows_written, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        self.backup.progress = min(int(progress), 100)
+        self.backup.rows_written = rows_written
+        table = connection.ops.quote_name(SystemBackup._meta.db_table)
+        with self._connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET progress = %s, rows_written = %s WHERE id = %s',
+                [self.backup.progress, rows_written, self.backup.pk]
+            )
+
+    def close(self):
+        if self._connection is not connection:
+            self._connection.close()
+
+
+class BackupWriter:
+    """
+    Writes one SystemBackup to its directory and returns the manifest
+    """
+
+    def __init__(self, backup, directory, chunk_rows=None, compresslevel=None, since=None):
+        self.backup = backup
+        self.directory = directory
+        self.since = since
+        self.watermark = None
+        self.chunk_rows = chunk_rows or getattr(settings, 'SYSTEM_BACKUP_CHUNK_ROWS', 100000)
+        self.compresslevel = compresslevel or getattr(settings, 'SYSTEM_BACKUP_COMPRESSLEVEL', 6)
+        self.iterator_chunk_size = getattr(settings, 'SYSTEM_BACKUP_FETCH_SIZE', 5000)
+        self.progress = ProgressReporter(backup)
+        self.rows_written = 0
+
+    @property
+    def includes_database(self):
+        return self.backup.backup_type in DATABASE_TYPES
+
+    @property
+    def is_incremental(self):
+        return self.backup.backup_type == 'INCREMENTAL'
+
+    @property
+    def includes_files(self):
+        return self.backup.backup_type in ('FULL', 'FILES')
+
+    def run(self):
+        if self.backup.backup_type not in dict(SystemBackup.BACKUP_TYPES):
+            raise ValueError(f'Unsupported backup type: {self.backup.backup_type}')
+        if self.is_incremental and self.since is None:
+            raise ValueError('Incremental backups need the watermark of a previous backup')
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'backup_id': self.backup.pk,
+            'name': self.backup.name,
+            'backup_type': self.backup.backup_type,
+            'base_backup_id': self.backup.base_backup_id,
+            'started_at': timezone.now().isoformat(),
+            'database': None,
+            'files': None,
+        }
+        self._db_share = DATABASE_PROGRESS_SHARE if self.includes_files else 1.0
+        try:
+            if self.includes_database:
+                manifest['database'] = self.write_database()
+            if self.includes_files:
+                manifest['files'] = self.write_files()
+        finally:
+            self.progress.close()
+
+        manifest['completed_at'] = timezone.now().isoformat()
+        with open(self.directory / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def write_database(self):
+        started = time.monotonic()
+        models = backup_models()
+        # One consistent snapshot across every table (unless already inside
+        # a transaction, where the isolation level can no longer be changed)
+        snapshot = connection.vendor == 'postgresql' and not connection.in_atomic_block
+        with transaction.atomic():
+            if snapshot:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            self.watermark = self.snapshot_time()
+            querysets = [(model, *self.model_queryset(model)) for model in models]
+            total_rows = sum(queryset.count() for _, queryset, _ in querysets) or 1
+            entries = [
+                self.write_model(model, queryset, total_rows, strategy)
+                for model, queryset, strategy in querysets
+            ]
+            tombstones = self.write_tombstones() if self.is_incremental else None
+
+        seconds = time.monotonic() - started
+        return {
+            'vendor': connection.vendor,
+            'watermark': self.watermark.isoformat(),
+            'since': self.since.isoformat() if self.since else None,
+            'models': entries,
+            'tombstones': tombstones,
+            'rows': self.rows_written,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows_written / seconds, 1) if seconds else None,
+        }
+
+    def snapshot_time(self):
+        """Time the export snapshot was taken (transaction start on PostgreSQL)"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT now()')
+                return cursor.fetchone()[0]
+        return timezone.now()
+
+    def model_queryset(self, model):
+        """
+        Returns:
+            tuple: (queryset, strategy) where strategy is 'full' for a complete
+            copy of the table or 'incremental' for changed rows only
+        """
+        queryset = model._base_manager.order_by('pk')
+        field = watermark_field(model) if self.is_incremental else None
+        if field is None:
+            return queryset, 'full'
+        return queryset.filter(**{f'{field}__gte': self.since}), 'incremental'
+
+    def write_tombstones(self):
+        writer = ChunkedWriter(self.directory, TOMBSTONES_PREFIX, self.chunk_rows, self.compresslevel)
+        rows = BackupTombstone.objects.filter(deleted_at__gte=self.since).order_by('pk').values_list(*TOMBSTONE_FIELDS)
+        try:
+            for row in rows.iterator(chunk_size=self.iterator_chunk_size):
+                writer.write(encode_row(row))
+        finally:
+            writer.close()
+        return {'fields': TOMBSTONE_FIELDS, 'rows': writer.rows, 'files': writer.files}
+
+    def write_model(self, model, queryset, total_rows, strategy='full'):
+        label = model_label(model)
+        fields = model_fields(model)
+        writer = ChunkedWriter(self.directory, label, self.chunk_rows, self.compresslevel)
+        try:
+            for row in queryset.values_list(*fields).iterator(chunk_size=self.iterator_chunk_size):
+                writer.write(encode_row(row))
+                self.rows_written += 1
+                if self.rows_written % 1000 == 0:
+                    self.progress.update(self.rows_written / total_rows * 100 * self._db_share, self.rows_written)
+        finally:
+            writer.close()
+        self.progress.update(self.rows_written / total_rows * 100 * self._db_share, self.rows_written)
+        return {
+            'model': label,
+            'table': model._meta.db_table,
+            'pk': model._meta.pk.attname,
+            'strategy': strategy,
+            'fields': fields,
+            'rows': writer.rows,
+            'files': writer.files,
+            'checksum': writer.checksum.hexdigest(),
+        }
+
+    def media_files(self):
+        media_root = Path(settings.MEDIA_ROOT)
+        skip = backup_root().resolve()
+        if not media_root.exists():
+            return []
+        files = []
+        for dirpath, dirnames, filenames in os.walk(media_root):
+            current = Path(dirpath)
+            dirnames[:] = [name for name in dirnames if (current / name).resolve() != skip]
+            for filename in filenames:
+                path = current / filename
+                files.append((path, path.relative_to(media_root).as_posix(), path.stat().st_size))
+        return files
+
+    def write_files(self):
+        files = self.media_files()
+        total_bytes = sum(size for _, _, size in files) or 1
+        done = 0
+        base = self._db_share * 100 if self.includes_database else 0
+        share = 100 - base
+        with tarfile.open(self.directory / FILES_ARCHIVE_NAME, 'w:gz', compresslevel=self.compresslevel) as archive:
+            for path, arcname, size in files:
+                archive.add(path, arcname=arcname, recursive=False)
+                done += size
+                self.progress.update(base + done / total_bytes * share, self.rows_written)
+        return {'archive': FILES_ARCHIVE_NAME, 'count': len(files), 'bytes': done}
+
+
+def directory_size(directory):
+    return sum(path.stat().st_size for path in Path(directory).rglob('*') if path.is_file())
+
+
+def run_backup(backup, chunk_rows=None):
+    """
+    Run a backup to completion on the calling thread
+
+    Returns:
+        SystemBackup: The backup, COMPLETED or FAILED
+    """
+    backup.status = 'RUNNING'
+    backup.started_at = timezone.now()
+    backup.completed_at = None
+    backup.progress = 0
+    backup.rows_written = 0
+    backup.error_message = ''
+    backup.save(update_fields=['status', 'started_at', 'completed_at', 'progress', 'rows_written', 'error_message'])
+
+    stamp = backup.started_at.strftime('%Y%m%d_%H%M%S')
+    directory = backup_root() / f'{backup.pk:06d}_{stamp}'
+
+    try:
+        since = None
+        if backup.backup_type == 'INCREMENTAL':
+            base = latest_database_backup()
+            if base is None:
+                raise ValueError('Incremental backups need a completed full or database backup to build on')
+            backup.base_backup = base
+            backup.save(update_fields=['base_backup'])
+            # Overlap the previous window so rows saved by transactions that
+            # were still open at the last snapshot are not missed
+            overlap = getattr(settings, 'SYSTEM_BACKUP_WATERMARK_OVERLAP', 300)
+            since = base.watermark - timedelta(seconds=overlap)
+        manifest = BackupWriter(backup, directory, chunk_rows, since=since).run()
+    except Exception as e:
+        logger.error(f"Backup {backup.pk} failed: {str(e)}")
+        shutil.rmtree(directory, ignore_errors=True)
+        backup.status = 'FAILED'
+        backup.error_message = str(e)
+        backup.completed_at = timezone.now()
+        backup.save(update_fields=['status', 'error_message', 'completed_at'])
+        log_activity(
+            'system_alert',
+            f'Backup failed: {backup.name}',
+            user=backup.created_by,
+            level='ERROR',
+            category='SYSTEM',
+            extra_data={'backup_id': backup.pk, 'error': str(e)}
+        )
+        return backup
+
+    database = manifest['database'] or {}
+    backup.status = 'COMPLETED'
+    backup.progress = 100
+    backup.file_path = str(directory)
+    backup.file_size = directory_size(directory)
+    backup.rows_written = database.get('rows', 0)
+    backup.rows_per_second = database.get('rows_per_second')
+    backup.watermark = parse_datetime(database['watermark']) if database.get('watermark') else None
+    backup.manifest = manifest
+    backup.completed_at = timezone.now()
+    backup.save()
+
+    if backup.backup_type in ('FULL', 'DATABASE'):
+        prune_tombstones()
+    return backup
+
+
+def claim_next_backup():
+    """Atomically take the oldest QUEUED backup, or None"""
+    with transaction.atomic():
+        backup = (
+            SystemBackup.objects.select_for_update(skip_locked=True)
+            .filter(status='QUEUED').order_by('created_at').first()
+        )
+        if backup is not None:
+            backup.status = 'RUNNING'
+            backup.started_at = timezone.now()
+            backup.save(update_fields=['status', 'started_at'])
+    return backup
+
+
+def run_backup_in_background(backup):
+    """Run a backup on a daemon thread (SYSTEM_BACKUP_RUN_IN_PROCESS)"""
+    def target():
+        try:
+            run_backup(backup)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=target, name=f'system-backup-{backup.pk}', daemon=True)
+    thread.start()
+    return thread
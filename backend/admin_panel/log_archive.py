@@ -0,0 +1,189 @@
+"""
+Cold archive for SystemLog rows
+
+Aged-out periods are written to gzip-compressed NDJSON files, one file per
+partition period, under SYSTEM_LOG_ARCHIVE_ROOT and can be read back on
+demand with iter_archived_logs().
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import log_partitions
+from .models import SystemLog
+
+ARCHIVE_NAME_RE = re.compile(r'^systemlog_(\d{4})_(\d{2})(?:_(\d{2}))?(?:\.\d+)?\.ndjson\.gz$')
+
+
+def archive_root():
+    return Path(getattr(settings, 'SYSTEM_LOG_ARCHIVE_ROOT', Path(settings.PRIVATE_ROOT) / 'system_logs'))
+
+
+def archive_fields():
+    return [field.attname for field in SystemLog._meta.concrete_fields]
+
+
+def _archive_path(start, interval):
+    directory = archive_root() / start.strftime('%Y')
+    base = f'systemlog_{log_partitions.period_label(start, interval)}'
+    path = directory / f'{base}.ndjson.gz'
+    suffix = 1
+    # Re-archiving a period (e.g. late rows in the default partition) adds a part
+    while path.exists():
+        path = directory / f'{base}.{suffix}.ndjson.gz'
+        suffix += 1
+    return path
+
+
+def period_logs(start, end, max_id=None):
+    queryset = SystemLog.objects.filter(
+        created_at__gte=log_partitions.to_datetime(start),
+        created_at__lt=log_partitions.to_datetime(end)
+    )
+    if max_id is not None:
+        queryset = queryset.filter(id__lte=max_id)
+    return queryset
+
+
+def period_bound(start, end):
+    """
+    Highest id in [start, end) right now, or 0 if the period is empty
+
+    Archiving and purging a period up to this bound leaves rows that arrive
+    later (with higher ids) for the next rotation instead of dropping them
+    unarchived.
+    """
+    return period_logs(start, end).aggregate(max_id=Max('id'))['max_id'] or 0
+
+
+def archive_period(start, end, interval=None, chunk_size=2000, max_id=None):
+    """
+    Write every SystemLog row in [start, end) (with id <= max_id, if given)
+    to a compressed NDJSON file
+
+    Rows are streamed with a server-side cursor, so memory use does not
+    depend on the size of the period.
+
+    Returns:
+        tuple: (path or None when there were no rows, number of rows written)
+    """
+    interval = interval or log_partitions.get_interval()
+    queryset = period_logs(start, end, max_id).order_by('created_at', 'id')
+    if not queryset.exists():
+        return None, 0
+
+    fields = archive_fields()
+    path = _archive_path(start, interval)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    count = 0
+    with transaction.atomic():
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+            for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+                archive.write(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder))
+                archive.write('\n')
+                count += 1
+    os.replace(tmp_path, path)
+    return path, count
+
+
+def purge_period(start, end, batch_size=5000, max_id=None):
+    """
+    Remove the rows of [start, end) (with id <= max_id, if given) from the database
+
+    On PostgreSQL a matching partition is locked, and detached and dropped
+    if it holds nothing above max_id; rows that live elsewhere (other
+    backends, the default partition, or a partition that received late
+    rows) are deleted in bounded batches.
+
+    Returns:
+        int: Number of rows removed
+    """
+    removed = 0
+    start_at = log_partitions.to_datetime(start)
+    end_at = log_partitions.to_datetime(end)
+
+    if log_partitions.partitioning_supported(connection):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if log_partitions.is_partitioned(cursor):
+                for name, lower, upper in log_partitions.list_partitions(cursor):
+                    if lower < start_at or upper > end_at:
+                        continue
+                    # No rows can be added to the partition until it is dropped
+                    cursor.execute(f'LOCK TABLE "{name}" IN ACCESS EXCLUSIVE MODE')
+                    if max_id is not None:
+                        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}" WHERE id > %s)', [max_id])
+                        if cursor.fetchone()[0]:
+                            continue
+                    cursor.execute(f'SELECT COUNT(*) FROM "{name}"')
+                    removed += cursor.fetchone()[0]
+                    log_partitions.drop_partition(cursor, name)
+
+    queryset = period_logs(start, end, max_id)
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted, _ = queryset.filter(id__in=ids).delete()
+        removed += deleted
+    return removed
+
+
+def list_archives():
+    """
+    Return archive files with the period they cover
+
+    Returns:
+        list: (path, start datetime, end datetime) tuples ordered by start
+    """
+    root = archive_root()
+    if not root.exists():
+        return []
+    archives = []
+    for path in root.glob('*/systemlog_*.ndjson.gz'):
+        match = ARCHIVE_NAME_RE.match(path.name)
+        if not match:
+            continue
+        year, month, day = match.groups()
+        interval = 'day' if day else 'month'
+        start = datetime(int(year), int(month), int(day or 1)).date()
+        end = log_partitions.next_period(start, interval)
+        archives.append((path, log_partitions.to_datetime(start), log_partitions.to_datetime(end)))
+    archives.sort(key=lambda archive: (archive[1], archive[0].name))
+    return archives
+
+
+def iter_archived_logs(start, end, level=None, category=None, activity_type=None, search=None):
+    """
+    Yield archived log records (as dicts) created in [start, end)
+
+    Only archive files whose period overlaps the requested range are opened.
+    """
+    search = search.lower() if search else None
+    for path, lower, upper in list_archives():
+        if upper <= start or lower >= end:
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                created_at = parse_datetime(record['created_at'])
+                if created_at < start or created_at >= end:
+                    continue
+                if level and record['level'] != level:
+                    continue
+                if category and record['category'] != category:
+                    continue
+                if activity_type and record.get('activity_type') != activity_type:
+                    continue
+                if search and search not in record['message'].lower():
+                    continue
+                yield record
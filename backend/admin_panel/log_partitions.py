@@ -0,0 +1,241 @@
+"""
+Time-based range partitioning of the SystemLog table on PostgreSQL
+
+The table is partitioned by RANGE (created_at) into monthly or daily
+partitions (SYSTEM_LOG_PARTITION_INTERVAL), plus a DEFAULT partition that
+catches rows outside every explicit range. Other backends keep a plain
+table; callers should check partitioning_supported() first.
+"""
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+TABLE = 'admin_panel_systemlog'
+UNPARTITIONED_TABLE = f'{TABLE}_unpartitioned'
+DEFAULT_PARTITION = f'{TABLE}_default'
+SEQUENCE = f'{TABLE}_id_seq'
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def partitioning_supported(connection):
+    return connection.vendor == 'postgresql'
+
+
+def get_interval():
+    interval = getattr(settings, 'SYSTEM_LOG_PARTITION_INTERVAL', 'month')
+    if interval not in ('day', 'month'):
+        raise ValueError(f"SYSTEM_LOG_PARTITION_INTERVAL must be 'day' or 'month', not {interval!r}")
+    return interval
+
+
+def period_start(day, interval=None):
+    """Return the first day of the period containing the given date"""
+    interval = interval or get_interval()
+    return day if interval == 'day' else day.replace(day=1)
+
+
+def next_period(start, interval=None):
+    """Return the first day of the period after the one starting at start"""
+    interval = interval or get_interval()
+    if interval == 'day':
+        return start + timedelta(days=1)
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def period_label(start, interval=None):
+    interval = interval or get_interval()
+    return start.strftime('%Y_%m_%d' if interval == 'day' else '%Y_%m')
+
+
+def partition_name(start, interval=None):
+    return f'{TABLE}_p{period_label(start, interval)}'
+
+
+def to_datetime(day):
+    """Midnight UTC at the start of the given date"""
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def iter_periods(first_day, last_day, interval=None):
+    """Yield (start, end) dates for every period from first_day through last_day"""
+    interval = interval or get_interval()
+    start = period_start(first_day, interval)
+    while start <= last_day:
+        end = next_period(start, interval)
+        yield start, end
+        start = end
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor):
+    """
+    Return explicit range partitions ordered by range start
+
+    Returns:
+        list: (name, start datetime, end datetime) tuples
+    """
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+        [TABLE]
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = BOUND_RE.search(bound or '')
+        if not match:
+            continue  # DEFAULT partition
+        partitions.append((
+            name,
+            datetime.fromisoformat(match.group(1)),
+            datetime.fromisoformat(match.group(2)),
+        ))
+    partitions.sort(key=lambda partition: partition[1])
+    return partitions
+
+
+def _columns(cursor, table):
+    """Quoted, comma-separated list of the table's writable (non-generated) columns"""
+    cursor.execute(
+        "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass "
+        "AND attnum > 0 AND NOT attisdropped AND attgenerated = '' ORDER BY attnum",
+        [table]
+    )
+    return ', '.join(f'"{row[0]}"' for row in cursor.fetchall())
+
+
+def create_partition(cursor, start, end, name):
+    """
+    Create and attach the partition for [start, end)
+
+    Rows for that range already sitting in the DEFAULT partition are moved
+    into the new partition before it is attached.
+    """
+    columns = _columns(cursor, TABLE)
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s '
+        f'RETURNING {columns}) INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved',
+        [to_datetime(start), to_datetime(end)]
+    )
+    cursor.execute(
+        f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+        [to_datetime(start), to_datetime(end)]
+    )
+
+
+def ensure_partitions(cursor, first_day, last_day, interval=None):
+    """
+    Create any missing partitions covering first_day through last_day
+
+    Returns:
+        list: Names of the partitions created
+    """
+    interval = interval or get_interval()
+    existing = {name for name, _, _ in list_partitions(cursor)}
+    created = []
+    for start, end in iter_periods(first_day, last_day, interval):
+        name = partition_name(start, interval)
+        if name not in existing:
+            create_partition(cursor, start, end, name)
+            created.append(name)
+    return created
+
+
+def drop_partition(cursor, name):
+    cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+    cursor.execute(f'DROP TABLE "{name}"')
+
+
+def _rebuild(cursor, source, partitioned, first_day=None, last_day=None):
+    """
+    Recreate TABLE from source (renamed out of the way) with or without
+    partitioning, carrying over rows, indexes, foreign keys and the id sequence
+    """
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [source, source]
+    )
+    index_defs = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [source]
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{source}"')
+    max_id = cursor.fetchone()[0]
+
+    # Keep the sequence alive when its owning table is dropped
+    cursor.execute(f"SELECT pg_get_serial_sequence('\"{source}\"', 'id')")
+    sequence = cursor.fetchone()[0]
+    if sequence and not partitioned:
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+    cursor.execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{source}" INCLUDING CONSTRAINTS INCLUDING GENERATED)'
+        + (' PARTITION BY RANGE (created_at)' if partitioned else '')
+    )
+    if partitioned:
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+        if first_day and last_day:
+            ensure_partitions(cursor, first_day, last_day)
+
+    columns = _columns(cursor, TABLE)
+    cursor.execute(f'INSERT INTO "{TABLE}" ({columns}) SELECT {columns} FROM "{source}"')
+    cursor.execute(f'DROP TABLE "{source}"')
+
+    primary_key = '(id, created_at)' if partitioned else '(id)'
+    cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY {primary_key}')
+    for index_def in index_defs:
+        cursor.execute(re.sub(rf'ON (ONLY )?(\S+\.)?"?{source}"?', f'ON "{TABLE}"', index_def, count=1))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+    if partitioned or not sequence:
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCE}"')
+        sequence = f'"{SEQUENCE}"'
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{TABLE}".id')
+    cursor.execute(f"ALTER TABLE \"{TABLE}\" ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+    cursor.execute(f"SELECT setval('{sequence}'::regclass, %s, %s)", [max(max_id, 1), max_id > 0])
+
+
+def convert_to_partitioned(cursor, ahead=3):
+    """Convert the plain SystemLog table into a range-partitioned one"""
+    if is_partitioned(cursor):
+        return
+    cursor.execute(f'SELECT MIN(created_at), MAX(created_at) FROM "{TABLE}"')
+    oldest, newest = cursor.fetchone()
+    today = timezone.now().date()
+    first_day = oldest.date() if oldest else today
+    last_day = max(newest.date() if newest else today, today)
+    for _ in range(ahead):
+        last_day = next_period(period_start(last_day))
+
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{UNPARTITIONED_TABLE}"')
+    _rebuild(cursor, UNPARTITIONED_TABLE, partitioned=True, first_day=first_day, last_day=last_day)
+
+
+def convert_to_plain(cursor):
+    """Undo convert_to_partitioned"""
+    if not is_partitioned(cursor):
+        return
+    cursor.execute(f"SELECT pg_get_serial_sequence('\"{TABLE}\"', 'id')")
+    sequence = cursor.fetchone()[0]
+    if sequence:
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{UNPARTITIONED_TABLE}"')
+    _rebuild(cursor, UNPARTITIONED_TABLE, partitioned=False)
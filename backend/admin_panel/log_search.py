@@ -0,0 +1,105 @@
+"""
+Full-text search over SystemLog messages
+
+PostgreSQL uses a generated tsvector column (search_vector) with a GIN
+index; SQLite uses an FTS5 inverted-index table kept in sync by triggers.
+Both are created by migration 0006. Other backends fall back to icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count, F, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, TruncDate
+
+from .log_partitions import TABLE
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = f'{TABLE}_fts'
+
+TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _fts5_query(query, phrase=False):
+    """
+    Translate free text into an FTS5 MATCH expression
+
+    Every word and "quoted phrase" must match; all terms are quoted so user
+    input can never be interpreted as FTS5 operators.
+    """
+    if phrase:
+        terms = [query]
+    else:
+        terms = [quoted or word for quoted, word in TOKEN_RE.findall(query)]
+    terms = [term.replace('"', '""').strip() for term in terms]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+
+def _postgres_search(queryset, query, phrase):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='phrase' if phrase else 'websearch')
+    vector = RawSQL(f'"{TABLE}"."search_vector"', [], output_field=SearchVectorField())
+    # ts_rank() returns real; widen it so the value round-trips exactly
+    # through keyset cursors
+    return queryset.annotate(
+        search_vector=vector,
+        rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+    ).filter(search_vector=search_query)
+
+
+def _sqlite_search(queryset, query, phrase):
+    match = _fts5_query(query, phrase)
+    if not match:
+        return queryset.none().annotate(rank=RawSQL('0', [], output_field=FloatField()))
+    # bm25() is lower for better matches, so negate it to rank descending
+    rank = RawSQL(
+        f'SELECT -bm25("{FTS_TABLE}") FROM "{FTS_TABLE}" '
+        f'WHERE "{FTS_TABLE}" MATCH %s AND rowid = "{TABLE}"."id"',
+        [match],
+        output_field=FloatField()
+    )
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', [match])
+    ).annotate(rank=rank)
+
+
+def search_logs(queryset, query, phrase=False):
+    """
+    Filter a SystemLog queryset to entries matching query, annotated with rank
+
+    Args:
+        queryset: SystemLog queryset (may already be filtered)
+        query: Search text; supports "quoted phrases" and, on PostgreSQL,
+            web-search syntax (or, -exclusion)
+        phrase: Treat the whole query as a single phrase
+
+    Returns:
+        QuerySet: Matching rows with a float `rank` annotation (higher is better)
+    """
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, query, phrase)
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(queryset, query, phrase)
+    return queryset.filter(message__icontains=query).annotate(rank=RawSQL('1.0', [], output_field=FloatField()))
+
+
+def search_facets(queryset):
+    """
+    Count matching rows by level, category and day
+
+    Returns:
+        dict: {'level': {...}, 'category': {...}, 'day': {...}}
+    """
+    matched = queryset.order_by()
+    facets = {}
+    for field in ('level', 'category'):
+        facets[field] = {
+            row[field]: row['count']
+            for row in matched.values(field).annotate(count=Count('id')).order_by(field)
+        }
+    facets['day'] = {
+        row['day'].isoformat(): row['count']
+        for row in matched.annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')).order_by('day')
+    }
+    return facets
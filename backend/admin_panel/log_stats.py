@@ -0,0 +1,107 @@
+"""
+Aggregations over SystemLog computed in the database
+
+Everything here returns plain dicts/lists built from values() rows, so the
+grouped endpoints never load or serialize full model instances.
+"""
+from django.db import connection
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber, TruncDay, TruncHour
+
+from .models import SystemLog
+
+COMPACT_FIELDS = ('id', 'level', 'category', 'activity_type', 'message', 'actor_display', 'created_at')
+ERROR_LEVELS = ('ERROR', 'CRITICAL')
+BUCKETS = {'hour': TruncHour, 'day': TruncDay}
+
+
+def level_counts(queryset):
+    """
+    Count rows per level with a single GROUP BY
+
+    Returns:
+        dict: {level: count}
+    """
+    rows = queryset.order_by().values('level').annotate(count=Count('id'))
+    return {row['level']: row['count'] for row in rows}
+
+
+def top_per_level(queryset, per_level=10, fields=COMPACT_FIELDS, levels=None):
+    """
+    Return the newest rows of each level in a single query
+
+    Where the backend allows LIMIT inside compound queries (PostgreSQL) this
+    is a UNION ALL of one LIMITed index range scan per level, which stays
+    cheap however large the table is. Elsewhere ROW_NUMBER() over level is
+    used instead.
+
+    Args:
+        queryset: SystemLog queryset (may already be filtered)
+        per_level: Rows to keep for each level
+        fields: Columns included in each row
+        levels: Levels to include (defaults to every SystemLog level)
+
+    Returns:
+        dict: {level: [row, ...]} with rows newest first
+    """
+    if levels is None:
+        levels = [level for level, _ in SystemLog.LOG_LEVELS]
+    levels = list(levels)
+    if not levels:
+        return {}
+    fields = tuple(fields) + tuple(name for name in ('id', 'level', 'created_at') if name not in fields)
+    queryset = queryset.order_by()
+
+    if connection.features.supports_slicing_ordering_in_compound:
+        parts = [
+            queryset.filter(level=level).order_by('-created_at', '-id').values(*fields)[:per_level]
+            for level in levels
+        ]
+        rows = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    else:
+        rows = queryset.filter(level__in=levels).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=[F('level')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            )
+        ).filter(position__lte=per_level).values(*fields)
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row['level'], []).append(row)
+    for group in grouped.values():
+        group.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+    return grouped
+
+
+def error_rates(queryset, bucket='hour'):
+    """
+    Total and error counts per time bucket
+
+    Args:
+        queryset: SystemLog queryset, normally limited to a time range
+        bucket: 'hour' or 'day'
+
+    Returns:
+        list: {'bucket', 'total', 'errors', 'error_rate'} dicts, oldest first
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    rows = queryset.order_by().annotate(
+        bucket=BUCKETS[bucket]('created_at')
+    ).values('bucket').annotate(
+        total=Count('id'),
+        errors=Count('id', filter=Q(level__in=ERROR_LEVELS)),
+    ).order_by('bucket')
+
+    return [
+        {
+            'bucket': row['bucket'],
+            'total': row['total'],
+            'errors': row['errors'],
+            'error_rate': round(row['errors'] / row['total'], 4) if row['total'] else 0.0,
+        }
+        for row in rows
+    ]
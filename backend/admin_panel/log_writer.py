@@ -0,0 +1,197 @@
+"""
+Buffered, batched writer for SystemLog entries
+
+Entries are queued in memory and inserted with bulk_create from a single
+background thread, so admin actions don't pay for an INSERT on the request
+path. CRITICAL entries, and entries that arrive while the buffer is full,
+are written synchronously on the caller's thread.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+WRITER_THREAD_NAME = 'system-log-writer'
+
+
+class SystemLogWriter:
+    """
+    Queue-backed SystemLog writer with a background flush thread
+    """
+
+    def __init__(self, buffer_size=None, batch_size=None, flush_interval=None):
+        self.buffer_size = buffer_size or getattr(settings, 'SYSTEM_LOG_BUFFER_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'SYSTEM_LOG_BATCH_SIZE', 500)
+        self.flush_interval = flush_interval or getattr(settings, 'SYSTEM_LOG_FLUSH_INTERVAL', 2.0)
+        self.stats = {'queued': 0, 'written': 0, 'sync_writes': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def is_async(self):
+        return getattr(settings, 'SYSTEM_LOG_ASYNC', True)
+
+    def write(self, entry):
+        """
+        Write an unsaved SystemLog instance
+
+        CRITICAL entries are saved immediately; everything else is queued.
+        """
+        if not self.is_async or entry.level == 'CRITICAL' or self._stopping.is_set():
+            self._write_now([entry])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+            self.stats['queued'] += 1
+        except queue.Full:
+            # Keep memory bounded by writing through instead of growing the buffer
+            self._write_now([entry])
+
+    def flush(self):
+        """Write every queued entry on the calling thread"""
+        if self._queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the background thread and write anything still queued"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            # A forked worker inherits the parent's queue but not its thread
+            self._queue = queue.Queue(maxsize=self.buffer_size)
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=WRITER_THREAD_NAME, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._collect()
+                if batch:
+                    self._write_batch(batch)
+        finally:
+            close_old_connections()
+
+    def _collect(self):
+        """Wait for up to batch_size entries or flush_interval seconds"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _write_now(self, entries):
+        self.stats['sync_writes'] += len(entries)
+        self._write_batch(entries)
+
+    def _write_batch(self, entries):
+        from .models import SystemLog
+
+        try:
+            SystemLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            self.stats['written'] += len(entries)
+        except Exception as e:
+            logger.error(f"Failed to write {len(entries)} system log entries: {e}")
+            self.stats['failed'] += len(entries)
+        finally:
+            if threading.current_thread().name == WRITER_THREAD_NAME:
+                close_old_connections()
+
+
+class SystemLogHandler(logging.Handler):
+    """
+    logging.Handler that records log records as SystemLog entries
+
+    Extra attributes understood on the record: category, activity_type,
+    user and request (as passed by django.request).
+    """
+
+    def emit(self, record):
+        # Never log our own writes or database chatter back into the table
+        if record.name.startswith('django.db') or record.name == __name__:
+            return
+        if threading.current_thread().name == WRITER_THREAD_NAME:
+            return
+
+        try:
+            from .models import SystemLog
+            from .activity import get_actor_display
+
+            level = record.levelname if record.levelname in dict(SystemLog.LOG_LEVELS) else 'INFO'
+            request = getattr(record, 'request', None)
+            user = getattr(record, 'user', None)
+            if user is None and request is not None:
+                user = getattr(request, 'user', None)
+            if user is not None and not user.is_authenticated:
+                user = None
+
+            extra_data = {'logger': record.name}
+            if record.exc_info:
+                extra_data['exception'] = ''.join(traceback.format_exception(*record.exc_info))
+
+            entry = SystemLog(
+                level=level,
+                category=getattr(record, 'category', 'SYSTEM'),
+                activity_type=getattr(
+                    record, 'activity_type',
+                    'system_alert' if record.levelno >= logging.ERROR else 'other'
+                ),
+                message=record.getMessage(),
+                user=user,
+                actor_display=get_actor_display(user),
+                extra_data=extra_data,
+            )
+            if request is not None:
+                entry.ip_address = request.META.get('REMOTE_ADDR')
+                entry.user_agent = request.META.get('HTTP_USER_AGENT', '')
+                entry.request_path = request.path[:500]
+                entry.request_method = request.method
+                entry.response_status = getattr(record, 'status_code', None)
+
+            system_log_writer.write(entry)
+        except Exception:
+            self.handleError(record)
+
+
+system_log_writer = SystemLogWriter()
+atexit.register(system_log_writer.shutdown)
@@ -0,0 +1,283 @@
+"""
+Templated, batched email delivery
+
+EmailTemplate rows are compiled once per (id, updated_at) into Django
+Template objects and kept in a process-wide cache, so rendering thousands of
+personalised messages costs one template lookup per batch. Messages are sent
+over one connection per batch with send_messages(), throttled to
+EMAIL_RATE_LIMIT messages/second and retried with backoff when the mail
+server fails. Which server is used is EMAIL_BACKEND, so the console, file and
+locmem backends work unchanged in development and tests.
+"""
+import logging
+import smtplib
+import threading
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import Context, Template
+
+from .models import EmailTemplate
+
+logger = logging.getLogger(__name__)
+
+# Used when no active EmailTemplate of the type exists
+DEFAULT_TEMPLATES = {
+    'WELCOME': {
+        'subject': 'Welcome, {% firstof first_name username %}',
+        'body_text': (
+            'Hello {% firstof full_name username %},\n\n'
+            'An account has been created for you.\n'
+            'Username: {{ username }}\n'
+            'Role: {{ role }}\n'
+        ),
+        'body_html': '',
+    },
+    'ASSIGNMENT_DUE': {
+        'subject': 'Reminder: {{ assignment_title }} is due {{ due_date|date:"M j, H:i" }}',
+        'body_text': (
+            'Hello {% firstof full_name username %},\n\n'
+            '{{ assignment_title }} for {{ course }} is due on {{ due_date|date:"l, M j, H:i" }} '
+            'and we have not received your submission yet.\n'
+        ),
+        'body_html': '',
+    },
+}
+
+RETRYABLE_ERRORS = (smtplib.SMTPException, OSError)
+
+
+class CompiledTemplate:
+    """The subject and bodies of one EmailTemplate version, compiled"""
+
+    def __init__(self, subject, body_text, body_html=''):
+        self.subject = Template(subject)
+        self.body_text = Template(body_text)
+        self.body_html = Template(body_html) if body_html else None
+
+    def render(self, context):
+        """
+        Render one message
+
+        Returns:
+            tuple: (subject, text body, HTML body or None)
+        """
+        plain = Context(context, autoescape=False)
+        subject = ' '.join(self.subject.render(plain).split())
+        text = self.body_text.render(plain)
+        html = self.body_html.render(Context(context)) if self.body_html else None
+        return subject, text, html
+
+
+class TemplateCache:
+    """
+    Compiled templates keyed by (EmailTemplate id, updated_at)
+
+    Editing a template changes updated_at, so the next lookup compiles the
+    new version and the stale one is dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = {}
+        self._defaults = {}
+
+    def get(self, template_type):
+        """
+        The newest active template of a type, falling back to the built-in default
+
+        Raises:
+            EmailTemplate.DoesNotExist: Neither exists
+        """
+        row = (
+            EmailTemplate.objects.filter(template_type=template_type, is_active=True)
+            .order_by('-updated_at')
+            .values('id', 'updated_at')
+            .first()
+        )
+        if row is None:
+            return self.get_default(template_type)
+
+        key = (row['id'], row['updated_at'])
+        compiled = self._compiled.get(row['id'])
+        if compiled is not None and compiled[0] == key:
+            return compiled[1]
+
+        template = EmailTemplate.objects.only('subject', 'body_text', 'body_html').get(pk=row['id'])
+        compiled = CompiledTemplate(template.subject, template.body_text, template.body_html)
+        with self._lock:
+            self._compiled[row['id']] = (key, compiled)
+        return compiled
+
+    def get_default(self, template_type):
+        if template_type not in DEFAULT_TEMPLATES:
+            raise EmailTemplate.DoesNotExist(f'No active {template_type} email template')
+        with self._lock:
+            if template_type not in self._defaults:
+                self._defaults[template_type] = CompiledTemplate(**DEFAULT_TEMPLATES[template_type])
+            return self._defaults[template_type]
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+            self._defaults.clear()
+
+
+email_templates = TemplateCache()
+
+
+class BatchMailer:
+    """
+    Send messages in batches over one reused connection per batch
+
+    Args:
+        batch_size: Messages per connection (default: EMAIL_BATCH_SIZE)
+        rate_limit: Maximum messages per second, 0 for no limit
+            (default: EMAIL_RATE_LIMIT)
+        max_retries: Extra attempts for a batch the server rejected
+            (default: EMAIL_MAX_RETRIES)
+        backend: Email backend path (default: EMAIL_BACKEND)
+    """
+
+    def __init__(self, batch_size=None, rate_limit=None, max_retries=None, backend=None):
+        self.batch_size = batch_size or getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+        self.rate_limit = rate_limit if rate_limit is not None else getattr(settings, 'EMAIL_RATE_LIMIT', 0)
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'EMAIL_MAX_RETRIES', 3)
+        self.retry_backoff = getattr(settings, 'EMAIL_RETRY_BACKOFF', 2.0)
+        self.backend = backend
+        self.batches = []
+
+    @property
+    def totals(self):
+        sent = sum(batch['sent'] for batch in self.batches)
+        failed = sum(batch['failed'] for batch in self.batches)
+        seconds = sum(batch['seconds'] for batch in self.batches)
+        return {
+            'batches': len(self.batches),
+            'sent': sent,
+            'failed': failed,
+            'retries': sum(batch['attempts'] - 1 for batch in self.batches),
+            'seconds': seconds,
+            'messages_per_second': sent / seconds if seconds else None,
+        }
+
+    def send(self, messages, on_sent=None):
+        """
+        Send an iterable of EmailMessages
+
+        Args:
+            messages: Iterable of EmailMessages
+            on_sent: Optional callable given the list of messages each
+                batch delivered
+
+        Returns:
+            dict: Totals over all batches (see totals); per-batch metrics
+            are kept in self.batches
+        """
+        messages = iter(messages)
+        while True:
+            batch = list(islice(messages, self.batch_size))
+            if not batch:
+                break
+            self.send_batch(batch, on_sent)
+        return self.totals
+
+    def send_batch(self, batch, on_sent=None):
+        started = time.monotonic()
+        metrics = {'batch': len(self.batches) + 1, 'messages': len(batch), 'sent': 0, 'failed': 0, 'attempts': 0}
+        pending = list(batch)
+        delivered = []
+        error = None
+        while pending and metrics['attempts'] <= self.max_retries:
+            metrics['attempts'] += 1
+            try:
+                connection = get_connection(self.backend, fail_silently=False)
+                with connection:
+                    # One message per call over the shared connection, so a
+                    # retry only resends the messages that did not go out
+                    while pending:
+                        if connection.send_messages(pending[:1]):
+                            delivered.append(pending[0])
+                        pending.pop(0)
+                error = None
+            except RETRYABLE_ERRORS as e:
+                error = e
+                if metrics['attempts'] <= self.max_retries:
+                    time.sleep(self.retry_backoff * 2 ** (metrics['attempts'] - 1))
+
+        metrics['sent'] = len(delivered)
+        metrics['failed'] = len(batch) - metrics['sent']
+        if error is not None:
+            logger.error(f"Email batch {metrics['batch']} failed after {metrics['attempts']} attempts: {str(error)}")
+            metrics['error'] = str(error)
+
+        if self.rate_limit:
+            # Hold the batch until it has taken at least as long as the rate allows
+            remaining = len(batch) / self.rate_limit - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+        metrics['seconds'] = time.monotonic() - started
+        self.batches.append(metrics)
+        logger.info(
+            f"Email batch {metrics['batch']}: {metrics['sent']}/{metrics['messages']} sent "
+            f"in {metrics['seconds']:.2f}s ({metrics['attempts']} attempts)"
+        )
+        if on_sent is not None and delivered:
+            on_sent(delivered)
+        return metrics
+
+
+def build_messages(template_type, recipients, from_email=None):
+    """
+    Render one message per recipient from the cached template
+
+    Args:
+        template_type: EmailTemplate.template_type
+        recipients: Iterable of (email address, context dict)
+        from_email: Sender (default: DEFAULT_FROM_EMAIL)
+
+    Yields:
+        EmailMultiAlternatives
+    """
+    template = email_templates.get(template_type)
+    for address, context in recipients:
+        if not address:
+            continue
+        subject, text, html = template.render(context)
+        message = EmailMultiAlternatives(subject, text, from_email, [address])
+        if html:
+            message.attach_alternative(html, 'text/html')
+        yield message
+
+
+def send_templated_email(template_type, recipients, **mailer_options):
+    """
+    Render and send a template to many recipients in batches
+
+    Args:
+        template_type: EmailTemplate.template_type
+        recipients: Iterable of (email address, context dict)
+        **mailer_options: BatchMailer options
+
+    Returns:
+        dict: BatchMailer totals
+    """
+    mailer = BatchMailer(**mailer_options)
+    return mailer.send(build_messages(template_type, recipients))
+
+
+def user_context(user, **extra):
+    """Template variables describing a user"""
+    profile = getattr(user, 'profile', None)
+    context = {
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': user.get_full_name(),
+        'role': profile.get_role_display() if profile is not None else '',
+    }
+    context.update(extra)
+    return context
@@ -0,0 +1,131 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.models import SystemBackup
+from admin_panel.restore import Restorer, RestoreError, resolve_chain
+
+
+class Command(BaseCommand):
+    help = (
+        'Restore the database (and media files) from a system backup, replaying incremental '
+        'backups on top of the full backup they build on. Stop the web and worker processes first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backup-id',
+            type=int,
+            help='SystemBackup to restore (its incremental chain is followed automatically)',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            default=[],
+            help='Backup directory to restore; repeat to replay a chain in order',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help=(
+                'Processes loading tables in parallel (default: CPU count, up to 8); with more than one '
+                'the restore is not a single transaction'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per bulk_create batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--skip-files',
+            action='store_true',
+            help='Only restore the database, not media files',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Verify the archive checksums and row counts without changing anything',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Do not ask for confirmation',
+        )
+
+    def handle(self, *args, **options):
+        if bool(options['backup_id']) == bool(options['path']):
+            raise CommandError('Pass either --backup-id or --path')
+
+        backup = None
+        if options['backup_id']:
+            try:
+                backup = SystemBackup.objects.get(pk=options['backup_id'])
+            except SystemBackup.DoesNotExist:
+                raise CommandError(f"Backup {options['backup_id']} does not exist")
+
+        try:
+            chain = resolve_chain(backup=backup, paths=options['path'])
+        except RestoreError as e:
+            raise CommandError(str(e))
+
+        for directory, manifest in chain:
+            self.stdout.write(f"{manifest['backup_type']} backup \"{manifest['name']}\" from {directory}")
+
+        restorer = Restorer(
+            chain,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+            restore_files=not options['skip_files'],
+        )
+
+        if options['dry_run']:
+            self.verify(restorer)
+            return
+
+        if restorer.workers > 1:
+            self.stdout.write(self.style.WARNING(
+                f'WARNING: restoring with {restorer.workers} workers is not atomic. Chunk files are verified '
+                'before the tables are cleared, but if loading still fails the tables are left partly '
+                'loaded and the restore must be run again. Use --workers 1 to restore in a single transaction.'
+            ))
+
+        if options['interactive']:
+            confirm = input(
+                'This will replace the data in every table contained in the backup. '
+                "Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != 'yes':
+                self.stdout.write('Restore cancelled.')
+                return
+
+        try:
+            stats = restorer.run()
+        except RestoreError as e:
+            raise CommandError(str(e))
+
+        total = stats.pop('total')
+        for label, stat in sorted(stats.items()):
+            if stat['rows']:
+                rate = stat['rows'] / stat['seconds'] if stat['seconds'] else 0
+                self.stdout.write(f"  {label}: {stat['rows']} rows ({rate:.0f} rows/sec)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {total['rows']} rows and removed {total['deleted']} deleted rows in "
+            f"{total['seconds']:.1f}s ({total['rows_per_second'] or 0:.0f} rows/sec)"
+        ))
+
+    def verify(self, restorer):
+        results = restorer.verify()
+        failed = [result for result in results if not result['ok']]
+        for result in results:
+            status = 'ok' if result['ok'] else f"FAILED: {result['error']}"
+            self.stdout.write(f"  {result['model']}: {result['rows']} rows {status}")
+
+        stats = restorer.stats
+        summary = f"Verified {stats['rows']} rows in {stats['seconds']:.1f}s"
+        if stats['rows_per_second']:
+            summary += f" ({stats['rows_per_second']:.0f} rows/sec)"
+        if failed:
+            raise CommandError(f'{summary}; {len(failed)} entries failed verification')
+        self.stdout.write(self.style.SUCCESS(f'{summary}; dry run, nothing was restored'))
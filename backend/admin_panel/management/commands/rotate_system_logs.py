@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from datetime import timedelta
+
+from admin_panel import log_archive, log_partitions
+from admin_panel.models import SystemLog
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming SystemLog partitions and archive/drop periods past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retain-days',
+            type=int,
+            default=getattr(settings, 'SYSTEM_LOG_RETENTION_DAYS', 90),
+            help='Keep logs newer than this many days in the database (default: SYSTEM_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=3,
+            help='Number of future partitions to create (default: 3)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Drop expired periods without writing them to the cold archive',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be archived and dropped without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        interval = log_partitions.get_interval()
+        today = timezone.now().date()
+
+        # Create partitions ahead of time so new rows never land in the default partition
+        if log_partitions.partitioning_supported(connection) and not options['dry_run']:
+            last_day = log_partitions.period_start(today, interval)
+            for _ in range(options['ahead']):
+                last_day = log_partitions.next_period(last_day, interval)
+            with transaction.atomic(), connection.cursor() as cursor:
+                if log_partitions.is_partitioned(cursor):
+                    created = log_partitions.ensure_partitions(cursor, today, last_day, interval)
+                    for name in created:
+                        self.stdout.write(f'Created partition {name}')
+
+        # Only whole periods that ended before the cutoff are rotated out
+        cutoff = today - timedelta(days=options['retain_days'])
+        oldest = SystemLog.objects.aggregate(oldest=Min('created_at'))['oldest']
+        if oldest is None or oldest.date() >= cutoff:
+            self.stdout.write(self.style.SUCCESS('No logs past the retention window'))
+            return
+
+        total_archived = 0
+        total_removed = 0
+        for start, end in log_partitions.iter_periods(oldest.date(), cutoff, interval):
+            if end > cutoff:
+                break
+            label = log_partitions.period_label(start, interval)
+
+            if options['dry_run']:
+                count = SystemLog.objects.filter(
+                    created_at__gte=log_partitions.to_datetime(start),
+                    created_at__lt=log_partitions.to_datetime(end)
+                ).count()
+                self.stdout.write(f'Would rotate {label}: {count} logs')
+                continue
+
+            # Archive and purge the same rows; later arrivals wait for the next run
+            max_id = None
+            if not options['no_archive']:
+                max_id = log_archive.period_bound(start, end)
+                path, count = log_archive.archive_period(start, end, interval, max_id=max_id)
+                if path:
+                    total_archived += count
+                    self.stdout.write(f'Archived {count} logs for {label} to {path}')
+
+            removed = log_archive.purge_period(start, end, max_id=max_id)
+            total_removed += removed
+            if removed:
+                self.stdout.write(f'Removed {removed} logs for {label}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was archived or removed'))
+            return
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Archived {total_archived} logs, removed {total_removed} logs older than {cutoff}')
+        )
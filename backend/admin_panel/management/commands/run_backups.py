@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel import backup as backup_engine
+from admin_panel.models import SystemBackup
+
+
+class Command(BaseCommand):
+    help = 'Run queued system backups (or create and run one with --type)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backup-id',
+            type=int,
+            help='Run this backup now, whatever its queue position',
+        )
+        parser.add_argument(
+            '--type',
+            choices=[choice for choice, _ in SystemBackup.BACKUP_TYPES],
+            help='Create a new backup of this type and run it',
+        )
+        parser.add_argument(
+            '--name',
+            help='Name for the backup created with --type',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for queued backups instead of exiting when the queue is empty',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between queue checks with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--chunk-rows',
+            type=int,
+            help='Rows per compressed chunk file (default: SYSTEM_BACKUP_CHUNK_ROWS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['backup_id']:
+            try:
+                backup = SystemBackup.objects.get(pk=options['backup_id'])
+            except SystemBackup.DoesNotExist:
+                raise CommandError(f"Backup {options['backup_id']} does not exist")
+            if backup.status == 'RUNNING':
+                raise CommandError(f'Backup {backup.pk} is already running')
+            self.run(backup, options)
+            return
+
+        if options['type']:
+            name = options['name'] or f"{options['type'].title()} backup {time.strftime('%Y-%m-%d %H:%M')}"
+            backup = SystemBackup.objects.create(name=name, backup_type=options['type'], status='QUEUED')
+            self.run(backup, options)
+            return
+
+        while True:
+            backup = backup_engine.claim_next_backup()
+            if backup is not None:
+                self.run(backup, options)
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def run(self, backup, options):
+        self.stdout.write(f'Running {backup.get_backup_type_display().lower()} "{backup.name}" (#{backup.pk})')
+        backup = backup_engine.run_backup(backup, chunk_rows=options['chunk_rows'])
+        if backup.status != 'COMPLETED':
+            self.stdout.write(self.style.ERROR(f'Backup #{backup.pk} failed: {backup.error_message}'))
+            return
+
+        size_mb = (backup.file_size or 0) / (1024 * 1024)
+        summary = f'Backup #{backup.pk} completed: {backup.file_path} ({size_mb:.1f} MB'
+        if backup.rows_per_second:
+            summary += f', {backup.rows_written} rows at {backup.rows_per_second:.0f} rows/sec'
+        self.stdout.write(self.style.SUCCESS(summary + ')'))
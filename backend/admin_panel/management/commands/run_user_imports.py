@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel import user_import
+from admin_panel.models import UserImportJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued bulk user imports (and resume ones whose worker stopped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job-id',
+            type=int,
+            help='Run (or resume) this import job now, whatever its queue position',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for queued imports instead of exiting when the queue is empty',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between queue checks with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows per transaction (default: SYSTEM_USER_IMPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        if options['job_id']:
+            try:
+                job = UserImportJob.objects.get(pk=options['job_id'])
+            except UserImportJob.DoesNotExist:
+                raise CommandError(f"Import job {options['job_id']} does not exist")
+            if job.status == 'COMPLETED':
+                raise CommandError(f'Import job {job.pk} has already completed')
+            self.run(job, options)
+            return
+
+        while True:
+            job = user_import.claim_next_job()
+            if job is not None:
+                self.run(job, options)
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def run(self, job, options):
+        resume = f' from row {job.last_row + 1}' if job.last_row else ''
+        self.stdout.write(f'Importing "{job.file_name}" (#{job.pk}){resume}')
+        job = user_import.run_job(job, chunk_size=options['chunk_size'])
+        if job.status != 'COMPLETED':
+            self.stdout.write(self.style.ERROR(f'Import #{job.pk} failed: {job.error_message}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Import #{job.pk} completed: {job.successful_imports} imported, '
+            f'{job.failed_imports} failed of {job.processed_rows} rows'
+        ))
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel import announcements
+from admin_panel.models import SystemAnnouncement
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued system announcements whose scheduled time has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--announcement-id',
+            type=int,
+            help='Deliver this announcement now, ignoring its queue position and schedule',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='With --announcement-id, also resume an announcement left SENDING by a worker that died',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for due announcements instead of exiting when none are left',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between queue checks with --loop (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        if options['announcement_id']:
+            try:
+                announcement = SystemAnnouncement.objects.get(pk=options['announcement_id'])
+            except SystemAnnouncement.DoesNotExist:
+                raise CommandError(f"Announcement {options['announcement_id']} does not exist")
+            if announcement.delivery_status == 'SENDING' and not options['force']:
+                raise CommandError(
+                    f'Announcement {announcement.pk} is already being sent; pass --force if its worker died'
+                )
+            self.deliver(announcement)
+            return
+
+        while True:
+            announcement = announcements.claim_due_announcement()
+            if announcement is not None:
+                self.deliver(announcement)
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def deliver(self, announcement):
+        self.stdout.write(f'Sending "{announcement.title}" (#{announcement.pk})')
+        started = time.monotonic()
+        announcement = announcements.deliver_announcement(announcement)
+        if announcement.delivery_status != 'SENT':
+            self.stdout.write(self.style.ERROR(
+                f'Announcement #{announcement.pk} failed: {announcement.delivery_error}'
+            ))
+            return
+
+        seconds = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Announcement #{announcement.pk} delivered to {announcement.recipients_delivered} '
+            f'recipients in {seconds:.1f}s'
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+def backfill_activity(apps, schema_editor):
+    """Classify existing rows with the substring rules the feed used to apply per request"""
+    SystemLog = apps.get_model('admin_panel', 'SystemLog')
+    rules = [
+        ('login', 'user_login'),
+        ('register', 'user_registration'),
+        ('create', 'course_created'),
+        ('submit', 'assignment_submitted'),
+        ('message', 'message_sent'),
+    ]
+    batch_size = 2000
+    last_id = 0
+    while True:
+        logs = list(
+            SystemLog.objects.filter(id__gt=last_id)
+            .select_related('user')
+            .order_by('id')[:batch_size]
+        )
+        if not logs:
+            break
+        for log in logs:
+            text = log.message.lower()
+            activity_type = next((value for needle, value in rules if needle in text), None)
+            if activity_type is None:
+                activity_type = 'system_alert' if log.level in ['ERROR', 'CRITICAL'] else 'other'
+            log.activity_type = activity_type
+            if log.user:
+                log.actor_display = (log.user.get_full_name() or log.user.username)[:150]
+            else:
+                log.actor_display = 'System'
+        SystemLog.objects.bulk_update(logs, ['activity_type', 'actor_display'])
+        last_id = logs[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0002_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemlog',
+            name='activity_type',
+            field=models.CharField(choices=[('user_login', 'User Login'), ('user_registration', 'User Registration'), ('user_created', 'User Created'), ('user_updated', 'User Updated'), ('user_deleted', 'User Deleted'), ('user_activated', 'User Activated'), ('user_deactivated', 'User Deactivated'), ('password_reset', 'Password Reset'), ('user_imported', 'User Imported'), ('bulk_action', 'Bulk Action'), ('course_created', 'Course Created'), ('assignment_submitted', 'Assignment Submitted'), ('message_sent', 'Message Sent'), ('backup_started', 'Backup Started'), ('announcement_sent', 'Announcement Sent'), ('system_alert', 'System Alert'), ('other', 'Other')], default='other', help_text='Activity classification recorded at write time', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='systemlog',
+            name='actor_display',
+            field=models.CharField(blank=True, help_text='Display name of the acting user', max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['activity_type', 'created_at', 'id'], name='admin_panel_activit_48be56_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['created_at', 'id'], name='admin_panel_created_a5d38c_idx'),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
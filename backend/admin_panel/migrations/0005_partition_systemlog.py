@@ -0,0 +1,159 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:02
+
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# A frozen copy of the SQL in admin_panel.log_partitions as of this
+# migration, so later changes to that module cannot change what it does
+TABLE = 'admin_panel_systemlog'
+UNPARTITIONED_TABLE = f'{TABLE}_unpartitioned'
+DEFAULT_PARTITION = f'{TABLE}_default'
+SEQUENCE = f'{TABLE}_id_seq'
+
+
+def get_interval():
+    return getattr(settings, 'SYSTEM_LOG_PARTITION_INTERVAL', 'month')
+
+
+def period_start(day, interval):
+    return day if interval == 'day' else day.replace(day=1)
+
+
+def next_period(start, interval):
+    if interval == 'day':
+        return start + timedelta(days=1)
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def to_datetime(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def columns(cursor, table):
+    cursor.execute(
+        "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass "
+        "AND attnum > 0 AND NOT attisdropped AND attgenerated = '' ORDER BY attnum",
+        [table]
+    )
+    return ', '.join(f'"{row[0]}"' for row in cursor.fetchall())
+
+
+def create_partitions(cursor, first_day, last_day, interval):
+    start = period_start(first_day, interval)
+    while start <= last_day:
+        end = next_period(start, interval)
+        name = f"{TABLE}_p{start.strftime('%Y_%m_%d' if interval == 'day' else '%Y_%m')}"
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+            [to_datetime(start), to_datetime(end)]
+        )
+        start = end
+
+
+def rebuild(cursor, source, partitioned, first_day=None, last_day=None):
+    """
+    Recreate TABLE from source with or without partitioning, carrying over
+    rows, indexes, foreign keys and the id sequence
+    """
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [source, source]
+    )
+    index_defs = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [source]
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{source}"')
+    max_id = cursor.fetchone()[0]
+
+    cursor.execute(f"SELECT pg_get_serial_sequence('\"{source}\"', 'id')")
+    sequence = cursor.fetchone()[0]
+    if sequence and not partitioned:
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+    cursor.execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{source}" INCLUDING CONSTRAINTS INCLUDING GENERATED)'
+        + (' PARTITION BY RANGE (created_at)' if partitioned else '')
+    )
+    if partitioned:
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+        create_partitions(cursor, first_day, last_day, get_interval())
+
+    column_list = columns(cursor, TABLE)
+    cursor.execute(f'INSERT INTO "{TABLE}" ({column_list}) SELECT {column_list} FROM "{source}"')
+    cursor.execute(f'DROP TABLE "{source}"')
+
+    primary_key = '(id, created_at)' if partitioned else '(id)'
+    cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY {primary_key}')
+    for index_def in index_defs:
+        cursor.execute(re.sub(rf'ON (ONLY )?(\S+\.)?"?{source}"?', f'ON "{TABLE}"', index_def, count=1))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+    if partitioned or not sequence:
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCE}"')
+        sequence = f'"{SEQUENCE}"'
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{TABLE}".id')
+    cursor.execute(f"ALTER TABLE \"{TABLE}\" ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+    cursor.execute(f"SELECT setval('{sequence}'::regclass, %s, %s)", [max(max_id, 1), max_id > 0])
+
+
+def partition_systemlog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+        interval = get_interval()
+        cursor.execute(f'SELECT MIN(created_at), MAX(created_at) FROM "{TABLE}"')
+        oldest, newest = cursor.fetchone()
+        today = timezone.now().date()
+        first_day = oldest.date() if oldest else today
+        last_day = max(newest.date() if newest else today, today)
+        for _ in range(3):
+            last_day = next_period(period_start(last_day, interval), interval)
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{UNPARTITIONED_TABLE}"')
+        rebuild(cursor, UNPARTITIONED_TABLE, partitioned=True, first_day=first_day, last_day=last_day)
+
+
+def unpartition_systemlog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return
+        cursor.execute(f"SELECT pg_get_serial_sequence('\"{TABLE}\"', 'id')")
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{UNPARTITIONED_TABLE}"')
+        rebuild(cursor, UNPARTITIONED_TABLE, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0004_systemlog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_systemlog, unpartition_systemlog),
+    ]
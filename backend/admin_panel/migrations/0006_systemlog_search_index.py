@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:40
+
+from django.db import migrations
+
+TABLE = 'admin_panel_systemlog'
+FTS_TABLE = f'{TABLE}_fts'
+
+POSTGRES_FORWARD = [
+    f"ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('english', COALESCE(message, ''))) STORED",
+    f"CREATE INDEX {TABLE}_search_gin ON {TABLE} USING gin (search_vector)",
+]
+POSTGRES_REVERSE = [
+    f"DROP INDEX IF EXISTS {TABLE}_search_gin",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table over SystemLog.message, kept in sync by triggers.
+# SQLite rebuilds tables on most ALTERs, which drops these triggers; a later
+# migration that alters SystemLog on SQLite has to recreate them.
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"message, content='{TABLE}', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER {TABLE}_fts_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message); END",
+    f"CREATE TRIGGER {TABLE}_fts_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message); END",
+    f"CREATE TRIGGER {TABLE}_fts_au AFTER UPDATE OF message ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message); "
+    f"INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_fts_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE}_fts_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE}_fts_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run_for_vendor(postgres_sql, sqlite_sql):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres_sql,
+            'sqlite': sqlite_sql,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0005_partition_systemlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_REVERSE, SQLITE_REVERSE),
+        ),
+    ]
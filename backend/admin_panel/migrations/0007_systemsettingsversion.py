@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_systemlog_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemSettingsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'System Settings Version',
+                'verbose_name_plural': 'System Settings Version',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_systemsettingsversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systembackup',
+            name='manifest',
+            field=models.JSONField(blank=True, default=dict, help_text='Contents of the backup archive'),
+        ),
+        migrations.AddField(
+            model_name='systembackup',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Progress in percent'),
+        ),
+        migrations.AddField(
+            model_name='systembackup',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, help_text='Export throughput', null=True),
+        ),
+        migrations.AddField(
+            model_name='systembackup',
+            name='rows_written',
+            field=models.BigIntegerField(default=0, help_text='Database rows exported so far'),
+        ),
+        migrations.AlterField(
+            model_name='systembackup',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+    ]
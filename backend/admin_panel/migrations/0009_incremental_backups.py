@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0008_systembackup_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systembackup',
+            name='base_backup',
+            field=models.ForeignKey(blank=True, help_text='Backup an incremental backup builds on', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incrementals', to='admin_panel.systembackup'),
+        ),
+        migrations.AddField(
+            model_name='systembackup',
+            name='watermark',
+            field=models.DateTimeField(blank=True, help_text='Database snapshot time; the next incremental backup starts here', null=True),
+        ),
+        migrations.CreateModel(
+            name='BackupTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='app_label.model_name of the deleted row', max_length=100)),
+                ('object_pk', models.CharField(max_length=64)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Backup Tombstone',
+                'verbose_name_plural': 'Backup Tombstones',
+                'ordering': ['deleted_at'],
+                'indexes': [models.Index(fields=['deleted_at'], name='admin_panel_deleted_9ba370_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0009_incremental_backups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='delivery_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='delivery_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='delivery_status',
+            field=models.CharField(choices=[('NOT_SENT', 'Not Sent'), ('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='NOT_SENT', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='recipients_delivered',
+            field=models.PositiveIntegerField(default=0, help_text='Notifications created so far'),
+        ),
+        migrations.AddField(
+            model_name='systemannouncement',
+            name='recipients_total',
+            field=models.PositiveIntegerField(default=0, help_text='Recipients resolved so far'),
+        ),
+        migrations.AddIndex(
+            model_name='systemannouncement',
+            index=models.Index(fields=['delivery_status', 'scheduled_at'], name='admin_panel_deliver_763307_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('admin_panel', '0012_searchindexversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('file_name', models.CharField(help_text='Name of the uploaded file', max_length=255)),
+                ('file_path', models.CharField(help_text='Stored copy of the upload', max_length=500)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('options', models.JSONField(blank=True, default=dict, help_text='role, department, send_welcome_email and validate_only')),
+                ('processed_rows', models.PositiveIntegerField(default=0, help_text='Rows handled in committed chunks')),
+                ('successful_imports', models.PositiveIntegerField(default=0)),
+                ('failed_imports', models.PositiveIntegerField(default=0)),
+                ('last_row', models.PositiveIntegerField(default=0, help_text='File row number of the last committed row; a resumed job starts after it')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('warnings', models.JSONField(blank=True, default=list)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Last committed chunk of the running worker', null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='user_import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Import Job',
+                'verbose_name_plural': 'User Import Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='admin_panel_status_e1827e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserImportError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField(help_text='File row number (the header is row 1)')),
+                ('field', models.CharField(max_length=50)),
+                ('message', models.TextField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='row_errors', to='admin_panel.userimportjob')),
+            ],
+            options={
+                'verbose_name': 'User Import Error',
+                'verbose_name_plural': 'User Import Errors',
+                'ordering': ['job', 'row', 'id'],
+                'indexes': [models.Index(fields=['job', 'row'], name='admin_panel_job_id_84f636_idx')],
+            },
+        ),
+    ]
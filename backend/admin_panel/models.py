@@ -19,12 +19,49 @@ class SystemSettings(models.Model):
     def __str__(self):
         return f"{self.key}: {self.value}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        SystemSettingsVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        SystemSettingsVersion.bump()
+        return result
+
     class Meta:
         verbose_name = "System Setting"
         verbose_name_plural = "System Settings"
         ordering = ['category', 'key']
 
 
+class SystemSettingsVersion(models.Model):
+    """
+    Single-row change counter for SystemSettings
+
+    Every process caches the settings in memory and compares this version
+    to decide when its snapshot is stale.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"System settings version {self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Increment the version (in the caller's transaction)"""
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1, updated_at=timezone.now()):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    class Meta:
+        verbose_name = "System Settings Version"
+        verbose_name_plural = "System Settings Version"
+
+
 class SystemLog(models.Model):
     """
     System activity logs
@@ -47,10 +84,33 @@ class SystemLog(models.Model):
         ('API', 'API'),
     ]
 
+    ACTIVITY_TYPES = [
+        ('user_login', 'User Login'),
+        ('user_registration', 'User Registration'),
+        ('user_created', 'User Created'),
+        ('user_updated', 'User Updated'),
+        ('user_deleted', 'User Deleted'),
+        ('user_activated', 'User Activated'),
+        ('user_deactivated', 'User Deactivated'),
+        ('password_reset', 'Password Reset'),
+        ('user_imported', 'User Imported'),
+        ('bulk_action', 'Bulk Action'),
+        ('course_created', 'Course Created'),
+        ('assignment_submitted', 'Assignment Submitted'),
+        ('message_sent', 'Message Sent'),
+        ('backup_started', 'Backup Started'),
+        ('announcement_sent', 'Announcement Sent'),
+        ('system_alert', 'System Alert'),
+        ('other', 'Other'),
+    ]
+
     level = models.CharField(max_length=10, choices=LOG_LEVELS, default='INFO')
     category = models.CharField(max_length=20, choices=LOG_CATEGORIES, default='SYSTEM')
     message = models.TextField(help_text="Log message")
+    activity_type = models.CharField(max_length=30, choices=ACTIVITY_TYPES, default='other',
+                                     help_text="Activity classification recorded at write time")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    actor_display = models.CharField(max_length=150, blank=True, help_text="Display name of the acting user")
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     request_path = models.CharField(max_length=500, blank=True)
@@ -58,7 +118,8 @@ class SystemLog(models.Model):
     response_status = models.IntegerField(null=True, blank=True)
     execution_time = models.FloatField(null=True, blank=True, help_text="Execution time in seconds")
     extra_data = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is built rather than when a buffered batch is flushed
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.level} - {self.message[:50]}"
@@ -71,6 +132,8 @@ class SystemLog(models.Model):
             models.Index(fields=['level', 'created_at']),
             models.Index(fields=['category', 'created_at']),
             models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['activity_type', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
 
@@ -87,6 +150,7 @@ class SystemBackup(models.Model):
 
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
+        ('QUEUED', 'Queued'),
         ('RUNNING', 'Running'),
         ('COMPLETED', 'Completed'),
         ('FAILED', 'Failed'),
@@ -101,6 +165,14 @@ class SystemBackup(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Progress in percent")
+    rows_written = models.BigIntegerField(default=0, help_text="Database rows exported so far")
+    rows_per_second = models.FloatField(null=True, blank=True, help_text="Export throughput")
+    manifest = models.JSONField(default=dict, blank=True, help_text="Contents of the backup archive")
+    watermark = models.DateTimeField(null=True, blank=True,
+                                     help_text="Database snapshot time; the next incremental backup starts here")
+    base_backup = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='incrementals', help_text="Backup an incremental backup builds on")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -112,6 +184,26 @@ class SystemBackup(models.Model):
         ordering = ['-created_at']
 
 
+class BackupTombstone(models.Model):
+    """
+    Record of a deleted row, so incremental backups can replay deletes
+    """
+    model = models.CharField(max_length=100, help_text="app_label.model_name of the deleted row")
+    object_pk = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.model} #{self.object_pk} deleted at {self.deleted_at}"
+
+    class Meta:
+        verbose_name = "Backup Tombstone"
+        verbose_name_plural = "Backup Tombstones"
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['deleted_at']),
+        ]
+
+
 class SystemAnnouncement(models.Model):
     """
     System-wide announcements
@@ -123,6 +215,14 @@ class SystemAnnouncement(models.Model):
         ('URGENT', 'Urgent'),
     ]
 
+    DELIVERY_STATUS_CHOICES = [
+        ('NOT_SENT', 'Not Sent'),
+        ('QUEUED', 'Queued'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
     title = models.CharField(max_length=200, help_text="Announcement title")
     message = models.TextField(help_text="Announcement message")
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='MEDIUM')
@@ -131,6 +231,12 @@ class SystemAnnouncement(models.Model):
     is_active = models.BooleanField(default=True, help_text="Whether announcement is active")
     scheduled_at = models.DateTimeField(null=True, blank=True, help_text="Scheduled delivery time")
     expires_at = models.DateTimeField(null=True, blank=True, help_text="Expiration time")
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_STATUS_CHOICES, default='NOT_SENT')
+    recipients_total = models.PositiveIntegerField(default=0, help_text="Recipients resolved so far")
+    recipients_delivered = models.PositiveIntegerField(default=0, help_text="Notifications created so far")
+    delivery_started_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    delivery_error = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_announcements')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -142,6 +248,9 @@ class SystemAnnouncement(models.Model):
         verbose_name = "System Announcement"
         verbose_name_plural = "System Announcements"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['delivery_status', 'scheduled_at']),
+        ]
 
 
 class EmailTemplate(models.Model):
@@ -208,4 +317,159 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['user', 'created_at']),
-        ]
\ No newline at end of file
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable user, course, department or program for the admin search
+
+    Holds everything a search result displays, so results come back from the
+    index without touching the source tables.
+    """
+    ENTITY_TYPES = [
+        ('user', 'User'),
+        ('course', 'Course'),
+        ('department', 'Department'),
+        ('program', 'Program'),
+    ]
+
+    entity_type = models.CharField(max_length=20, choices=ENTITY_TYPES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    description = models.CharField(max_length=255, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.entity_type} #{self.object_id}: {self.title}"
+
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'object_id'], name='admin_search_document_unique'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """
+    Inverted-index entry: a lower-cased token of a SearchDocument and its weight
+
+    Prefix lookups (term LIKE 'abc%') are served by the index on term.
+    """
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64, db_index=True)
+    weight = models.PositiveSmallIntegerField(default=1, help_text="Higher for codes and names than for descriptions")
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+    class Meta:
+        verbose_name = "Search Term"
+        verbose_name_plural = "Search Terms"
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'term'], name='admin_search_term_unique'),
+        ]
+
+
+class SearchIndexVersion(models.Model):
+    """
+    Change counter per searchable entity type
+
+    Bumped whenever a user, course, department or program is written, so
+    each process's in-memory typeahead index knows which entity types to
+    reload. Indexed writes go through search_index.bump_version, which bumps
+    each entity type once per transaction, after it commits.
+    """
+    entity_type = models.CharField(max_length=20, unique=True, choices=SearchDocument.ENTITY_TYPES)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.entity_type} search version {self.version}"
+
+    @classmethod
+    def current(cls):
+        """Return {entity type: version}"""
+        return dict(cls.objects.values_list('entity_type', 'version'))
+
+    @classmethod
+    def bump(cls, entity_type):
+        """Increment the version of an entity type (in the caller's transaction)"""
+        updated = cls.objects.filter(entity_type=entity_type).update(
+            version=models.F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(entity_type=entity_type, defaults={'version': 1})
+
+    class Meta:
+        verbose_name = "Search Index Version"
+        verbose_name_plural = "Search Index Versions"
+
+
+class UserImportJob(models.Model):
+    """
+    Bulk user import run by the run_user_imports worker
+
+    Progress is saved in the same transaction as each chunk of rows, so a
+    job interrupted by a crash resumes after last_row.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    file_name = models.CharField(max_length=255, help_text="Name of the uploaded file")
+    file_path = models.CharField(max_length=500, help_text="Stored copy of the upload")
+    file_size = models.BigIntegerField(default=0)
+    options = models.JSONField(default=dict, blank=True,
+                               help_text="role, department, send_welcome_email and validate_only")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='user_import_jobs')
+    processed_rows = models.PositiveIntegerField(default=0, help_text="Rows handled in committed chunks")
+    successful_imports = models.PositiveIntegerField(default=0)
+    failed_imports = models.PositiveIntegerField(default=0)
+    last_row = models.PositiveIntegerField(default=0,
+                                           help_text="File row number of the last committed row; a resumed job starts after it")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    warnings = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last committed chunk of the running worker")
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.file_name} - {self.status}"
+
+    class Meta:
+        verbose_name = "User Import Job"
+        verbose_name_plural = "User Import Jobs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class UserImportError(models.Model):
+    """
+    Rejected row of a UserImportJob, for the downloadable error report
+    """
+    job = models.ForeignKey(UserImportJob, on_delete=models.CASCADE, related_name='row_errors')
+    row = models.PositiveIntegerField(help_text="File row number (the header is row 1)")
+    field = models.CharField(max_length=50)
+    message = models.TextField()
+
+    def __str__(self):
+        return f"Row {self.row} {self.field}: {self.message}"
+
+    class Meta:
+        verbose_name = "User Import Error"
+        verbose_name_plural = "User Import Errors"
+        ordering = ['job', 'row', 'id']
+        indexes = [
+            models.Index(fields=['job', 'row']),
+        ]
@@ -0,0 +1,258 @@
+"""
+Server-Sent Events stream of admin notifications
+
+Each web process keeps one NotificationBroker. Open streams subscribe to it
+with an asyncio queue; saving a Notification (or changing its read state
+through the notification views) publishes an event to the recipient's
+queues once the transaction commits, so a connected user who receives
+nothing costs no database work at all.
+
+Notifications created by other processes (workers, management commands,
+other web workers) are picked up by one poller thread per process that looks
+for new rows of the subscribed users every NOTIFICATION_STREAM_POLL_INTERVAL
+seconds; set it to 0 for single-process deployments. The poller only runs
+while at least one stream is open.
+
+Events:
+    notification: A new notification (compact payload); the client counts
+        it as unread if is_read is false
+    unread: {"delta": n} after notifications were read or deleted, or
+        {"count": n} with the absolute unread count
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from communications import counters
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_FIELDS = ('id', 'user_id', 'title', 'message', 'type', 'is_read', 'created_at', 'metadata')
+# Notification ids a stream remembers to drop duplicates of events published
+# both in-process and by the poller
+SEEN_IDS = 512
+
+
+def notification_payload(notification):
+    """Compact event payload for a Notification instance or values() row"""
+    if isinstance(notification, dict):
+        row = notification
+    else:
+        row = {field: getattr(notification, field) for field in PAYLOAD_FIELDS}
+    return {field: row[field] for field in PAYLOAD_FIELDS if field != 'user_id'}
+
+
+def format_event(event, data, event_id=None):
+    """Encode one SSE frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """One open stream: an asyncio queue fed from any thread"""
+
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self._seen = deque(maxlen=SEEN_IDS)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def is_new(self, notification_id):
+        """Whether a notification has not been sent on this stream yet"""
+        if notification_id in self._seen:
+            return False
+        self._seen.append(notification_id)
+        return True
+
+
+class NotificationBroker:
+    """In-process pub/sub of notification events, keyed by user id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._poller = None
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        self.ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscribed_user_ids(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def publish(self, user_id, event, data):
+        """Send an event to every stream of a user (callable from any thread)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put((event, data))
+            except RuntimeError:
+                # The stream's event loop has closed
+                self.unsubscribe(subscription)
+
+    def ensure_poller(self):
+        interval = getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 5.0)
+        if not interval:
+            return
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = NotificationPoller(self, interval)
+                self._poller.start()
+
+
+class NotificationPoller(threading.Thread):
+    """
+    Publish notifications saved by other processes
+
+    Each pass reads the subscribed users' rows created since the previous
+    pass (minus a small overlap for transactions that committed late);
+    streams drop the ones they already sent.
+    """
+
+    overlap = timedelta(seconds=2)
+
+    def __init__(self, broker, interval):
+        super().__init__(name='notification-poller', daemon=True)
+        self.broker = broker
+        self.interval = interval
+        self.since = timezone.now()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            user_ids = self.broker.subscribed_user_ids()
+            if not user_ids:
+                self.since = timezone.now()
+                continue
+            try:
+                self.poll(user_ids)
+            except Exception as e:
+                logger.error(f"Notification poller error: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def poll(self, user_ids):
+        started = timezone.now()
+        rows = (
+            Notification.objects.filter(user_id__in=user_ids, created_at__gte=self.since - self.overlap)
+            .order_by('created_at', 'id')
+            .values(*PAYLOAD_FIELDS)
+        )
+        for row in rows:
+            self.broker.publish(row['user_id'], 'notification', notification_payload(row))
+        self.since = started
+
+
+notification_broker = NotificationBroker()
+
+
+def publish_notification(notification):
+    """Push a saved notification to its recipient's streams after commit"""
+    payload = notification_payload(notification)
+    transaction.on_commit(
+        lambda: notification_broker.publish(notification.user_id, 'notification', payload)
+    )
+
+
+def publish_unread(user_id, delta=None, count=None):
+    """Push an unread-count change ({delta}) or value ({count}) after commit"""
+    data = {'delta': delta} if count is None else {'count': count}
+    transaction.on_commit(lambda: notification_broker.publish(user_id, 'unread', data))
+
+
+def notification_saved(sender, instance, created, **kwargs):
+    if created:
+        publish_notification(instance)
+
+
+def connect_notification_signals():
+    """Publish every newly saved Notification (called from AppConfig.ready)"""
+    post_save.connect(notification_saved, sender=Notification, dispatch_uid='admin_notification_stream')
+
+
+def stream_backlog(user, last_event_id):
+    """Unread count and, when resuming, the notifications missed since last_event_id"""
+    unread = counters.get_counts(user)['admin_notifications']
+    missed = []
+    if last_event_id:
+        missed = list(
+            Notification.objects.filter(user=user, id__gt=last_event_id)
+            .order_by('id')
+            .values(*PAYLOAD_FIELDS)[:50]
+        )
+    return unread, missed
+
+
+async def event_stream(user, last_event_id=None):
+    """
+    Yield SSE frames for a user until NOTIFICATION_STREAM_MAX_AGE passes
+
+    The client reconnects afterwards (sending Last-Event-ID), which bounds
+    how long a dropped connection can hold a subscription.
+    """
+    keepalive = getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 15)
+    max_age = getattr(settings, 'NOTIFICATION_STREAM_MAX_AGE', 300)
+    retry_ms = int(getattr(settings, 'NOTIFICATION_STREAM_RETRY', 3) * 1000)
+
+    # Subscribe before reading the backlog so nothing saved in between is lost
+    subscription = notification_broker.subscribe(user.pk)
+    try:
+        unread, missed = await sync_to_async(stream_backlog)(user, last_event_id)
+        yield f'retry: {retry_ms}\n\n'
+        for row in missed:
+            subscription.is_new(row['id'])
+            yield format_event('notification', notification_payload(row), event_id=row['id'])
+        # Sent after the missed notifications so it overrides their increments
+        yield format_event('unread', {'count': unread})
+
+        deadline = time.monotonic() + max_age
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event, data = await asyncio.wait_for(subscription.queue.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event == 'notification':
+                if not subscription.is_new(data['id']):
+                    continue
+                yield format_event(event, data, event_id=data['id'])
+            else:
+                yield format_event(event, data)
+    finally:
+        notification_broker.unsubscribe(subscription)
@@ -0,0 +1,656 @@
+"""
+Restore the database (and media files) from backup archives
+
+The models in a backup are ordered by their foreign keys into dependency
+levels. Models in the same level don't reference each other, so their
+chunk files are loaded in parallel by a process pool, each through chunked
+bulk_create inside a transaction with constraint checks deferred.
+Incremental backups are replayed in order on top of the full backup they
+build on: changed rows are upserted, and rows tombstoned later in the chain
+are skipped while loading.
+
+Before anything is cleared, references between restored tables are checked
+against the rows that will exist after the replay. Rows a deleted parent
+would have cascaded to are skipped and SET_NULL references to it are
+cleared; any other dangling reference aborts the restore. A restore with
+one worker (always, on SQLite) runs in a single transaction.
+
+A parallel restore is not atomic: the tables are cleared in one
+transaction and every worker commits its own. To keep a failure after the
+clear unlikely, every chunk file is checked against its manifest checksum
+before anything is cleared; if loading still fails, the restored tables are
+left partly loaded and the restore has to be run again.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, connections, models as db_models, transaction
+
+from . import backup as backup_engine
+
+logger = logging.getLogger(__name__)
+
+
+class RestoreError(Exception):
+    pass
+
+
+def read_manifest(directory):
+    path = Path(directory) / backup_engine.MANIFEST_NAME
+    if not path.exists():
+        raise RestoreError(f'No backup manifest in {directory}')
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != backup_engine.FORMAT_VERSION:
+        raise RestoreError(f"Unsupported backup format {manifest.get('format')} in {directory}")
+    return manifest
+
+
+def resolve_chain(backup=None, paths=None):
+    """
+    Return [(directory, manifest), ...] to replay, oldest first
+
+    Either a SystemBackup (whose incremental chain is followed) or backup
+    directories given explicitly in replay order.
+    """
+    if backup is not None:
+        if backup.status != 'COMPLETED':
+            raise RestoreError(f'Backup #{backup.pk} is not completed')
+        try:
+            directories = [Path(item.file_path) for item in backup_engine.backup_chain(backup)]
+        except ValueError as e:
+            raise RestoreError(str(e))
+    else:
+        directories = [Path(path) for path in paths or []]
+    if not directories:
+        raise RestoreError('Nothing to restore')
+
+    chain = [(directory, read_manifest(directory)) for directory in directories]
+    database_parts = [manifest for _, manifest in chain if manifest.get('database')]
+    if database_parts and database_parts[0]['backup_type'] == 'INCREMENTAL':
+        raise RestoreError('A restore chain must start with a full or database backup')
+    return chain
+
+
+def foreign_key_targets(model):
+    """Models this model's concrete foreign keys point at (excluding itself)"""
+    targets = set()
+    for field in model._meta.concrete_fields:
+        if field.is_relation and field.remote_field and field.related_model not in (None, model):
+            targets.add(field.related_model._meta.concrete_model)
+    return targets
+
+
+def is_self_referential(model):
+    return any(
+        field.is_relation and field.related_model is model
+        for field in model._meta.concrete_fields
+    )
+
+
+def dependency_levels(models):
+    """
+    Group models into levels where each level only references earlier ones
+
+    Models in a foreign-key cycle end up together in a final level, which is
+    loaded in a single transaction.
+
+    Returns:
+        list: (models, cyclic) tuples in load order
+    """
+    remaining = set(models)
+    dependencies = {model: foreign_key_targets(model) & remaining for model in models}
+    levels = []
+    while remaining:
+        ready = [model for model in remaining if not (dependencies[model] & remaining)]
+        if not ready:
+            levels.append((sorted(remaining, key=backup_engine.model_label), True))
+            break
+        levels.append((sorted(ready, key=backup_engine.model_label), False))
+        remaining -= set(ready)
+    return levels
+
+
+def iter_lines(path):
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            yield line
+
+
+def verify_entry(directory, entry):
+    """
+    Recompute the checksum and row count of one model (or tombstone) entry
+
+    Returns:
+        dict: label, rows, expected rows, ok flag and error if any
+    """
+    checksum = hashlib.sha256()
+    rows = 0
+    try:
+        for name in entry['files']:
+            for line in iter_lines(Path(directory) / name):
+                checksum.update(line)
+                rows += 1
+    except (OSError, EOFError) as e:
+        return {'model': entry.get('model', 'tombstones'), 'rows': rows, 'ok': False, 'error': str(e)}
+
+    ok = rows == entry['rows'] and ('checksum' not in entry or checksum.hexdigest() == entry['checksum'])
+    return {
+        'model': entry.get('model', 'tombstones'),
+        'rows': rows,
+        'expected_rows': entry['rows'],
+        'ok': ok,
+        'error': '' if ok else 'checksum or row count mismatch',
+    }
+
+
+def _defer_constraints():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def _fields(model, names):
+    by_attname = {field.attname: field for field in model._meta.concrete_fields}
+    missing = [name for name in names if name not in by_attname]
+    if missing:
+        raise RestoreError(f"{backup_engine.model_label(model)} has no fields {', '.join(missing)}")
+    return [by_attname[name] for name in names]
+
+
+def _row_builder(model, fields, skip=(), nullify=None):
+    """
+    Return build(line) -> model instance, or None for a row in skip
+
+    nullify maps attnames to values that are replaced by None.
+    """
+    converters = [field.to_python for field in _fields(model, fields)]
+    pk_index = fields.index(model._meta.pk.attname)
+    nullify = nullify or {}
+
+    def build(line):
+        values = [
+            None if value is None else convert(value)
+            for convert, value in zip(converters, json.loads(line))
+        ]
+        if values[pk_index] in skip:
+            return None
+        row = dict(zip(fields, values))
+        for name, dangling in nullify.items():
+            if row[name] in dangling:
+                row[name] = None
+        return model(**row)
+    return build
+
+
+def iter_values(step, names):
+    """Yield tuples of the named (converted) column values of every row in a step"""
+    model = apps.get_model(step['model'])
+    fields = _fields(model, step['fields'])
+    indexes = [step['fields'].index(name) for name in names]
+    for path in step['files']:
+        for line in iter_lines(path):
+            values = json.loads(line)
+            yield tuple(
+                None if values[index] is None else fields[index].to_python(values[index])
+                for index in indexes
+            )
+
+
+def load_step(step, batch_size):
+    """
+    Load one chunk file (or several, for incremental steps) into a model
+
+    step: {'model', 'files': [paths], 'fields', 'mode', 'skip', 'nullify'}
+    where mode is 'insert', 'upsert' (update rows that already exist) or
+    'ignore' (skip rows that already exist), skip holds pks not to load and
+    nullify the foreign key values to clear
+
+    Returns:
+        tuple: (rows loaded, rows skipped)
+    """
+    model = apps.get_model(step['model'])
+    build = _row_builder(model, step['fields'], step.get('skip', ()), step.get('nullify'))
+    options = {}
+    if step['mode'] == 'upsert':
+        options = {
+            'update_conflicts': True,
+            'unique_fields': [model._meta.pk.name],
+            'update_fields': [field.name for field in model._meta.concrete_fields if not field.primary_key],
+        }
+    elif step['mode'] == 'ignore':
+        options = {'ignore_conflicts': True}
+
+    rows = 0
+    skipped = 0
+    batch = []
+    for path in step['files']:
+        for line in iter_lines(path):
+            instance = build(line)
+            if instance is None:
+                skipped += 1
+                continue
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                model._base_manager.bulk_create(batch, **options)
+                rows += len(batch)
+                batch = []
+    if batch:
+        model._base_manager.bulk_create(batch, **options)
+        rows += len(batch)
+    return rows, skipped
+
+
+def run_task(task):
+    """
+    Run a list of load steps in one transaction (process pool entry point)
+
+    Returns:
+        list: (model label, rows, skipped rows, seconds) per step
+    """
+    results = []
+    with transaction.atomic():
+        _defer_constraints()
+        for step in task['steps']:
+            started = time.monotonic()
+            rows, skipped = load_step(step, task['batch_size'])
+            results.append((step['model'], rows, skipped, time.monotonic() - started))
+    return results
+
+
+def model_steps(item):
+    return ([item['base']] if item['base'] else []) + item['incremental']
+
+
+def references(models):
+    """
+    Foreign keys between the given models
+
+    Returns:
+        dict: {model: [(field, target model), ...]}
+    """
+    result = {}
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if not (field.many_to_one or field.one_to_one):
+                continue
+            target = field.related_model._meta.concrete_model
+            if target in models and field.target_field.primary_key:
+                result.setdefault(model, []).append((field, target))
+    return result
+
+
+class Restorer:
+    """
+    Replays a backup chain into the current database
+    """
+
+    def __init__(self, chain, workers=None, batch_size=2000, stdout=None, restore_files=True):
+        self.chain = chain
+        self.batch_size = batch_size
+        self.restore_files = restore_files
+        self.stdout = stdout
+        if connection.vendor == 'sqlite':
+            # SQLite allows a single writer, so parallel loading only adds lock contention
+            workers = 1
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.stats = {}
+        # Set once clear() has committed
+        self.cleared = False
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+        else:
+            logger.info(message)
+
+    def database_parts(self):
+        return [(directory, manifest['database']) for directory, manifest in self.chain if manifest.get('database')]
+
+    def plan(self):
+        """
+        Work out, per model, the base load and incremental steps to replay
+
+        Every step skips the rows tombstoned by a later backup in the chain;
+        'delete' lists the tombstoned pks of models only replayed
+        incrementally, to be deleted from the existing rows.
+
+        Returns:
+            dict: {model: {'base': step or None, 'incremental': [steps], 'delete': [pks]}}
+        """
+        append_only = backup_engine.append_only_models()
+        plan = {}
+        for part, (directory, database) in enumerate(self.database_parts()):
+            for entry in database['models']:
+                try:
+                    model = apps.get_model(entry['model'])
+                except LookupError:
+                    self.log(f"Skipping {entry['model']}: model no longer exists")
+                    continue
+                item = plan.setdefault(model, {'base': None, 'incremental': [], 'tombstones': []})
+                files = [str(Path(directory) / name) for name in entry['files']]
+                step = {'model': entry['model'], 'files': files, 'fields': entry['fields'], 'part': part}
+                if entry.get('strategy', 'full') == 'full':
+                    # A full copy supersedes everything replayed before it
+                    item['base'] = dict(step, mode='insert')
+                    item['incremental'] = []
+                    item['tombstones'] = []
+                elif files:
+                    mode = 'ignore' if entry['model'] in append_only else 'upsert'
+                    item['incremental'].append(dict(step, mode=mode))
+
+            tombstones = database.get('tombstones') or {}
+            for name in tombstones.get('files', []):
+                for line in iter_lines(Path(directory) / name):
+                    label, object_pk, _ = json.loads(line)
+                    try:
+                        model = apps.get_model(label)
+                    except LookupError:
+                        continue
+                    if model in plan:
+                        plan[model]['tombstones'].append((part, model._meta.pk.to_python(object_pk)))
+
+        for item in plan.values():
+            tombstones = item.pop('tombstones')
+            for step in model_steps(item):
+                step['skip'] = {pk for part, pk in tombstones if part > step['part']}
+            item['delete'] = [] if item['base'] else [pk for _, pk in tombstones]
+        return plan
+
+    def check_references(self, plan):
+        """
+        Make sure every restored foreign key will point at a restored row
+
+        Reads the chunk files before anything is cleared. Rows whose parent
+        was deleted are added to their steps' skip sets when the key cascades,
+        and the dangling values are added to the steps' nullify maps when it
+        is SET_NULL; otherwise a RestoreError is raised.
+
+        Returns:
+            int: Number of rows skipped because their parent is gone
+        """
+        pks = {}
+        for model, item in plan.items():
+            pk_name = model._meta.pk.attname
+            pks[model] = {
+                pk for step in model_steps(item) for (pk,) in iter_values(step, [pk_name]) if pk not in step['skip']
+            }
+            if item['base'] is None:
+                existing = model._base_manager.exclude(pk__in=item['delete']).values_list('pk', flat=True)
+                pks[model].update(existing.iterator())
+
+        relations = references(set(plan))
+        nullify = {model: {} for model in relations}
+        dropped = {model: set() for model in plan}
+        pending = set(relations)
+        while pending:
+            changed = set()
+            for model in pending:
+                fields = relations[model]
+                names = [model._meta.pk.attname] + [field.attname for field, _ in fields]
+                seen = set()
+                # Only the last version of a row in the chain is loaded in the end
+                for step in reversed(model_steps(plan[model])):
+                    for pk, *values in iter_values(step, names):
+                        if pk in seen or pk in step['skip'] or pk in dropped[model]:
+                            continue
+                        seen.add(pk)
+                        for (field, target), value in zip(fields, values):
+                            if value is None or value in pks[target]:
+                                continue
+                            on_delete = field.remote_field.on_delete
+                            if on_delete is db_models.SET_NULL:
+                                nullify[model].setdefault(field.attname, set()).add(value)
+                            elif on_delete is db_models.CASCADE:
+                                dropped[model].add(pk)
+                                pks[model].discard(pk)
+                                changed.add(model)
+                                break
+                            else:
+                                raise RestoreError(
+                                    f'{backup_engine.model_label(model)} #{pk} references '
+                                    f'{backup_engine.model_label(target)} #{value}, which is not in the backup'
+                                )
+            pending = {model for model, fields in relations.items() if any(target in changed for _, target in fields)}
+
+        for model, item in plan.items():
+            for step in model_steps(item):
+                step['skip'] |= dropped[model]
+                if nullify.get(model):
+                    step['nullify'] = nullify[model]
+        return sum(len(pk_set) for pk_set in dropped.values())
+
+    def verify(self):
+        """Check every chunk file against the manifest checksums"""
+        jobs = []
+        for directory, database in self.database_parts():
+            for entry in database['models']:
+                jobs.append((directory, entry))
+            if database.get('tombstones'):
+                jobs.append((directory, database['tombstones']))
+
+        started = time.monotonic()
+        if self.workers > 1:
+            with self._pool() as pool:
+                results = list(pool.map(verify_entry, *zip(*jobs))) if jobs else []
+        else:
+            results = [verify_entry(directory, entry) for directory, entry in jobs]
+        seconds = time.monotonic() - started
+        rows = sum(result['rows'] for result in results)
+        self.stats = {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds if seconds else None}
+        return results
+
+    def _pool(self):
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Workers start clean and set Django up before unpickling any task
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+
+    def run(self):
+        plan = self.plan()
+        if not plan:
+            raise RestoreError('The backup contains no database tables')
+        levels = dependency_levels(list(plan))
+        started = time.monotonic()
+        if self.workers > 1:
+            # Worker processes load in transactions of their own, so nothing
+            # can be rolled back once the tables are cleared: refuse to start
+            # unless every chunk is intact
+            failed = [result for result in self.verify() if not result['ok']]
+            if failed:
+                raise RestoreError(
+                    f"{len(failed)} backup entries failed verification ({failed[0]['model']}: "
+                    f"{failed[0]['error']}); nothing was restored"
+                )
+            self.stats = {}
+        # Nothing has been changed yet if this fails
+        self.check_references(plan)
+
+        if self.workers > 1:
+            try:
+                total_rows, deleted = self.load(plan, levels)
+                connection.check_constraints(table_names=[model._meta.db_table for model in plan])
+            except Exception as e:
+                if not self.cleared:
+                    raise
+                raise RestoreError(
+                    f'Parallel restore failed after the tables were cleared; they are partly loaded. '
+                    f'Run the restore again (--workers 1 restores in a single transaction): {e}'
+                ) from e
+        else:
+            with transaction.atomic():
+                _defer_constraints()
+                total_rows, deleted = self.load(plan, levels)
+                try:
+                    connection.check_constraints(table_names=[model._meta.db_table for model in plan])
+                except IntegrityError as e:
+                    raise RestoreError(f'The restored data is inconsistent: {e}')
+        seconds = time.monotonic() - started
+        self.stats['total'] = {
+            'rows': total_rows,
+            'deleted': deleted,
+            'seconds': seconds,
+            'rows_per_second': total_rows / seconds if seconds else None,
+        }
+
+        if self.restore_files:
+            self.extract_files()
+        return self.stats
+
+    def load(self, plan, levels):
+        """
+        Clear the restored tables and load the plan into them
+
+        Returns:
+            tuple: (rows loaded, rows deleted or skipped as deleted)
+        """
+        self.clear(plan, levels)
+        deleted = self.apply_tombstones(plan, levels)
+        pool = self._pool() if self.workers > 1 else None
+        total_rows = 0
+        try:
+            for models, cyclic in levels:
+                for tasks in self.level_tasks(plan, models, cyclic):
+                    for results in self._run_tasks(pool, tasks):
+                        for label, rows, skipped, seconds in results:
+                            total_rows += rows
+                            deleted += skipped
+                            stat = self.stats.setdefault(label, {'rows': 0, 'seconds': 0.0})
+                            stat['rows'] += rows
+                            stat['seconds'] += seconds
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.reset_sequences(list(plan))
+        return total_rows, deleted
+
+    def level_tasks(self, plan, models, cyclic):
+        """
+        Yield lists of tasks that may run in parallel, in order: first the
+        base loads of the level, then its incremental replays
+        """
+        if cyclic:
+            steps = [plan[model]['base'] for model in models if plan[model]['base']]
+            steps += [step for model in models for step in plan[model]['incremental']]
+            yield [{'steps': steps, 'batch_size': self.batch_size}] if steps else []
+            return
+
+        base_tasks = []
+        for model in models:
+            base = plan[model]['base']
+            if not base or not base['files']:
+                continue
+            if is_self_referential(model):
+                # Rows may reference rows in other chunks; keep them in one transaction
+                base_tasks.append({'steps': [base], 'batch_size': self.batch_size})
+            else:
+                for path in base['files']:
+                    base_tasks.append({'steps': [dict(base, files=[path])], 'batch_size': self.batch_size})
+        yield base_tasks
+
+        yield [
+            {'steps': plan[model]['incremental'], 'batch_size': self.batch_size}
+            for model in models if plan[model]['incremental']
+        ]
+
+    def _run_tasks(self, pool, tasks):
+        if not tasks:
+            return []
+        if pool is None or len(tasks) == 1:
+            return [run_task(task) for task in tasks]
+        return list(pool.map(run_task, tasks))
+
+    def clear(self, plan, levels):
+        """
+        Empty the restored tables, children first
+
+        Rows in tables left out of the backup that point at restored rows
+        through nullable foreign keys (e.g. SystemBackup.created_by) are
+        detached first.
+        """
+        restored = set(plan)
+        with transaction.atomic():
+            _defer_constraints()
+            for model in apps.get_models(include_auto_created=True):
+                if model in restored or not model._meta.managed or model._meta.proxy:
+                    continue
+                for field in model._meta.concrete_fields:
+                    if field.is_relation and field.related_model in restored:
+                        if not field.null:
+                            raise RestoreError(
+                                f'{backup_engine.model_label(model)}.{field.name} references restored rows '
+                                f'and cannot be cleared'
+                            )
+                        model._base_manager.exclude(**{field.attname: None}).update(**{field.attname: None})
+
+            for models, _ in reversed(levels):
+                for model in models:
+                    if plan[model]['base'] is None:
+                        continue  # only incremental data: keep existing rows
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        self.cleared = True
+
+    def apply_tombstones(self, plan, levels):
+        """Delete tombstoned rows of the tables that were not cleared"""
+        deleted = 0
+        with transaction.atomic():
+            _defer_constraints()
+            for models, _ in reversed(levels):
+                for model in models:
+                    pks = plan[model]['delete']
+                    if not pks:
+                        continue
+                    pk_field = model._meta.pk
+                    table = connection.ops.quote_name(model._meta.db_table)
+                    column = connection.ops.quote_name(pk_field.column)
+                    values = [pk_field.get_db_prep_value(pk, connection) for pk in pks]
+                    with connection.cursor() as cursor:
+                        for start in range(0, len(values), 5000):
+                            batch = values[start:start + 5000]
+                            placeholders = ', '.join(['%s'] * len(batch))
+                            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', batch)
+                            deleted += cursor.rowcount
+        return deleted
+
+    def reset_sequences(self, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def extract_files(self):
+        for directory, manifest in self.chain:
+            files = manifest.get('files')
+            if not files:
+                continue
+            media_root = Path(settings.MEDIA_ROOT)
+            media_root.mkdir(parents=True, exist_ok=True)
+            with tarfile.open(Path(directory) / files['archive'], 'r:gz') as archive:
+                if hasattr(tarfile, 'data_filter'):
+                    archive.extractall(media_root, filter='data')
+                else:
+                    members = [
+                        member for member in archive.getmembers()
+                        if member.isfile() and not member.name.startswith('/') and '..' not in Path(member.name).parts
+                    ]
+                    archive.extractall(media_root, members=members)
+            self.log(f"Restored {files['count']} media files from {directory}")
+
@@ -0,0 +1,154 @@
+"""
+In-process LRU + TTL cache of admin search results
+
+Entries are keyed by the normalized query and the caller's permission
+fingerprint, and remember the SearchIndexVersion of every entity type they
+were computed from. An entry is served only while those versions are
+unchanged and it is younger than SEARCH_CACHE_TTL seconds, so a write to a
+course invalidates cached course results but not cached user results.
+Versions are read from the database at most once per
+SEARCH_CACHE_CHECK_INTERVAL seconds, and right after this process commits a
+write to an indexed model.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from core.row_signals import receivers_suspended
+from users.models import UserProfile
+
+from .search_index import ENTITIES
+
+
+def permission_fingerprint(user):
+    """
+    Short hash of what decides which results a user may see
+
+    Superuser status plus the user's active role assignments and their
+    scopes; users with the same roles share cache entries.
+    """
+    from rbac.models import UserRoleAssignment
+
+    now = timezone.now()
+    assignments = list(
+        UserRoleAssignment.objects.filter(user=user, is_active=True, start_date__lte=now)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gt=now))
+        .order_by('role_id', 'scope_type', 'scope_object_id')
+        .values_list('role_id', 'scope_type', 'scope_object_id')
+    )
+    raw = repr((user.is_superuser, assignments)).encode()
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU of computed results with per-entity-type invalidation
+    """
+
+    def __init__(self, max_entries=None, ttl=None, check_interval=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0, 'version_checks': 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = None
+        self._checked_at = 0.0
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    def versions(self):
+        """Current {entity type: version}, re-read at most once per check interval"""
+        from .models import SearchIndexVersion
+
+        interval = self._setting(self.check_interval, 'SEARCH_CACHE_CHECK_INTERVAL', 1.0)
+        if self._versions is None or time.monotonic() - self._checked_at >= interval:
+            self._versions = SearchIndexVersion.current()
+            self._checked_at = time.monotonic()
+            self.stats['version_checks'] += 1
+        return self._versions
+
+    def recheck(self):
+        """Read the versions again on the next lookup"""
+        self._checked_at = 0.0
+
+    def get_or_set(self, key, entity_types, compute):
+        """
+        Return the cached value of key, or compute and cache it
+
+        Args:
+            key: Hashable key (normalized query, fingerprint, ...)
+            entity_types: Entity types the value was computed from
+            compute: Called without arguments on a miss
+        """
+        current = self.versions()
+        versions = tuple(current.get(entity_type, 0) for entity_type in entity_types)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_versions, value = entry
+                if entry_versions != versions:
+                    self.stats['stale'] += 1
+                    del self._entries[key]
+                elif expires_at <= now:
+                    self.stats['expired'] += 1
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+            self.stats['misses'] += 1
+
+        # Computed outside the lock; versions were read before computing, so
+        # a write that lands meanwhile makes this entry stale, not wrong
+        value = compute()
+        ttl = self._setting(self.ttl, 'SEARCH_CACHE_TTL', 300)
+        max_entries = self._setting(self.max_entries, 'SEARCH_CACHE_MAX_ENTRIES', 2000)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return value
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': self.stats['hits'] / lookups if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions = None
+
+
+search_cache = SearchResultCache()
+
+
+def recheck_after_commit(sender, **kwargs):
+    if receivers_suspended():
+        return
+    transaction.on_commit(search_cache.recheck)
+
+
+def connect_search_cache_signals():
+    """Make this process's own writes visible to its next cached lookup"""
+    for entity_type, (model, _) in ENTITIES.items():
+        post_save.connect(recheck_after_commit, sender=model, dispatch_uid=f'search-cache-save-{entity_type}')
+        post_delete.connect(recheck_after_commit, sender=model, dispatch_uid=f'search-cache-delete-{entity_type}')
+    post_save.connect(recheck_after_commit, sender=UserProfile, dispatch_uid='search-cache-save-profile')
+    post_delete.connect(recheck_after_commit, sender=UserProfile, dispatch_uid='search-cache-delete-profile')
@@ -0,0 +1,486 @@
+"""
+Inverted index behind the admin global search
+
+Every user, course, department and program has a SearchDocument holding
+what a result displays, plus one SearchTerm row per distinct lower-cased
+token of its searchable fields. A query matches documents in which every
+query word is a prefix of some term; relevance is the summed weight of the
+matching terms (doubled for whole-term matches), computed and ordered in
+the same SQL query. The plain B-tree index on term serves the prefix
+lookups on every backend (Django adds a varchar_pattern_ops index for
+LIKE on PostgreSQL).
+
+Documents are rewritten from post_save/post_delete signals, which also
+bump the entity type's SearchIndexVersion for the in-memory typeahead
+index (admin_panel.typeahead). Every writer shares the version rows, so a
+transaction bumps each entity type once, after it commits, rather than
+holding the row locked until then. Bulk writes that skip signals
+(QuerySet.update(), bulk_create()) are picked up by
+`manage.py rebuild_search_index`.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+
+from academics.models import Department, Program
+from core.row_signals import receivers_suspended
+from courses.models import Course
+from users.models import UserProfile
+
+from .models import SearchDocument, SearchIndexVersion, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+# Descriptions only contribute their first words, to bound the index size
+MAX_DESCRIPTION_TERMS = 100
+# Words of a query beyond this are ignored
+MAX_QUERY_TERMS = 8
+
+# Term weights by field
+CODE_WEIGHT = 4
+NAME_WEIGHT = 3
+EMAIL_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# SearchDocument columns a search result needs
+RESULT_FIELDS = ('entity_type', 'object_id', 'title', 'description', 'metadata')
+
+URLS = {
+    'user': '/admin/users/{id}',
+    'course': '/admin/academic/courses/{id}',
+    'department': '/admin/academic/departments/{id}',
+    'program': '/admin/academic/programs/{id}',
+}
+
+# Version bumps made by this process per entity type, so the typeahead
+# index can tell them from bumps made by other processes
+local_bumps = {}
+_bumps_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def summary(code, description):
+    return f"{code} - {description[:100] if description else 'No description'}"
+
+
+def user_document(user):
+    """
+    Document fields and weighted terms of a user
+
+    Returns:
+        tuple: (document fields, [(text, weight, whole), ...] for weigh_terms)
+    """
+    profile = getattr(user, 'profile', None)
+    fields = {
+        'title': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'description': f"{profile.get_role_display() if profile else 'User'} - {user.email}",
+        'metadata': {
+            'role': profile.role if profile else 'UNKNOWN',
+            'email': user.email,
+            'is_active': user.is_active,
+        },
+    }
+    weighted = [
+        (user.username, CODE_WEIGHT, True),
+        (user.first_name, NAME_WEIGHT, False),
+        (user.last_name, NAME_WEIGHT, False),
+        (user.email, EMAIL_WEIGHT, True),
+    ]
+    return fields, weighted
+
+
+def course_document(course):
+    fields = {
+        'title': course.name,
+        'description': summary(course.code, course.description),
+        'metadata': {
+            'code': course.code,
+            'is_active': course.is_active,
+            'credits': course.credit_hours,
+        },
+    }
+    return fields, coded_terms(course)
+
+
+def department_document(department):
+    fields = {
+        'title': department.name,
+        'description': summary(department.code, department.description),
+        'metadata': {
+            'code': department.code,
+            'is_active': department.is_active,
+        },
+    }
+    return fields, coded_terms(department)
+
+
+def program_document(program):
+    fields = {
+        'title': program.name,
+        'description': summary(program.code, program.description),
+        'metadata': {
+            'code': program.code,
+            'is_active': program.is_active,
+            'duration_years': program.duration_years,
+        },
+    }
+    return fields, coded_terms(program)
+
+
+def coded_terms(instance):
+    return [
+        (instance.code, CODE_WEIGHT, True),
+        (instance.name, NAME_WEIGHT, False),
+        (' '.join(tokenize(instance.description)[:MAX_DESCRIPTION_TERMS]), DESCRIPTION_WEIGHT, False),
+    ]
+
+
+# entity type: (model, document builder)
+ENTITIES = {
+    'user': (User, user_document),
+    'course': (Course, course_document),
+    'department': (Department, department_document),
+    'program': (Program, program_document),
+}
+
+
+# Fields a document is built from; saves limited to other fields (such as
+# the last_login update on every login) leave the index alone
+INDEXED_FIELDS = {
+    'user': {'username', 'first_name', 'last_name', 'email', 'is_active'},
+    'course': {'code', 'name', 'description', 'is_active', 'credit_hours'},
+    'department': {'code', 'name', 'description', 'is_active'},
+    'program': {'code', 'name', 'description', 'is_active', 'duration_years'},
+    'profile': {'role', 'user'},
+}
+
+
+def affects_index(entity_type, update_fields):
+    return update_fields is None or not INDEXED_FIELDS[entity_type].isdisjoint(update_fields)
+
+
+def entity_type_of(model):
+    for entity_type, (entity_model, _) in ENTITIES.items():
+        if issubclass(model, entity_model):
+            return entity_type
+    return None
+
+
+def weigh_terms(weighted):
+    """
+    Merge (text, weight, whole) triples into {term: highest weight}
+
+    Identifier-like fields (whole=True) are also indexed as one term, so a
+    query such as "cs-201" or "jane@uni.edu" can match them as typed.
+    """
+    terms = {}
+    for text, weight, whole in weighted:
+        tokens = tokenize(text)
+        if whole and text and len(tokens) > 1:
+            tokens.append(text.lower()[:MAX_TERM_LENGTH])
+        for token in tokens:
+            terms[token] = max(terms.get(token, 0), weight)
+    return terms
+
+
+def index_instance(instance):
+    """Create or rewrite the search document of a user, course, department or program"""
+    entity_type = entity_type_of(type(instance))
+    _, build = ENTITIES[entity_type]
+    fields, weighted = build(instance)
+    terms = weigh_terms(weighted)
+    with transaction.atomic():
+        document, created = SearchDocument.objects.update_or_create(
+            entity_type=entity_type, object_id=instance.pk, defaults=fields
+        )
+        if not created:
+            SearchTerm.objects.filter(document=document).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document=document, term=term, weight=weight) for term, weight in terms.items()
+        ])
+    return document
+
+
+def _write_bumps(entity_types):
+    for entity_type in sorted(entity_types):
+        SearchIndexVersion.bump(entity_type)
+        with _bumps_lock:
+            local_bumps[entity_type] = local_bumps.get(entity_type, 0) + 1
+
+
+def bump_version(entity_type):
+    """Bump an entity type's SearchIndexVersion once the current transaction commits"""
+    if not connection.in_atomic_block:
+        _write_bumps([entity_type])
+        return
+    pending = getattr(connection, 'pending_index_bumps', None)
+    # As with backup tombstones: commits and rollbacks (including savepoint
+    # rollbacks) replace run_on_commit, discarding the hook a pending set was
+    # queued with
+    if pending is None or pending[0] is not connection.run_on_commit or pending[1] != connection.savepoint_ids:
+        entity_types = set()
+
+        def flush():
+            if getattr(connection, 'pending_index_bumps', None) and connection.pending_index_bumps[2] is entity_types:
+                connection.pending_index_bumps = None
+            _write_bumps(entity_types)
+
+        transaction.on_commit(flush)
+        pending = connection.pending_index_bumps = (connection.run_on_commit, list(connection.savepoint_ids), entity_types)
+    pending[2].add(entity_type)
+
+
+def remove_instance(entity_type, object_id):
+    SearchDocument.objects.filter(entity_type=entity_type, object_id=object_id).delete()
+
+
+def entity_queryset(entity_type):
+    """Source rows of an entity type, loading only the fields documents are built from"""
+    model, _ = ENTITIES[entity_type]
+    if entity_type == 'user':
+        return model.objects.select_related('profile').only(*INDEXED_FIELDS['user'], 'profile__role')
+    return model.objects.only(*INDEXED_FIELDS[entity_type])
+
+
+def rebuild(entity_types=None, batch_size=1000):
+    """
+    Rewrite the whole index (or the given entity types) from the source tables
+
+    Returns:
+        dict: Documents written per entity type
+    """
+    written = {}
+    for entity_type in entity_types or ENTITIES:
+        queryset = entity_queryset(entity_type).order_by('pk')
+        written[entity_type] = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                SearchDocument.objects.filter(
+                    entity_type=entity_type, object_id__gt=last_pk, object_id__lte=batch[-1].pk
+                ).delete()
+                write_batch(entity_type, batch)
+            written[entity_type] += len(batch)
+            last_pk = batch[-1].pk
+        SearchDocument.objects.filter(entity_type=entity_type, object_id__gt=last_pk).delete()
+        bump_version(entity_type)
+    return written
+
+
+def index_created(entity_type, instances):
+    """Index rows inserted with bulk_create, which sends no signals"""
+    if instances:
+        write_batch(entity_type, instances)
+        bump_version(entity_type)
+
+
+def index_updated(entity_type, pks):
+    """Rewrite the documents of rows changed with update(), which sends no signals"""
+    if not pks:
+        return
+    instances = list(entity_queryset(entity_type).filter(pk__in=pks))
+    SearchDocument.objects.filter(entity_type=entity_type, object_id__in=pks).delete()
+    write_batch(entity_type, instances)
+    bump_version(entity_type)
+
+
+def remove_many(entity_type, pks):
+    """Drop the documents of rows deleted with the delete receivers suspended (see core.row_signals)"""
+    if not pks:
+        return
+    SearchDocument.objects.filter(entity_type=entity_type, object_id__in=pks).delete()
+    bump_version(entity_type)
+
+
+def write_batch(entity_type, instances):
+    """Insert documents and terms for instances that have no document yet"""
+    _, build = ENTITIES[entity_type]
+    built = [(instance.pk, *build(instance)) for instance in instances]
+    documents = SearchDocument.objects.bulk_create([
+        SearchDocument(entity_type=entity_type, object_id=pk, **fields) for pk, fields, _ in built
+    ])
+    if any(document.pk is None for document in documents):
+        # Backends that cannot return inserted ids
+        ids = dict(SearchDocument.objects.filter(
+            entity_type=entity_type, object_id__in=[pk for pk, _, _ in built]
+        ).values_list('object_id', 'pk'))
+        for document in documents:
+            document.pk = ids[document.object_id]
+    SearchTerm.objects.bulk_create([
+        SearchTerm(document=document, term=term, weight=weight)
+        for document, (_, _, weighted) in zip(documents, built)
+        for term, weight in weigh_terms(weighted).items()
+    ], batch_size=5000)
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def search(query, entity_types=None, limit=20):
+    """
+    Ranked documents matching every word of query as a term prefix
+
+    Args:
+        query: Free text
+        entity_types: Restrict to these entity types
+        limit: Maximum number of documents
+
+    Returns:
+        QuerySet: SearchDocuments annotated with `score`, best first
+    """
+    terms = query_terms(query)
+    if not terms:
+        return SearchDocument.objects.none()
+
+    matches = [Q(terms__term__startswith=term) for term in terms]
+    any_match = matches[0]
+    for match in matches[1:]:
+        any_match |= match
+
+    documents = SearchDocument.objects.filter(any_match).only(*RESULT_FIELDS)
+    if entity_types:
+        documents = documents.filter(entity_type__in=entity_types)
+    per_term = {f'match_{i}': Count('terms', filter=match) for i, match in enumerate(matches)}
+    return documents.annotate(
+        score=Sum('terms__weight') + Sum('terms__weight', filter=Q(terms__term__in=terms), default=0),
+        **per_term,
+    ).filter(
+        **{f'{name}__gt': 0 for name in per_term}
+    ).order_by('-score', 'title', 'pk')[:limit]
+
+
+def search_by_type(query, per_type=None, limit=20, cache=None, cache_key=''):
+    """
+    Search each entity type separately, concurrently, and merge the results
+
+    Every entity type gets its own budget of per_type results, so a query
+    matching thousands of users still shows matching courses. The per-type
+    queries run on a small thread pool (SEARCH_FANOUT_WORKERS); inside a
+    transaction they run one after another on the caller's connection,
+    since other connections cannot see its uncommitted rows.
+
+    With a cache (admin_panel.search_cache), each entity type's results are
+    cached under the query terms and cache_key (the caller's permission
+    fingerprint) and only recomputed after that entity type changes.
+
+    Returns:
+        list: SearchDocuments annotated with `score`, best first
+    """
+    if per_type is None:
+        per_type = getattr(settings, 'SEARCH_RESULTS_PER_TYPE', 5)
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    def compute(entity_type):
+        return list(search(query, [entity_type], limit=per_type))
+
+    def run(entity_type):
+        if cache is None:
+            return compute(entity_type)
+        key = ('search', entity_type, tuple(terms), per_type, cache_key)
+        return cache.get_or_set(key, [entity_type], lambda: compute(entity_type))
+
+    pool = fanout_pool()
+    if cache is not None:
+        # Read the versions once here rather than on every pool thread
+        cache.versions()
+    if pool is None or connection.in_atomic_block:
+        per_entity = [run(entity_type) for entity_type in ENTITIES]
+    else:
+        per_entity = list(pool.map(lambda entity_type: on_pool_connection(run, entity_type), ENTITIES))
+
+    documents = [document for batch in per_entity for document in batch]
+    documents.sort(key=lambda document: (-document.score, document.title, document.pk))
+    return documents[:limit]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def fanout_pool():
+    """The process-wide search thread pool, or None when fan-out is turned off"""
+    global _pool
+    workers = getattr(settings, 'SEARCH_FANOUT_WORKERS', len(ENTITIES))
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='admin-search')
+        return _pool
+
+
+def on_pool_connection(func, *args):
+    """
+    Run func on a pool thread's own connection
+
+    Pool threads keep their connection between searches instead of paying
+    for a new one each time; a connection the server dropped is replaced
+    and the call retried once.
+    """
+    try:
+        return func(*args)
+    except (InterfaceError, OperationalError):
+        connection.close()
+        return func(*args)
+
+
+def as_result(document):
+    """Search API payload of a document"""
+    return {
+        'id': str(document.object_id),
+        'type': document.entity_type,
+        'title': document.title,
+        'description': document.description,
+        'url': URLS[document.entity_type].format(id=document.object_id),
+        'metadata': document.metadata,
+    }
+
+
+def index_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    entity_type = entity_type_of(sender)
+    if raw or not affects_index(entity_type, update_fields):
+        return
+    index_instance(instance)
+    bump_version(entity_type)
+
+
+def remove_deleted(sender, instance, **kwargs):
+    if receivers_suspended():
+        return
+    entity_type = entity_type_of(sender)
+    remove_instance(entity_type, instance.pk)
+    bump_version(entity_type)
+
+
+def index_profile_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    """A profile's role is part of its user's document"""
+    if raw or receivers_suspended() or not affects_index('profile', update_fields):
+        return
+    user = entity_queryset('user').filter(pk=instance.user_id).first()
+    if user is not None:
+        index_instance(user)
+        bump_version('user')
+
+
+def connect_search_index_signals():
+    """Keep the search index in step with saves and deletes of the indexed models"""
+    for entity_type, (model, _) in ENTITIES.items():
+        post_save.connect(index_saved, sender=model, dispatch_uid=f'search-index-save-{entity_type}')
+        post_delete.connect(remove_deleted, sender=model, dispatch_uid=f'search-index-delete-{entity_type}')
+    post_save.connect(index_profile_user, sender=UserProfile, dispatch_uid='search-index-save-profile')
+    post_delete.connect(index_profile_user, sender=UserProfile, dispatch_uid='search-index-delete-profile')
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db.models import Count, Q
 from django.utils import timezone
-from .models import SystemSettings, SystemLog, SystemBackup, SystemAnnouncement, EmailTemplate, Notification
+from .models import SystemSettings, SystemLog, SystemBackup, SystemAnnouncement, EmailTemplate, Notification, UserImportJob
 from users.models import UserProfile
 from courses.models import Course, CourseOffering
 from assignments.models import Assignment
@@ -46,6 +46,10 @@ class SystemAnnouncementSerializer(serializers.ModelSerializer):
     class Meta:
         model = SystemAnnouncement
         fields = '__all__'
+        read_only_fields = [
+            'delivery_status', 'recipients_total', 'recipients_delivered',
+            'delivery_started_at', 'delivered_at', 'delivery_error', 'created_by',
+        ]
     
     def get_target_users_count(self, obj):
         return obj.target_users.count()
@@ -203,3 +207,13 @@ class BulkUserImportResultSerializer(serializers.Serializer):
     imported_users = serializers.ListField(
         child=serializers.DictField()
     )
+
+
+class UserImportJobSerializer(serializers.ModelSerializer):
+    """Serializer for bulk import job status"""
+    
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    
+    class Meta:
+        model = UserImportJob
+        exclude = ['file_path']
@@ -0,0 +1,138 @@
+"""
+In-process cache of SystemSettings
+
+Each process keeps a snapshot of every setting and compares it with
+SystemSettingsVersion at most once per SYSTEM_SETTINGS_CHECK_INTERVAL
+seconds, rebuilding the snapshot with a single query when another process
+(or this one) has changed a setting.
+"""
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'off', ''}
+
+
+class SystemSettingsCache:
+    """
+    Typed, read-mostly accessor for SystemSettings
+    """
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval
+        self.stats = {'hits': 0, 'rebuilds': 0, 'version_checks': 0}
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._values = {}
+        self._by_category = {}
+
+    def _interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return getattr(settings, 'SYSTEM_SETTINGS_CHECK_INTERVAL', 1.0)
+
+    def _refresh(self):
+        """Rebuild the snapshot if it is missing or the version has moved"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self._interval():
+            self.stats['hits'] += 1
+            return
+
+        from .models import SystemSettingsVersion
+
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self._interval():
+                return
+            version = SystemSettingsVersion.current()
+            self.stats['version_checks'] += 1
+            if version != self._version:
+                self._rebuild(version)
+            self._checked_at = time.monotonic()
+
+    def _rebuild(self, version):
+        from .models import SystemSettings
+        from .serializers import SystemSettingsSerializer
+
+        rows = SystemSettings.objects.select_related('updated_by').order_by('category', 'key')
+        values = {}
+        by_category = {}
+        for data in SystemSettingsSerializer(rows, many=True).data:
+            data = dict(data)
+            values[data['key']] = data['value']
+            by_category.setdefault(data['category'], []).append(data)
+
+        self._values = values
+        self._by_category = by_category
+        self._version = version
+        self.stats['rebuilds'] += 1
+
+    def invalidate(self):
+        """Drop the snapshot so the next read reloads it"""
+        with self._lock:
+            self._version = None
+
+    def invalidate_on_commit(self):
+        transaction.on_commit(self.invalidate)
+
+    def all(self):
+        """Return {key: raw value} for every setting"""
+        self._refresh()
+        return dict(self._values)
+
+    def by_category(self):
+        """Return serialized settings grouped by category"""
+        self._refresh()
+        return {category: list(rows) for category, rows in self._by_category.items()}
+
+    def get(self, key, default=None):
+        """Return the raw (string) value of a setting"""
+        self._refresh()
+        return self._values.get(key, default)
+
+    def get_bool(self, key, default=False):
+        value = self.get(key)
+        if value is None:
+            return default
+        value = value.strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        logger.warning(f"System setting {key} is not a boolean: {value!r}")
+        return default
+
+    def get_int(self, key, default=0):
+        return self._cast(key, int, default)
+
+    def get_float(self, key, default=0.0):
+        return self._cast(key, float, default)
+
+    def get_json(self, key, default=None):
+        return self._cast(key, json.loads, default)
+
+    def get_list(self, key, default=None, separator=','):
+        value = self.get(key)
+        if value is None:
+            return default if default is not None else []
+        return [item.strip() for item in value.split(separator) if item.strip()]
+
+    def _cast(self, key, cast, default):
+        value = self.get(key)
+        if value is None:
+            return default
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            logger.warning(f"System setting {key} could not be read as {cast.__name__}: {value!r}")
+            return default
+
+
+system_settings = SystemSettingsCache()
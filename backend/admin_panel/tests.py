@@ -1,3 +1,1526 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import queue
+import tarfile
+import tempfile
+import time
+import zipfile
+from urllib.parse import parse_qs, urlparse
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from academics.models import Department
+from communications import counters
+from communications.models import Notification as UserNotification, PrivateMessage
+from courses.models import Course
+from rbac.models import Role, UserRoleAssignment
+from users.models import FacultyProfile, StudentProfile, UserProfile
+
+from . import announcements, backup, log_archive, log_search, log_stats, restore, search_index, user_actions
+from .activity import log_activity
+from .search_cache import SearchResultCache, permission_fingerprint
+from .notification_stream import notification_broker
+from .mailer import BatchMailer, TemplateCache, build_messages
+from .models import (
+    BackupTombstone, EmailTemplate, Notification, SearchDocument, SearchIndexVersion, SearchTerm, SystemAnnouncement,
+    SystemBackup, SystemLog, SystemSettings, SystemSettingsVersion, UserImportJob,
+)
+from .log_writer import SystemLogHandler, SystemLogWriter
+from .settings_cache import SystemSettingsCache
+from .typeahead import TypeaheadIndex, typeahead_index
+from . import user_import
+from .user_import import ImportFileError, UserImporter, read_rows
+from .views_system import SystemLogViewSet
+from .views_users import AdminUserViewSet
+
+LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+# Number of rows for the large-table latency tests, e.g. 1000000
+SCALE_ROWS = int(os.environ.get('SYSTEM_LOG_SCALE_ROWS', 0))
+SCALE_BUDGET_SECONDS = float(os.environ.get('SYSTEM_LOG_SCALE_BUDGET', 2.0))
+# Number of users for the admin search latency test, e.g. 100000
+SEARCH_SCALE_USERS = int(os.environ.get('SEARCH_SCALE_USERS', 0))
+SEARCH_P95_BUDGET_SECONDS = float(os.environ.get('SEARCH_P95_BUDGET', 0.1))
+
+
+def make_logs(count, now=None, batch_size=5000):
+    """Insert count logs spread over the past week, cycling through levels"""
+    now = now or timezone.now()
+    for offset in range(0, count, batch_size):
+        SystemLog.objects.bulk_create([
+            SystemLog(
+                level=LEVELS[i % len(LEVELS)],
+                message=f'Log entry {i}',
+                created_at=now - timedelta(seconds=(i * 600_000) // max(count, 1)),
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        ], batch_size=batch_size)
+
+
+class SystemLogStatsMixin:
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='log-admin')
+
+    def call(self, action, **params):
+        request = self.factory.get(f'/api/admin/system-logs/{action}/', params)
+        force_authenticate(request, self.user)
+        allow = mock.patch.object(
+            SystemLogViewSet, 'get_permissions', lambda view: [permissions.IsAuthenticated()]
+        )
+        with allow:
+            response = SystemLogViewSet.as_view({'get': action})(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+
+class SystemLogStatsTests(SystemLogStatsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.now = timezone.now()
+        make_logs(100, now=cls.now)
+
+    def test_level_counts(self):
+        self.assertEqual(log_stats.level_counts(SystemLog.objects.all()), {level: 20 for level in LEVELS})
+
+    def test_top_per_level_returns_newest_rows_of_each_level(self):
+        grouped = log_stats.top_per_level(SystemLog.objects.all(), per_level=3)
+        self.assertEqual(set(grouped), set(LEVELS))
+        for level, rows in grouped.items():
+            expected = list(
+                SystemLog.objects.filter(level=level).order_by('-created_at', '-id').values_list('id', flat=True)[:3]
+            )
+            self.assertEqual([row['id'] for row in rows], expected)
+            self.assertEqual(set(rows[0]), set(log_stats.COMPACT_FIELDS))
+
+    def test_error_rates(self):
+        buckets = log_stats.error_rates(SystemLog.objects.all(), 'day')
+        self.assertEqual(sum(row['total'] for row in buckets), 100)
+        self.assertEqual(sum(row['errors'] for row in buckets), 40)
+        with self.assertRaises(ValueError):
+            log_stats.error_rates(SystemLog.objects.all(), 'minute')
+
+    def test_by_level_query_count(self):
+        with self.assertNumQueries(2):
+            data = self.call('by_level', per_level=5)
+        self.assertEqual(data['counts']['ERROR'], 20)
+        self.assertEqual(len(data['recent']['ERROR']), 5)
+
+    def test_recent_errors_query_count(self):
+        with self.assertNumQueries(1):
+            data = self.call('recent_errors', limit=10)
+        self.assertEqual(len(data), 10)
+        self.assertTrue(all(row['level'] in log_stats.ERROR_LEVELS for row in data))
+
+    def test_error_rates_query_count(self):
+        with self.assertNumQueries(1):
+            data = self.call('error_rates', bucket='hour', hours=24 * 8)
+        self.assertEqual(sum(row['errors'] for row in data), 40)
+
+
+@skipUnless(SCALE_ROWS, 'set SYSTEM_LOG_SCALE_ROWS to run the large-table tests')
+class SystemLogStatsScaleTests(SystemLogStatsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        make_logs(SCALE_ROWS)
+
+    def assertFast(self, action, queries, **params):
+        started = time.perf_counter()
+        with self.assertNumQueries(queries):
+            data = self.call(action, **params)
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, SCALE_BUDGET_SECONDS, f'{action} took {elapsed:.2f}s')
+        return data
+
+    def test_by_level(self):
+        data = self.assertFast('by_level', 2, per_level=10)
+        self.assertEqual(sum(data['counts'].values()), SCALE_ROWS)
+
+    def test_recent_errors(self):
+        self.assertFast('recent_errors', 1, limit=50)
+
+    def test_error_rates(self):
+        self.assertFast('error_rates', 1, bucket='hour', hours=24)
+
+
+@override_settings(SYSTEM_LOG_ASYNC=False)
+class ActivityLogTests(TestCase):
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jdoe', first_name='Jane', last_name='Doe')
+
+    def test_request_supplies_actor_and_request_fields(self):
+        request = self.factory.post('/api/v1/admin/users/7/activate/', REMOTE_ADDR='10.0.0.5')
+        request.user = self.user
+        log_activity('user_activated', 'User activated: amy', request=request, category='USER')
+
+        log = SystemLog.objects.get()
+        self.assertEqual((log.activity_type, log.category, log.user, log.actor_display), ('user_activated', 'USER', self.user, 'Jane Doe'))
+        self.assertEqual((log.ip_address, log.request_path, log.request_method), ('10.0.0.5', '/api/v1/admin/users/7/activate/', 'POST'))
+
+    def test_anonymous_actor_is_recorded_as_system(self):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        log_activity('other', 'Something happened', request=request)
+        log = SystemLog.objects.get()
+        self.assertEqual((log.user, log.actor_display), (None, 'System'))
+
+    def test_backfill_classifies_existing_rows(self):
+        SystemLog.objects.bulk_create([
+            SystemLog(level='INFO', category='AUTH', message='User login: jdoe', user=self.user),
+            SystemLog(level='ERROR', category='SYSTEM', message='Disk full'),
+            SystemLog(level='INFO', category='SYSTEM', message='Nightly job ran'),
+        ])
+        migration = importlib.import_module('admin_panel.migrations.0003_systemlog_activity_type')
+        migration.backfill_activity(apps, None)
+
+        self.assertEqual(
+            list(SystemLog.objects.order_by('id').values_list('activity_type', 'actor_display')),
+            [('user_login', 'Jane Doe'), ('system_alert', 'System'), ('other', 'System')],
+        )
+
+    def test_feed_filters_by_type_and_pages_by_cursor(self):
+        for i in range(3):
+            log_activity('user_login', f'User login: {i}', user=self.user, category='AUTH')
+        log_activity('other', 'Unrelated', user=self.user)
+
+        self.client.force_login(self.user)
+        with mock.patch('rbac.decorators.PermissionManager.user_has_permission', return_value=True):
+            first = self.client.get('/api/v1/admin/activity-logs/', {'type': 'user_login', 'limit': 2}).json()
+            second = self.client.get(
+                '/api/v1/admin/activity-logs/', {'type': 'user_login', 'limit': 2, 'cursor': first['next_cursor']}
+            ).json()
+
+        self.assertEqual([row['description'] for row in first['results']], ['User login: 2', 'User login: 1'])
+        self.assertEqual([row['description'] for row in second['results']], ['User login: 0'])
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(first['results'][0]['user_name'], 'Jane Doe')
+
+
+def queued_writer(**options):
+    """SystemLogWriter whose queue the test drains itself (no background thread)"""
+    writer = SystemLogWriter(**options)
+    writer._queue = queue.Queue(maxsize=writer.buffer_size)
+    writer._ensure_started = lambda: None
+    return writer
+
+
+@override_settings(SYSTEM_LOG_ASYNC=True)
+class SystemLogWriterTests(TestCase):
+    def entry(self, level='INFO'):
+        return SystemLog(level=level, category='SYSTEM', message=f'{level} entry')
+
+    def test_entries_are_buffered_until_flushed(self):
+        writer = queued_writer(batch_size=2)
+        for _ in range(5):
+            writer.write(self.entry())
+        self.assertFalse(SystemLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as captured:
+            writer.flush()
+        self.assertEqual(SystemLog.objects.count(), 5)
+        self.assertEqual(len(captured), 3)
+        self.assertEqual(writer.stats['written'], 5)
+
+    def test_collect_returns_on_batch_size_or_interval(self):
+        writer = queued_writer(batch_size=2, flush_interval=0.05)
+        for _ in range(3):
+            writer._queue.put(self.entry())
+        self.assertEqual(len(writer._collect()), 2)
+
+        started = time.monotonic()
+        self.assertEqual(len(writer._collect()), 1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    def test_critical_and_overflow_entries_are_written_through(self):
+        writer = queued_writer(buffer_size=1)
+        writer.write(self.entry('CRITICAL'))
+        writer.write(self.entry())
+        writer.write(self.entry())
+        self.assertEqual(SystemLog.objects.count(), 2)
+        self.assertEqual(writer.stats['sync_writes'], 2)
+
+    def test_shutdown_drains_the_queue_and_writes_later_entries_directly(self):
+        writer = queued_writer()
+        writer.write(self.entry())
+        writer.write(self.entry())
+        writer.shutdown()
+        self.assertEqual(SystemLog.objects.count(), 2)
+
+        writer.write(self.entry())
+        self.assertEqual(SystemLog.objects.count(), 3)
+
+    def test_handler_records_request_errors(self):
+        user = User.objects.create_user(username='caller')
+        request = APIRequestFactory().get('/api/v1/admin/users/', REMOTE_ADDR='10.0.0.9')
+        request.user = user
+        record = logging.getLogger('django.request').makeRecord(
+            'django.request', logging.ERROR, __file__, 1, 'Internal Server Error: %s', (request.path,), None,
+            extra={'request': request, 'status_code': 500},
+        )
+        with override_settings(SYSTEM_LOG_ASYNC=False):
+            SystemLogHandler().emit(record)
+
+        log = SystemLog.objects.get()
+        self.assertEqual((log.level, log.activity_type, log.user), ('ERROR', 'system_alert', user))
+        self.assertEqual((log.request_path, log.response_status, log.ip_address), ('/api/v1/admin/users/', 500, '10.0.0.9'))
+        self.assertEqual(log.message, 'Internal Server Error: /api/v1/admin/users/')
+
+
+class SystemLogArchiveTests(SystemLogStatsMixin, TestCase):
+    start = date(2026, 1, 1)
+    end = date(2026, 2, 1)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_root = override_settings(SYSTEM_LOG_ARCHIVE_ROOT=directory.name)
+        archive_root.enable()
+        self.addCleanup(archive_root.disable)
+
+    def log(self, day, message, level='INFO'):
+        return SystemLog.objects.create(
+            level=level, message=message, created_at=datetime(2026, 1, day, 12, tzinfo=dt_timezone.utc)
+        )
+
+    def archived(self, **filters):
+        return list(log_archive.iter_archived_logs(
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc), datetime(2026, 2, 1, tzinfo=dt_timezone.utc), **filters
+        ))
+
+    def test_archive_and_read_back(self):
+        self.log(10, 'Disk almost full', level='WARNING')
+        self.log(11, 'Backup finished')
+        SystemLog.objects.create(level='INFO', message='Outside the period')
+
+        path, count = log_archive.archive_period(self.start, self.end, 'month')
+        self.assertEqual(count, 2)
+        self.assertTrue(path.name.startswith('systemlog_2026_01'))
+        self.assertEqual([record['message'] for record in self.archived()], ['Disk almost full', 'Backup finished'])
+        self.assertEqual([record['message'] for record in self.archived(level='WARNING')], ['Disk almost full'])
+        self.assertEqual([record['message'] for record in self.archived(search='backup')], ['Backup finished'])
+
+    def test_purge_only_removes_rows_up_to_the_archived_bound(self):
+        self.log(10, 'Archived')
+        max_id = log_archive.period_bound(self.start, self.end)
+        log_archive.archive_period(self.start, self.end, 'month', max_id=max_id)
+        late = self.log(12, 'Arrived after the archive was written')
+
+        self.assertEqual(log_archive.purge_period(self.start, self.end, max_id=max_id), 1)
+        self.assertEqual(list(SystemLog.objects.values_list('id', flat=True)), [late.id])
+        self.assertEqual([record['message'] for record in self.archived()], ['Archived'])
+
+    def test_archived_endpoint_clamps_the_limit(self):
+        self.log(10, 'First')
+        self.log(11, 'Second')
+        log_archive.archive_period(self.start, self.end, 'month')
+
+        data = self.call('archived', start='2026-01-01', end='2026-01-31', limit=-1)
+        self.assertEqual([record['message'] for record in data], ['First'])
+        data = self.call('archived', start='2026-01-01', end='2026-01-31')
+        self.assertEqual(len(data), 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'covers the SQLite FTS5 index')
+class LogSearchTests(SystemLogStatsMixin, TestCase):
+    def log(self, message, level='INFO'):
+        return SystemLog.objects.create(level=level, category='SYSTEM', message=message)
+
+    def test_matches_are_ranked_and_use_stemming(self):
+        once = self.log('Connection to the mail server failed')
+        twice = self.log('Connection failed, connection retried and failed again')
+        self.log('Backup completed')
+
+        matches = log_search.search_logs(SystemLog.objects.all(), 'connections failing').order_by('-rank')
+        self.assertEqual([log.id for log in matches], [twice.id, once.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        log = self.log('Disk quota exceeded')
+        log.message = 'Disk quota restored'
+        log.save()
+        self.assertFalse(log_search.search_logs(SystemLog.objects.all(), 'exceeded').exists())
+        self.assertTrue(log_search.search_logs(SystemLog.objects.all(), 'restored').exists())
+
+        log.delete()
+        self.assertFalse(log_search.search_logs(SystemLog.objects.all(), 'restored').exists())
+
+    def test_phrases_and_operators_are_matched_literally(self):
+        self.log('User login failed for admin')
+        self.log('Failed user import')
+        self.assertEqual(log_search.search_logs(SystemLog.objects.all(), '"login failed"').count(), 1)
+        self.assertEqual(log_search.search_logs(SystemLog.objects.all(), 'failed user', phrase=True).count(), 1)
+        self.assertEqual(log_search.search_logs(SystemLog.objects.all(), 'failed OR NOT').count(), 0)
+        self.assertEqual(log_search.search_logs(SystemLog.objects.all(), '""').count(), 0)
+
+    def test_search_pages_through_ties_with_the_rank_cursor(self):
+        expected = {self.log(f'Import job {i} failed').id for i in range(5)}
+        self.log('Import job succeeded', level='WARNING')
+
+        seen = []
+        params = {'q': 'failed', 'limit': 2, 'facets': 'true'}
+        data = self.call('search', **params)
+        self.assertEqual(data['facets']['level'], {'INFO': 5})
+        while True:
+            seen.extend(result['id'] for result in data['results'])
+            if not data['next_cursor']:
+                break
+            data = self.call('search', **params, cursor=data['next_cursor'])
+            self.assertNotIn('facets', data)
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), expected)
+
+
+def read_chunks(directory, files):
+    rows = []
+    for name in files:
+        with gzip.open(directory / name, 'rt', encoding='utf-8') as chunk:
+            rows.extend(json.loads(line) for line in chunk)
+    return rows
+
+
+class BackupTestMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        (self.root / 'media').mkdir()
+        roots = override_settings(
+            SYSTEM_BACKUP_ROOT=self.root / 'backups', MEDIA_ROOT=self.root / 'media', SYSTEM_LOG_ASYNC=False
+        )
+        roots.enable()
+        self.addCleanup(roots.disable)
+
+    def run_backup(self, backup_type, **options):
+        system_backup = SystemBackup.objects.create(name=f'{backup_type} backup', backup_type=backup_type, status='QUEUED')
+        backup.run_backup(system_backup, **options)
+        self.assertEqual(system_backup.status, 'COMPLETED', system_backup.error_message)
+        return system_backup
+
+    def model_entry(self, system_backup, label):
+        return next(entry for entry in system_backup.manifest['database']['models'] if entry['model'] == label)
+
+
+class BackupTests(BackupTestMixin, TestCase):
+    def test_default_root_is_not_served_as_media(self):
+        from core import settings as project_settings
+        self.assertFalse(project_settings.SYSTEM_BACKUP_ROOT.is_relative_to(project_settings.MEDIA_ROOT))
+        self.assertFalse(project_settings.SYSTEM_LOG_ARCHIVE_ROOT.is_relative_to(project_settings.MEDIA_ROOT))
+
+    def test_database_backup_writes_chunks_and_a_manifest(self):
+        for i in range(5):
+            User.objects.create_user(username=f'backed-up-{i}')
+
+        system_backup = self.run_backup('DATABASE', chunk_rows=2)
+        directory = Path(system_backup.file_path)
+        self.assertEqual(directory.parent, self.root / 'backups')
+        with open(directory / backup.MANIFEST_NAME, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest, system_backup.manifest)
+        self.assertEqual((manifest['backup_id'], manifest['backup_type'], manifest['files']), (system_backup.pk, 'DATABASE', None))
+        self.assertEqual(system_backup.watermark.isoformat(), manifest['database']['watermark'])
+
+        users = self.model_entry(system_backup, 'auth.user')
+        self.assertEqual((users['rows'], len(users['files'])), (5, 3))
+        rows = read_chunks(directory, users['files'])
+        username = users['fields'].index('username')
+        self.assertEqual([row[username] for row in rows], [f'backed-up-{i}' for i in range(5)])
+        excluded = {entry['model'] for entry in manifest['database']['models']} & set(backup.DEFAULT_EXCLUDE)
+        self.assertEqual(excluded, set())
+
+    def test_files_backup_archives_media_root(self):
+        (self.root / 'media' / 'avatars').mkdir()
+        (self.root / 'media' / 'avatars' / 'a.png').write_bytes(b'png')
+
+        system_backup = self.run_backup('FILES')
+        self.assertIsNone(system_backup.manifest['database'])
+        self.assertEqual(system_backup.manifest['files']['count'], 1)
+        with tarfile.open(Path(system_backup.file_path) / backup.FILES_ARCHIVE_NAME) as archive:
+            self.assertEqual(archive.getnames(), ['avatars/a.png'])
+
+    def test_failed_backup_removes_its_directory(self):
+        system_backup = SystemBackup.objects.create(name='No base', backup_type='INCREMENTAL')
+        backup.run_backup(system_backup)
+        self.assertEqual(system_backup.status, 'FAILED')
+        self.assertIn('need a completed full or database backup', system_backup.error_message)
+        self.assertFalse((self.root / 'backups').exists() and any((self.root / 'backups').iterdir()))
+
+
+@override_settings(SYSTEM_BACKUP_WATERMARK_OVERLAP=0)
+class IncrementalBackupTests(BackupTestMixin, TestCase):
+    def test_incremental_backup_exports_rows_changed_since_the_watermark(self):
+        unchanged = make_department('CS')
+        changed = make_department('EE', name='Electrical Engineering')
+        SystemLog.objects.create(level='INFO', message='Before the base backup')
+        base = self.run_backup('DATABASE')
+
+        changed.name = 'Electrical and Computer Engineering'
+        changed.save()
+        added = make_department('ME', name='Mechanical Engineering')
+        SystemLog.objects.create(level='INFO', message='After the base backup')
+        incremental = self.run_backup('INCREMENTAL')
+
+        self.assertEqual(incremental.base_backup, base)
+        self.assertGreater(incremental.watermark, base.watermark)
+        self.assertEqual(incremental.manifest['database']['since'], base.watermark.isoformat())
+        directory = Path(incremental.file_path)
+
+        departments = self.model_entry(incremental, 'academics.department')
+        self.assertEqual(departments['strategy'], 'incremental')
+        pk = departments['fields'].index('id')
+        exported = [row[pk] for row in read_chunks(directory, departments['files'])]
+        self.assertEqual(exported, [changed.pk, added.pk])
+        self.assertNotIn(unchanged.pk, exported)
+
+        logs = self.model_entry(incremental, 'admin_panel.systemlog')
+        message = logs['fields'].index('message')
+        self.assertIn('After the base backup', [row[message] for row in read_chunks(directory, logs['files'])])
+        self.assertNotIn('Before the base backup', [row[message] for row in read_chunks(directory, logs['files'])])
+        # Models without updated_at are copied in full
+        self.assertEqual(self.model_entry(incremental, 'auth.group')['strategy'], 'full')
+
+    def test_deletes_write_one_batch_of_tombstones_on_commit(self):
+        departments = [make_department(f'D{i}', name=f'Department {i}') for i in range(5)]
+
+        with CaptureQueriesContext(connection) as captured:
+            with self.captureOnCommitCallbacks(execute=True):
+                Department.objects.filter(pk__in=[d.pk for d in departments[:4]]).delete()
+        inserts = [q for q in captured if q['sql'].startswith('INSERT') and 'backuptombstone' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(BackupTombstone.objects.values_list('model', 'object_pk')),
+            sorted(('academics.department', str(d.pk)) for d in departments[:4])
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    departments[4].delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(BackupTombstone.objects.count(), 4)
+
+    def test_incremental_backup_carries_tombstones_since_the_watermark(self):
+        kept = make_department('CS')
+        removed = make_department('EE', name='Electrical Engineering')
+        BackupTombstone.objects.create(model='academics.department', object_pk='999')
+        self.run_backup('DATABASE')
+        BackupTombstone.objects.filter(object_pk='999').update(deleted_at=timezone.now() - timedelta(days=1))
+
+        removed_pk = removed.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            removed.delete()
+        incremental = self.run_backup('INCREMENTAL')
+
+        tombstones = incremental.manifest['database']['tombstones']
+        rows = read_chunks(Path(incremental.file_path), tombstones['files'])
+        self.assertEqual([row[:2] for row in rows], [['academics.department', str(removed_pk)]])
+        self.assertTrue(Department.objects.filter(pk=kept.pk).exists())
+
+
+class RestoreTests(BackupTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.kept = User.objects.create_user(username='kept')
+        self.removed = User.objects.create_user(username='removed')
+        for user in (self.kept, self.removed):
+            UserProfile.objects.create(user=user, role='FACULTY', employee_id=f'E-{user.username}')
+        make_department('CS', head_of_department=self.kept)
+        make_department('EE', name='Electrical Engineering', head_of_department=self.removed)
+
+    def restore(self, system_backup):
+        call_command('restore_backup', backup_id=system_backup.pk, interactive=False, skip_files=True, stdout=io.StringIO())
+
+    def test_incremental_restore_replays_deletes_made_after_the_base_backup(self):
+        self.run_backup('DATABASE')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.removed.delete()
+        incremental = self.run_backup('INCREMENTAL')
+
+        User.objects.create_user(username='after-the-backup')
+        Department.objects.filter(code='CS').delete()
+        self.restore(incremental)
+
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['kept'])
+        self.assertEqual(list(UserProfile.objects.values_list('user__username', flat=True)), ['kept'])
+        self.assertEqual(
+            dict(Department.objects.values_list('code', 'head_of_department__username')),
+            {'CS': 'kept', 'EE': None}
+        )
+        self.assertEqual(restore.foreign_key_targets(UserProfile), {User})
+
+    def test_failed_restore_leaves_the_database_untouched(self):
+        full = self.run_backup('DATABASE')
+        User.objects.create_user(username='after-the-backup')
+
+        with mock.patch.object(restore, 'load_step', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.restore(full)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(UserProfile.objects.count(), 2)
+        self.assertEqual(Department.objects.count(), 2)
+
+    def test_rows_whose_parent_is_missing_are_skipped_when_the_key_cascades(self):
+        full = self.run_backup('DATABASE')
+        profiles = self.model_entry(full, 'users.userprofile')
+        user_id = profiles['fields'].index('user_id')
+        path = Path(full.file_path) / profiles['files'][0]
+        rows = read_chunks(Path(full.file_path), profiles['files'])
+        rows[0][user_id] = 999
+        with gzip.open(path, 'wt', encoding='utf-8') as chunk:
+            chunk.writelines(json.dumps(row) + '\n' for row in rows)
+
+        restorer = restore.Restorer(restore.resolve_chain(paths=[full.file_path]), restore_files=False)
+        plan = restorer.plan()
+        self.assertEqual(restorer.check_references(plan), 1)
+        self.assertEqual(plan[UserProfile]['base']['skip'], {rows[0][0]})
+
+    def parallel_restorer(self, system_backup):
+        restorer = restore.Restorer(restore.resolve_chain(backup=system_backup), restore_files=False)
+        # SQLite always restores with one worker; run the parallel path with tasks in this process
+        restorer.workers = 2
+        pool = mock.MagicMock(map=lambda function, *iterables: list(map(function, *iterables)))
+        pool.__enter__.return_value = pool
+        self.enterContext(mock.patch.object(restorer, '_pool', return_value=pool))
+        return restorer
+
+    def test_parallel_restore_refuses_to_clear_when_a_chunk_is_corrupt(self):
+        full = self.run_backup('DATABASE')
+        profiles = self.model_entry(full, 'users.userprofile')
+        path = Path(full.file_path) / profiles['files'][0]
+        rows = read_chunks(Path(full.file_path), profiles['files'])
+        rows[0][profiles['fields'].index('employee_id')] = 'E-tampered'
+        with gzip.open(path, 'wt', encoding='utf-8') as chunk:
+            chunk.writelines(json.dumps(row) + '\n' for row in rows)
+        User.objects.create_user(username='after-the-backup')
+
+        with self.assertRaisesRegex(restore.RestoreError, 'nothing was restored'):
+            self.parallel_restorer(full).run()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(UserProfile.objects.count(), 2)
+
+    def test_parallel_restore_reports_a_failure_after_the_clear(self):
+        full = self.run_backup('DATABASE')
+        with mock.patch.object(restore, 'load_step', side_effect=RuntimeError('disk full')):
+            with self.assertRaisesRegex(restore.RestoreError, 'partly loaded.*disk full'):
+                self.parallel_restorer(full).run()
+
+
+@override_settings(SYSTEM_LOG_ASYNC=False, SYSTEM_ANNOUNCEMENT_CHUNK_SIZE=2)
+class AnnouncementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.faculty = User.objects.create_user(username='faculty')
+        cls.student = User.objects.create_user(username='student')
+        cls.grader = User.objects.create_user(username='grader')
+        cls.inactive = User.objects.create_user(username='inactive', is_active=False)
+        for user, role in ((cls.faculty, 'FACULTY'), (cls.student, 'STUDENT'), (cls.inactive, 'FACULTY')):
+            UserProfile.objects.create(user=user, role=role, employee_id=f'E-{user.username}')
+        role = Role.objects.create(name='Grader', code='grader', description='Grades work')
+        UserRoleAssignment.objects.create(user=cls.grader, role=role)
+
+    def announce(self, **fields):
+        fields.setdefault('title', 'Maintenance tonight')
+        fields.setdefault('message', 'The portal is down from 22:00')
+        return SystemAnnouncement.objects.create(created_by=self.author, **fields)
+
+    def recipients(self, announcement):
+        return set(
+            UserNotification.objects.filter(related_object_id=announcement.pk).values_list('recipient__username', flat=True)
+        )
+
+    def test_recipients_by_profile_role_rbac_role_and_user(self):
+        announcement = self.announce(target_roles=['faculty', 'Grader'])
+        announcement.target_users.add(self.student, self.faculty, self.inactive)
+        self.assertEqual(
+            sorted(announcements.iter_recipient_ids(announcement)),
+            sorted([self.faculty.pk, self.grader.pk, self.student.pk])
+        )
+
+        everyone = self.announce(target_roles=['all'])
+        self.assertEqual(
+            set(announcements.iter_recipient_ids(everyone)),
+            set(User.objects.filter(is_active=True).values_list('pk', flat=True))
+        )
+
+    def test_delivery_creates_notifications_and_bumps_counters(self):
+        announcement = announcements.deliver_announcement(self.announce(target_roles=['FACULTY', 'grader'], priority='URGENT'))
+
+        self.assertEqual(announcement.delivery_status, 'SENT')
+        self.assertEqual((announcement.recipients_total, announcement.recipients_delivered), (2, 2))
+        self.assertEqual(self.recipients(announcement), {'faculty', 'grader'})
+        notification = UserNotification.objects.get(recipient=self.faculty)
+        self.assertEqual((notification.notification_type, notification.sender), ('WARNING', self.author))
+        self.assertEqual(counters.get_counts(self.faculty)['notifications'], 1)
+        self.assertTrue(SystemLog.objects.filter(activity_type='announcement_sent', user=self.author).exists())
+
+    def test_redelivery_only_reaches_missed_recipients(self):
+        announcement = self.announce()
+        UserNotification.objects.create(
+            recipient=self.faculty, title=announcement.title, message=announcement.message,
+            related_object_type=ContentType.objects.get_for_model(SystemAnnouncement), related_object_id=announcement.pk,
+        )
+        announcements.deliver_announcement(announcement)
+
+        self.assertEqual(UserNotification.objects.filter(recipient=self.faculty).count(), 1)
+        self.assertEqual(self.recipients(announcement), {'author', 'faculty', 'student', 'grader'})
+        self.assertEqual(announcement.recipients_delivered, 4)
+
+    def test_expired_and_failed_deliveries(self):
+        expired = announcements.deliver_announcement(self.announce(expires_at=timezone.now() - timedelta(minutes=1)))
+        self.assertEqual(expired.delivery_status, 'FAILED')
+        self.assertFalse(UserNotification.objects.exists())
+
+        with mock.patch.object(announcements, 'create_notifications', side_effect=RuntimeError('database is down')):
+            failed = announcements.deliver_announcement(self.announce())
+        failed.refresh_from_db()
+        self.assertEqual((failed.delivery_status, failed.delivery_error), ('FAILED', 'database is down'))
+
+    def test_command_delivers_due_announcements_only(self):
+        due = self.announce(delivery_status='QUEUED')
+        later = self.announce(delivery_status='QUEUED', scheduled_at=timezone.now() + timedelta(hours=1))
+        call_command('send_announcements', stdout=io.StringIO())
+
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual((due.delivery_status, later.delivery_status), ('SENT', 'QUEUED'))
+        self.assertEqual(len(self.recipients(due)), 4)
+
+        sending = self.announce(delivery_status='SENDING')
+        with self.assertRaises(CommandError):
+            call_command('send_announcements', announcement_id=sending.pk, stdout=io.StringIO())
+        call_command('send_announcements', announcement_id=sending.pk, force=True, stdout=io.StringIO())
+        sending.refresh_from_db()
+        self.assertEqual(sending.delivery_status, 'SENT')
+
+    def test_queue_resumes_deliveries_whose_worker_died(self):
+        stalled = self.announce(delivery_status='QUEUED')
+        with mock.patch.object(announcements, 'create_notifications', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                announcements.deliver_announcement(announcements.claim_due_announcement())
+        busy = self.announce(delivery_status='SENDING')
+        self.assertIsNone(announcements.claim_due_announcement())
+
+        SystemAnnouncement.objects.filter(pk=stalled.pk).update(updated_at=timezone.now() - timedelta(minutes=11))
+        call_command('send_announcements', stdout=io.StringIO())
+        stalled.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual((stalled.delivery_status, busy.delivery_status), ('SENT', 'SENDING'))
+        self.assertEqual(len(self.recipients(stalled)), 4)
+
+
+class SystemSettingsCacheTests(TestCase):
+    def setUp(self):
+        self.cache = SystemSettingsCache(check_interval=60)
+        SystemSettings.objects.create(key='site_name', value='LMS', category='general')
+        SystemSettings.objects.create(key='max_upload_mb', value='25', category='files')
+        SystemSettings.objects.create(key='allow_signup', value='yes', category='auth')
+
+    def test_typed_reads_from_one_snapshot(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.cache.get('site_name'), 'LMS')
+            self.assertEqual(self.cache.get_int('max_upload_mb'), 25)
+            self.assertTrue(self.cache.get_bool('allow_signup'))
+            self.assertEqual(self.cache.get_int('missing', 7), 7)
+            self.assertEqual(list(self.cache.by_category()), ['auth', 'files', 'general'])
+
+    def test_version_check_is_rate_limited(self):
+        self.cache.get('site_name')
+        SystemSettings.objects.filter(key='site_name').update(value='Changed')
+        SystemSettingsVersion.bump()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get('site_name'), 'LMS')
+
+    def test_save_bumps_version_and_refreshes(self):
+        self.cache.check_interval = 0
+        self.cache.get('site_name')
+        setting = SystemSettings.objects.get(key='site_name')
+        setting.value = 'New LMS'
+        setting.save()
+        self.assertEqual(self.cache.get('site_name'), 'New LMS')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get('site_name'), 'New LMS')
+
+
+class MailerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='mail-admin')
+        cls.template = EmailTemplate.objects.create(
+            name='Welcome',
+            template_type='WELCOME',
+            subject='Hi {{ first_name }}',
+            body_text='Hello {{ first_name }} & welcome',
+            body_html='<p>Hello {{ first_name }}</p>',
+            created_by=cls.user,
+        )
+
+    def recipients(self, count):
+        return [(f'user{i}@example.com', {'first_name': f'<User {i}>'}) for i in range(count)]
+
+    def test_template_compiled_once_per_version(self):
+        cache = TemplateCache()
+        first = cache.get('WELCOME')
+        with self.assertNumQueries(1):
+            self.assertIs(cache.get('WELCOME'), first)
+
+        self.template.subject = 'Welcome {{ first_name }}'
+        self.template.save()
+        updated = cache.get('WELCOME')
+        self.assertIsNot(updated, first)
+        self.assertEqual(updated.render({'first_name': 'Ann'})[0], 'Welcome Ann')
+
+    def test_falls_back_to_default_template(self):
+        subject, text, html = TemplateCache().get('ASSIGNMENT_DUE').render({'assignment_title': 'Lab 1'})
+        self.assertIn('Lab 1', subject)
+        self.assertIsNone(html)
+
+    def test_batches_share_a_connection(self):
+        mailer = BatchMailer(batch_size=4, backend='django.core.mail.backends.locmem.EmailBackend')
+        with mock.patch('admin_panel.mailer.get_connection', wraps=mail.get_connection) as get_connection:
+            totals = mailer.send(build_messages('WELCOME', self.recipients(10)))
+
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(totals['sent'], 10)
+        self.assertEqual([batch['messages'] for batch in mailer.batches], [4, 4, 2])
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, 'Hi <User 0>')
+        self.assertEqual(message.body, 'Hello <User 0> & welcome')
+        self.assertEqual(message.alternatives[0][0], '<p>Hello &lt;User 0&gt;</p>')
+
+    def test_failed_batch_is_retried(self):
+        mailer = BatchMailer(batch_size=5, max_retries=2, backend='django.core.mail.backends.locmem.EmailBackend')
+        mailer.retry_backoff = 0
+        send = mail.backends.locmem.EmailBackend.send_messages
+        calls = []
+
+        def flaky(backend, messages):
+            calls.append(len(messages))
+            if len(calls) == 1:
+                raise OSError('connection reset')
+            return send(backend, messages)
+
+        with mock.patch.object(mail.backends.locmem.EmailBackend, 'send_messages', flaky):
+            totals = mailer.send(build_messages('WELCOME', self.recipients(5)))
+
+        self.assertEqual(totals, dict(totals, sent=5, failed=0, retries=1))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_retry_resends_only_undelivered_messages(self):
+        mailer = BatchMailer(batch_size=5, max_retries=1, backend='django.core.mail.backends.locmem.EmailBackend')
+        mailer.retry_backoff = 0
+        send = mail.backends.locmem.EmailBackend.send_messages
+        failures = iter([False, False, True])
+
+        def flaky(backend, messages):
+            if next(failures, False):
+                raise OSError('connection reset')
+            return send(backend, messages)
+
+        delivered = []
+        with mock.patch.object(mail.backends.locmem.EmailBackend, 'send_messages', flaky):
+            totals = mailer.send(build_messages('WELCOME', self.recipients(5)), on_sent=delivered.extend)
+
+        self.assertEqual(totals, dict(totals, sent=5, failed=0, retries=1))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'user{i}@example.com' for i in range(5)])
+        self.assertEqual(len(delivered), 5)
+
+
+@override_settings(NOTIFICATION_STREAM_POLL_INTERVAL=0, NOTIFICATION_STREAM_MAX_AGE=0)
+class NotificationStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='stream-admin', password='secret')
+
+    def setUp(self):
+        allow = mock.patch('admin_panel.views_notifications.PermissionManager.user_has_permission', return_value=True)
+        allow.start()
+        self.addCleanup(allow.stop)
+
+    async def read_stream(self, **kwargs):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+        response = await client.get('/api/v1/admin/notifications/stream/', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return ''.join([chunk.decode() if isinstance(chunk, bytes) else chunk async for chunk in response.streaming_content])
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().get('/api/v1/admin/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_answers_501_under_wsgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/v1/admin/notifications/stream/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_resume_sends_missed_notifications_then_unread_count(self):
+        first = await Notification.objects.acreate(user=self.user, title='one', message='m', is_read=True)
+        await Notification.objects.acreate(user=self.user, title='two', message='m')
+        body = await self.read_stream(headers={'Last-Event-ID': str(first.pk)})
+        self.assertNotIn('"one"', body)
+        self.assertIn('event: notification', body)
+        self.assertIn('"two"', body)
+        self.assertTrue(body.rstrip().endswith('event: unread\ndata: {"count": 1}'))
+
+    def test_saving_publishes_after_commit(self):
+        received = []
+        with mock.patch.object(notification_broker, 'publish', lambda *args: received.append(args)):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                Notification.objects.create(user=self.user, title='hello', message='m')
+            self.assertEqual(received, [])
+            for callback in callbacks:
+                callback()
+        self.assertEqual(received[0][:2], (self.user.pk, 'notification'))
+        self.assertEqual(received[0][2]['title'], 'hello')
+
+
+def make_department(code='CS', name='Computer Science', **fields):
+    return Department.objects.create(
+        code=code, name=name, established_date='2000-01-01', contact_email='dept@uni.edu',
+        contact_phone='555', location='Main', **fields
+    )
+
+
+def make_course(department, code='CS201', name='Data Structures', **fields):
+    fields.setdefault('description', 'Lists, trees and graphs')
+    return Course.objects.create(
+        department=department, code=code, name=name, credit_hours=3, learning_outcomes='o', **fields
+    )
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = make_department()
+        cls.course = make_course(cls.department)
+        cls.user = User.objects.create_user(username='jdoe', first_name='Jane', last_name='Doe', email='jane@uni.edu')
+        UserProfile.objects.create(user=cls.user, role='FACULTY')
+
+    def titles(self, query, **kwargs):
+        return [document.title for document in search_index.search(query, **kwargs)]
+
+    def test_a_transaction_bumps_each_version_once_after_commit(self):
+        SearchIndexVersion.bump('course')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for i in range(3):
+                    make_course(self.department, code=f'MA10{i}', name=f'Calculus {i}')
+                self.assertEqual(SearchIndexVersion.current()['course'], 1)
+        self.assertEqual(SearchIndexVersion.current()['course'], 2)
+
+    def test_saves_are_indexed(self):
+        results = [search_index.as_result(document) for document in search_index.search('jane')]
+        self.assertEqual(results, [{
+            'id': str(self.user.pk),
+            'type': 'user',
+            'title': 'Jane Doe',
+            'description': 'Faculty - jane@uni.edu',
+            'url': f'/admin/users/{self.user.pk}',
+            'metadata': {'role': 'FACULTY', 'email': 'jane@uni.edu', 'is_active': True},
+        }])
+        self.assertEqual(self.titles('cs201'), ['Data Structures'])
+        self.assertEqual(self.titles('jane@uni.edu'), ['Jane Doe'])
+
+    def test_every_word_must_match_and_codes_rank_first(self):
+        make_course(self.department, code='MA101', name='Discrete Structures for CS', description='Logic')
+        self.assertEqual(self.titles('stru'), ['Data Structures', 'Discrete Structures for CS'])
+        self.assertEqual(self.titles('cs'), ['Computer Science', 'Discrete Structures for CS', 'Data Structures'])
+        self.assertEqual(self.titles('discrete stru'), ['Discrete Structures for CS'])
+        self.assertEqual(self.titles('cs', entity_types=['department']), ['Computer Science'])
+
+    def test_updates_and_deletes_follow_the_source_rows(self):
+        self.course.name = 'Algorithms'
+        self.course.save()
+        self.assertEqual(self.titles('structures'), [])
+        self.assertEqual(self.titles('algo'), ['Algorithms'])
+
+        self.user.profile.role = 'ADMIN'
+        self.user.profile.save()
+        self.assertEqual(search_index.search('jdoe')[0].metadata['role'], 'ADMIN')
+
+        self.user.delete()
+        self.assertEqual(self.titles('jane'), [])
+        self.assertFalse(SearchTerm.objects.filter(term='jane').exists())
+
+    def test_rebuild_recreates_the_index(self):
+        SearchDocument.objects.all().delete()
+        written = search_index.rebuild(batch_size=1)
+        self.assertEqual(written, {'user': 1, 'course': 1, 'department': 1, 'program': 0})
+        self.assertEqual(self.titles('data'), ['Data Structures'])
+
+    def test_search_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(search_index.search('cs'))), 2)
+
+
+class SearchFanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = make_department(code='AL', name='Alexandrian Studies')
+        make_course(department, code='AL101', name='Alexander the Great')
+        for i in range(6):
+            User.objects.create_user(username=f'alex{i}', first_name='Alex', last_name=f'Smith{i}')
+
+    def test_each_entity_type_gets_its_budget(self):
+        documents = search_index.search_by_type('alex', per_type=2)
+        types = [document.entity_type for document in documents]
+        self.assertEqual(sorted(types), ['course', 'department', 'user', 'user'])
+        self.assertEqual(documents, sorted(documents, key=lambda document: -document.score))
+
+    def test_one_query_per_entity_type(self):
+        with self.assertNumQueries(len(search_index.ENTITIES)):
+            search_index.search_by_type('alex')
+
+
+class SearchResultCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = make_department()
+        make_course(cls.department)
+        User.objects.create_user(username='csmith', first_name='Cs', last_name='Smith')
+
+    def setUp(self):
+        self.cache = SearchResultCache(max_entries=10, ttl=60, check_interval=60)
+
+    def search(self, query, fingerprint='admins'):
+        return search_index.search_by_type(query, cache=self.cache, cache_key=fingerprint)
+
+    def test_repeats_are_served_from_the_cache(self):
+        self.search('cs')
+        self.assertEqual(self.cache.stats['misses'], len(search_index.ENTITIES))
+        with self.assertNumQueries(0):
+            titles = [document.title for document in self.search('CS')]
+        self.assertEqual(titles, ['Cs Smith', 'Computer Science', 'Data Structures'])
+        self.assertEqual(self.cache.metrics()['hits'], len(search_index.ENTITIES))
+
+        self.search('cs', fingerprint='faculty')
+        self.assertEqual(self.cache.stats['misses'], 2 * len(search_index.ENTITIES))
+
+    def test_writes_invalidate_only_their_entity_type(self):
+        self.search('cs')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course(self.department, code='CS301', name='Operating Systems')
+        self.cache.recheck()  # what committing the write does for the process-wide cache
+        titles = [document.title for document in self.search('cs')]
+        self.assertIn('Operating Systems', titles)
+        self.assertEqual(self.cache.stats['stale'], 1)
+        self.assertEqual(self.cache.stats['hits'], len(search_index.ENTITIES) - 1)
+
+    def test_lru_and_ttl(self):
+        cache = SearchResultCache(max_entries=2, ttl=60, check_interval=60)
+        for key in 'abc':
+            cache.get_or_set(key, ['user'], lambda: key)
+        self.assertEqual(cache.metrics()['entries'], 2)
+        self.assertEqual(cache.stats['evictions'], 1)
+
+        expiring = SearchResultCache(ttl=0, check_interval=60)
+        expiring.get_or_set('a', ['user'], lambda: 1)
+        self.assertEqual(expiring.get_or_set('a', ['user'], lambda: 2), 2)
+        self.assertEqual(expiring.stats['expired'], 1)
+
+    def test_fingerprint_follows_permissions(self):
+        user = User.objects.get(username='csmith')
+        admin = User.objects.create_superuser(username='root', email='root@uni.edu', password='x')
+        self.assertEqual(permission_fingerprint(user), permission_fingerprint(User.objects.get(pk=user.pk)))
+        self.assertNotEqual(permission_fingerprint(user), permission_fingerprint(admin))
+
+@skipUnless(SEARCH_SCALE_USERS, 'set SEARCH_SCALE_USERS to run the admin search latency test')
+class SearchScaleTests(TransactionTestCase):
+    """Committed rows, so the fan-out really runs on the thread pool"""
+
+    QUERIES = ['alex', 'smith 4', 'user12', 'jane@', 'computer science', 'cs201', 'zz', 'a']
+
+    def setUp(self):
+        names = ['Alex', 'Jane', 'Sam', 'Maria', 'Chen', 'Omar']
+        for offset in range(0, SEARCH_SCALE_USERS, 5000):
+            User.objects.bulk_create([
+                User(
+                    username=f'user{i}', first_name=names[i % len(names)], last_name=f'Smith{i % 1000}',
+                    email=f'{names[i % len(names)].lower()}{i}@uni.edu',
+                )
+                for i in range(offset, min(offset + 5000, SEARCH_SCALE_USERS))
+            ])
+        make_course(make_department())
+        search_index.rebuild()
+
+    def test_p95_latency(self):
+        timings = []
+        for _ in range(5):
+            for query in self.QUERIES:
+                started = time.perf_counter()
+                search_index.search_by_type(query)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f'\nadmin search over {SEARCH_SCALE_USERS} users: p95 {p95 * 1000:.1f} ms')
+        self.assertLess(p95, SEARCH_P95_BUDGET_SECONDS)
+
+class TypeaheadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = make_department()
+        cls.course = make_course(cls.department)
+        cls.user = User.objects.create_user(username='jdoe', first_name='Jane', last_name='Doe', email='jane@uni.edu')
+
+    def setUp(self):
+        typeahead_index.invalidate()
+        # The index is process-wide; other tests add to its counters
+        typeahead_index.stats = dict.fromkeys(typeahead_index.stats, 0)
+        typeahead_index.check_interval = 0
+        self.addCleanup(setattr, typeahead_index, 'check_interval', None)
+        self.addCleanup(typeahead_index.invalidate)
+
+    def labels(self, prefix, index=typeahead_index, **kwargs):
+        return [suggestion['label'] for suggestion in index.suggest(prefix, **kwargs)]
+
+    def test_prefixes_of_every_key(self):
+        self.assertEqual(self.labels('ja'), ['Jane Doe'])
+        self.assertEqual(self.labels('JDO'), ['Jane Doe'])
+        self.assertEqual(self.labels('jane@'), ['Jane Doe'])
+        self.assertEqual(self.labels('cs2'), ['Data Structures'])
+        self.assertEqual(self.labels('zz'), [])
+        self.assertEqual(typeahead_index.suggest('cs201')[0], {
+            'id': str(self.course.pk), 'type': 'course', 'label': 'Data Structures', 'detail': 'CS201',
+            'url': f'/admin/academic/courses/{self.course.pk}',
+        })
+
+    def test_exact_and_shorter_keys_first(self):
+        make_department(code='CSE', name='Software Engineering')
+        self.assertEqual(self.labels('cs'), ['Computer Science', 'Software Engineering', 'Data Structures'])
+        self.assertEqual(self.labels('cs', limit=1), ['Computer Science'])
+
+    def test_lookups_do_not_query_between_checks(self):
+        index = TypeaheadIndex(check_interval=60)
+        self.labels('ja', index=index)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('ja', index=index), ['Jane Doe'])
+
+    def test_other_process_writes_reload_only_that_entity_type(self):
+        index = TypeaheadIndex(check_interval=0)
+        self.labels('ja', index=index)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course(self.department, code='CS301', name='Operating Systems')
+        self.assertEqual(self.labels('cs3', index=index), ['Operating Systems'])
+        self.assertEqual(index.stats['reloads'], 2)
+        self.assertEqual(self.labels('ja', index=index), ['Jane Doe'])
+        self.assertEqual(index.stats['reloads'], 2)
+
+    def test_own_writes_are_applied_without_reload(self):
+        self.labels('ja')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Janet'
+            self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+        self.assertEqual(self.labels('janet'), ['Janet Doe'])
+        self.assertEqual(self.labels('cs2'), [])
+        self.assertEqual(typeahead_index.stats['reloads'], 1)
+        self.assertEqual(typeahead_index.stats['local_changes'], 2)
+
+    def test_suggest_endpoint_skips_the_result_cache(self):
+        self.client.force_login(self.user)
+        with mock.patch('rbac.decorators.PermissionManager.user_has_permission', return_value=True), \
+                mock.patch('admin_panel.views_search.permission_fingerprint') as fingerprint:
+            response = self.client.get('/api/v1/admin/search/suggest/', {'q': 'ja'})
+        self.assertEqual([suggestion['label'] for suggestion in response.json()], ['Jane Doe'])
+        fingerprint.assert_not_called()
+
+
+def csv_upload(rows, name='users.csv'):
+    header = 'username,email,first_name,last_name,role,student_id,employee_id,admission_year'
+    return SimpleUploadedFile(name, '\n'.join([header, *rows]).encode(), content_type='text/csv')
+
+
+def xlsx_upload(rows, name='users.xlsx'):
+    """Minimal workbook: header in shared strings, values as inline strings"""
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    header = ['username', 'email', 'first_name', 'last_name', 'role', 'admission_year']
+    sheet_rows = ['<row r="1">' + ''.join(f'<c t="s"><v>{i}</v></c>' for i in range(len(header))) + '</row>']
+    for row_num, values in enumerate(rows, start=2):
+        cells = ''.join(
+            f'<c r="{chr(65 + i)}{row_num}"><v>{value}</v></c>' if isinstance(value, (int, float))
+            else f'<c r="{chr(65 + i)}{row_num}" t="inlineStr"><is><t>{value}</t></is></c>'
+            for i, value in enumerate(values) if value != ''
+        )
+        sheet_rows.append(f'<row r="{row_num}">{cells}</row>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{main}">' + ''.join(f'<si><t>{h}</t></si>' for h in header) + '</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{main}"><sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class UserImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='registrar')
+        User.objects.create_user(username='taken', email='taken@uni.edu')
+
+    def run_import(self, rows, **options):
+        options.setdefault('send_welcome_email', False)
+        importer = UserImporter(admin_user=self.admin, chunk_size=2, **options)
+        return importer.run(read_rows(csv_upload(rows)))
+
+    def test_valid_rows_are_inserted_and_bad_rows_reported(self):
+        result = self.run_import([
+            'amy,amy@uni.edu,Amy,Ames,STUDENT,S1,,2024',
+            'bob,bob@uni.edu,Bob,Baker,FACULTY,,E1,',
+            'taken,new@uni.edu,Tak,En,,,,',
+            'amy,amy2@uni.edu,Amy,Again,,S2,,',
+            'cat,,Cat,Cole,,,,',
+            'dan,dan@uni.edu,Dan,Dorn,WIZARD,,,',
+            'eve,eve@uni.edu,Eve,Ellis,,S1,,',
+            'fay,fay@uni.edu,Fay,Fox,STUDENT,,,',
+        ])
+        self.assertEqual(
+            (result['total_rows'], result['successful_imports'], result['failed_imports']), (8, 3, 5)
+        )
+        self.assertEqual(
+            [(error['row'], error['field']) for error in result['errors']],
+            [(4, 'username'), (5, 'username'), (6, 'email'), (7, 'role'), (8, 'student_id')],
+        )
+        self.assertEqual([user['username'] for user in result['imported_users']], ['amy', 'bob', 'fay'])
+
+        amy = UserProfile.objects.get(user__username='amy')
+        self.assertEqual((amy.role, amy.student_id, amy.student_profile.admission_year), ('STUDENT', 'S1', 2024))
+        self.assertTrue(FacultyProfile.objects.filter(user_profile__user__username='bob').exists())
+        # Blank ids are stored as NULL so they do not collide on the unique columns
+        self.assertIsNone(UserProfile.objects.get(user__username='fay').student_id)
+        self.assertEqual(StudentProfile.objects.count(), 2)
+        self.assertEqual(SystemLog.objects.filter(activity_type='user_imported').count(), 3)
+        self.assertEqual(search_index.search('amy')[0].metadata['role'], 'STUDENT')
+
+    def test_validate_only_writes_nothing(self):
+        result = self.run_import(['amy,amy@uni.edu,Amy,Ames,,,,', 'amy,x@uni.edu,A,B,,,,'], validate_only=True)
+        self.assertEqual((result['successful_imports'], result['failed_imports']), (1, 1))
+        self.assertFalse(User.objects.filter(username='amy').exists())
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        def queries(count):
+            rows = [f'u{count}_{i},u{count}_{i}@uni.edu,U,{i},,,,' for i in range(count)]
+            importer = UserImporter(admin_user=self.admin, chunk_size=count, send_welcome_email=False)
+            with CaptureQueriesContext(connection) as captured:
+                importer.run(read_rows(csv_upload(rows)))
+            return len(captured)
+
+        self.assertEqual(queries(5), queries(50))
+
+    def test_rejects_other_file_types(self):
+        with self.assertRaises(ImportFileError):
+            read_rows(SimpleUploadedFile('users.pdf', b'x'))
+
+    def test_xlsx_rows_go_through_the_same_pipeline(self):
+        upload = xlsx_upload([
+            ['amy', 'amy@uni.edu', 'Amy', 'Ames', 'STUDENT', 2023.0],
+            ['', '', '', '', '', ''],
+            ['bob', '', 'Bob', 'Baker', '', ''],
+        ])
+        rows = list(read_rows(upload))
+        self.assertEqual([row_num for row_num, _ in rows], [2, 4])
+        self.assertEqual(rows[0][1]['admission_year'], '2023')
+
+        importer = UserImporter(admin_user=self.admin, chunk_size=2, send_welcome_email=False)
+        result = importer.run(read_rows(upload))
+        self.assertEqual((result['successful_imports'], result['failed_imports']), (1, 1))
+        self.assertEqual(result['errors'][0]['row'], 4)
+        self.assertEqual(UserProfile.objects.get(user__username='amy').student_profile.admission_year, 2023)
+
+    def test_unreadable_xlsx_is_reported(self):
+        result = UserImporter(admin_user=self.admin).run(read_rows(SimpleUploadedFile('users.xlsx', b'not a zip')))
+        self.assertEqual(result['errors'][0]['field'], 'file')
+
+    def test_csv_reader_can_be_closed_after_the_upload(self):
+        upload = csv_upload(['amy,amy@uni.edu,Amy,Ames,STUDENT,,,', 'bob,bob@uni.edu,Bob,Baker,STUDENT,,,'])
+        rows = read_rows(upload)
+        self.assertEqual(next(rows)[1]['username'], 'amy')
+        upload.close()
+        rows.close()
+
+        upload = csv_upload(['amy,amy@uni.edu,Amy,Ames,STUDENT,,,'])
+        list(read_rows(upload))
+        self.assertFalse(upload.closed)
+
+
+class UserImportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='registrar')
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = override_settings(SYSTEM_USER_IMPORT_ROOT=root.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def queue(self, rows):
+        return user_import.create_job(csv_upload(rows), {'send_welcome_email': False}, created_by=self.admin)
+
+    def test_job_records_progress_and_row_errors(self):
+        job = self.queue(['amy,amy@uni.edu,Amy,Ames,,,,', 'bob,,Bob,Baker,,,,', 'cat,cat@uni.edu,Cat,Cole,,,,'])
+        job = user_import.run_job(job, chunk_size=2)
+
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.processed_rows, job.successful_imports, job.failed_imports, job.last_row), (3, 2, 1, 4))
+        self.assertEqual(list(job.row_errors.values_list('row', 'field')), [(3, 'email')])
+        self.assertFalse(os.path.exists(job.file_path))
+
+    def test_failed_job_resumes_after_last_committed_chunk(self):
+        job = self.queue([f'u{i},u{i}@uni.edu,U,{i},,,,' for i in range(5)])
+        insert = UserImporter.insert
+        calls = []
+
+        def crash_on_second_chunk(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('worker lost')
+            return insert(importer, rows)
+
+        with mock.patch.object(UserImporter, 'insert', crash_on_second_chunk):
+            job = user_import.run_job(job, chunk_size=2)
+        self.assertEqual((job.status, job.last_row, job.successful_imports), ('FAILED', 3, 2))
+        self.assertEqual(User.objects.filter(username__startswith='u').count(), 2)
+
+        job = user_import.run_job(UserImportJob.objects.get(pk=job.pk), chunk_size=2)
+        self.assertEqual((job.status, job.processed_rows, job.successful_imports, job.failed_imports), ('COMPLETED', 5, 5, 0))
+        self.assertEqual(User.objects.filter(username__startswith='u').count(), 5)
+
+    def test_claims_queued_and_stale_jobs_only(self):
+        fresh = UserImportJob.objects.create(file_name='a.csv', status='RUNNING', heartbeat_at=timezone.now())
+        stale = UserImportJob.objects.create(
+            file_name='b.csv', status='RUNNING', heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        queued = UserImportJob.objects.create(file_name='c.csv')
+
+        claimed = [user_import.claim_next_job(), user_import.claim_next_job(), user_import.claim_next_job()]
+        self.assertEqual([job.pk if job else None for job in claimed], [stale.pk, queued.pk, None])
+        self.assertEqual(UserImportJob.objects.get(pk=stale.pk).attempts, 1)
+        self.assertNotIn(fresh.pk, [job.pk for job in claimed if job])
+
+    def test_rejects_unsupported_upload_before_storing_it(self):
+        with self.assertRaises(ImportFileError):
+            user_import.create_job(SimpleUploadedFile('users.pdf', b'x'), {}, created_by=self.admin)
+        self.assertFalse(UserImportJob.objects.exists())
+
+
+class UserExportTests(TestCase):
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='registrar')
+        for i, role in enumerate(['STUDENT', 'STUDENT', 'FACULTY']):
+            user = User.objects.create_user(username=f'u{i}', email=f'u{i}@uni.edu', first_name='U', last_name=f'<{i}>')
+            UserProfile.objects.create(user=user, role=role, student_id=f'S{i}' if role == 'STUDENT' else None)
+
+    def export(self, **params):
+        request = self.factory.get('/api/v1/admin/users/export/', params)
+        force_authenticate(request, self.admin)
+        response = AdminUserViewSet.as_view({'get': 'export'})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_uses_list_filters(self):
+        response, content = self.export(role='STUDENT', ordering='user__username')
+        lines = content.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['Username', 'Email'])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['u0', 'u1'])
+
+    def test_gzipped_ndjson(self):
+        response, content = self.export(export_format='ndjson', compress='gzip', search='u2')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        records = [json.loads(line) for line in gzip.decompress(content).decode().splitlines()]
+        self.assertEqual([(r['username'], r['role'], r['student_id']) for r in records], [('u2', 'FACULTY', None)])
+
+    def test_xlsx_reads_back_through_the_import_reader(self):
+        response, content = self.export(export_format='xlsx', ordering='user__username')
+        rows = list(read_rows(SimpleUploadedFile('users.xlsx', content)))
+        self.assertEqual([(row['Username'], row['Last Name']) for _, row in rows], [('u0', '<0>'), ('u1', '<1>'), ('u2', '<2>')])
+
+    def test_rejects_unknown_format(self):
+        request = self.factory.get('/api/v1/admin/users/export/', {'export_format': 'pdf'})
+        force_authenticate(request, self.admin)
+        self.assertEqual(AdminUserViewSet.as_view({'get': 'export'})(request).status_code, 400)
+
+
+@override_settings(SYSTEM_USER_BULK_CHUNK_SIZE=2, SYSTEM_LOG_ASYNC=False)
+class UserBulkActionTests(TestCase):
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='registrar')
+        role = Role.objects.create(name='Grader', code='grader', description='Grades work')
+        cls.profiles = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'b{i}', email=f'b{i}@uni.edu')
+            Token.objects.create(user=user)
+            UserRoleAssignment.objects.create(user=user, role=role)
+            cls.profiles.append(UserProfile.objects.create(user=user, role='STUDENT'))
+
+    def bulk_action(self, action, ids):
+        request = self.factory.post('/api/v1/admin/users/bulk_action/', {'action': action, 'user_ids': ids}, format='json')
+        force_authenticate(request, self.admin)
+        return AdminUserViewSet.as_view({'post': 'bulk_action'})(request)
+
+    def test_deactivate_counts_changed_rows_and_revokes_tokens(self):
+        UserProfile.objects.filter(pk=self.profiles[0].pk).update(is_active=False)
+        ids = [profile.pk for profile in self.profiles]
+        response = self.bulk_action('deactivate', ids + ids[:1])
+
+        self.assertEqual(response.data['affected'], {'profiles': 2, 'users': 3, 'tokens': 3})
+        self.assertEqual(response.data['message'], 'Deactivated 2 users')
+        self.assertFalse(User.objects.filter(username__startswith='b', is_active=True).exists())
+        self.assertFalse(search_index.search('b1')[0].metadata['is_active'])
+        self.assertEqual(SystemLog.objects.filter(activity_type='bulk_action').count(), 1)
+
+    def test_delete_removes_users_tokens_and_role_assignments(self):
+        response = self.bulk_action('delete', [self.profiles[0].pk, self.profiles[1].pk, 999999])
+
+        self.assertEqual(
+            response.data['affected'], {'profiles': 2, 'users': 2, 'tokens': 2, 'role_assignments': 2}
+        )
+        self.assertEqual(list(User.objects.filter(username__startswith='b').values_list('username', flat=True)), ['b2'])
+        self.assertEqual(UserRoleAssignment.objects.count(), 1)
+
+    def test_delete_does_the_delete_receivers_work_once(self):
+        deleted, kept = self.profiles[0], self.profiles[2]
+        PrivateMessage.objects.create(sender=deleted.user, recipient=kept.user, subject='Hi', content='Hi', attachments=['notes.pdf'])
+        self.assertEqual(counters.get_counts(kept.user)['messages'], 1)
+        typeahead_index.invalidate()
+        typeahead_index.check_interval = 0
+        self.addCleanup(setattr, typeahead_index, 'check_interval', None)
+        typeahead_index.suggest('b')
+        reloads = typeahead_index.stats['reloads']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk_action('delete', [deleted.pk, self.profiles[1].pk])
+
+        self.assertEqual(counters.get_counts(kept.user)['messages'], 0)
+        self.assertTrue(BackupTombstone.objects.filter(
+            model=backup.model_label(UserProfile), object_pk=str(deleted.pk)
+        ).exists())
+        self.assertEqual(
+            list(SearchDocument.objects.filter(entity_type='user', object_id__in=[p.user_id for p in self.profiles])
+                 .values_list('object_id', flat=True)),
+            [kept.user_id]
+        )
+        self.assertEqual([s['label'] for s in typeahead_index.suggest('b')], ['b2'])
+        self.assertEqual(typeahead_index.stats['reloads'], reloads)
+
+    def delete_queries(self, count):
+        role = Role.objects.get(code='grader')
+        recipient = self.profiles[2].user
+        profiles = []
+        for i in range(count):
+            user = User.objects.create_user(username=f'q{count}-{i}', email=f'q{count}-{i}@uni.edu')
+            Token.objects.create(user=user)
+            UserRoleAssignment.objects.create(user=user, role=role)
+            PrivateMessage.objects.create(sender=user, recipient=recipient, subject='Hi', content='Hi', attachments=['notes.pdf'])
+            profiles.append(UserProfile.objects.create(user=user, role='STUDENT'))
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                counts = user_actions.delete_users([profile.pk for profile in profiles])
+        self.assertEqual(counts['users'], count)
+        return len(queries)
+
+    def test_delete_runs_the_same_queries_for_any_number_of_users(self):
+        # The first delete also creates the version rows the test data never committed
+        self.delete_queries(1)
+        self.assertEqual(self.delete_queries(2), self.delete_queries(20))
+
+    def test_deactivate_moves_profile_updated_at(self):
+        before = self.profiles[0].updated_at
+        self.bulk_action('deactivate', [self.profiles[0].pk])
+        self.profiles[0].refresh_from_db()
+        self.assertGreater(self.profiles[0].updated_at, before)
+
+    def test_rejects_unknown_action_and_bad_ids(self):
+        self.assertEqual(self.bulk_action('archive', [self.profiles[0].pk]).status_code, 400)
+        self.assertEqual(self.bulk_action('delete', ['x']).status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='registrar')
+        now = timezone.now()
+        cls.profiles = []
+        for i in range(5):
+            user = User.objects.create_user(username=f'p{i}', last_login=now - timedelta(days=i) if i % 2 else None)
+            cls.profiles.append(UserProfile.objects.create(user=user, role='STUDENT'))
+
+    def page(self, url=None, **params):
+        if url:
+            query = parse_qs(urlparse(url).query)
+            params = {key: values[0] for key, values in query.items()}
+        request = self.factory.get('/api/v1/admin/users/', params)
+        force_authenticate(request, self.admin)
+        response = AdminUserViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, **params):
+        pages = [self.page(limit=2, **params)]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        return pages
+
+    def test_walks_every_row_once_in_order(self):
+        pages = self.walk()
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [row['id'] for page in pages for row in page['results']],
+            [profile.pk for profile in reversed(self.profiles)],
+        )
+        self.assertEqual((pages[0]['count'], pages[0]['count_is_estimate']), (5, False))
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.page(pages[2]['previous'])
+        self.assertEqual(back['results'], pages[1]['results'])
+        self.assertEqual(self.page(back['previous'])['results'], pages[0]['results'])
+
+    def test_orders_across_null_values(self):
+        pages = self.walk(ordering='user__last_login')
+        usernames = [row['user']['username'] for page in pages for row in page['results']]
+        # Oldest login first, then users who never logged in
+        self.assertEqual(usernames, ['p3', 'p1', 'p0', 'p2', 'p4'])
+        back = self.page(pages[-1]['previous'])
+        self.assertEqual(back['results'], pages[-2]['results'])
+
+    def test_rejects_tampered_cursor(self):
+        request = self.factory.get('/api/v1/admin/users/', {'cursor': 'not-a-cursor'})
+        force_authenticate(request, self.admin)
+        self.assertEqual(AdminUserViewSet.as_view({'get': 'list'})(request).status_code, 404)
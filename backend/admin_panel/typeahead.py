@@ -0,0 +1,288 @@
+"""
+In-process prefix index for admin search suggestions
+
+Each process keeps one sorted list of (key, entity type, id) tuples over
+usernames, user names and emails and the codes and names of courses,
+departments and programs; a lookup is a bisect to the first key with the
+typed prefix followed by a short scan, so it never touches the database.
+
+Saves and deletes made in this process are applied to the list directly
+once their transaction commits. Changes from other processes are noticed
+through SearchIndexVersion, checked at most once per
+SEARCH_TYPEAHEAD_CHECK_INTERVAL seconds: only the entity types whose
+version moved are reloaded.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from academics.models import Department, Program
+from core.row_signals import receivers_suspended
+from courses.models import Course
+from users.models import UserProfile
+
+from .search_index import URLS, affects_index, entity_type_of, local_bumps
+
+MAX_KEY_LENGTH = 100
+# Keys looked at per requested suggestion before giving up on filling the list
+SCAN_FACTOR = 20
+DEFAULT_LIMIT = 10
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())[:MAX_KEY_LENGTH]
+
+
+def user_entry(pk, username, first_name, last_name, email):
+    """
+    Suggestion fields and keys of a user
+
+    Returns:
+        tuple: ({'label': ..., 'detail': ...}, keys)
+    """
+    full_name = f"{first_name} {last_name}".strip()
+    entry = {'label': full_name or username, 'detail': email or username}
+    return entry, (username, first_name, last_name, full_name, email)
+
+
+def coded_entry(pk, code, name):
+    return {'label': name, 'detail': code}, (code, name)
+
+
+# entity type: (model, values_list fields, entry builder)
+SOURCES = {
+    'user': (User, ('pk', 'username', 'first_name', 'last_name', 'email'), user_entry),
+    'course': (Course, ('pk', 'code', 'name'), coded_entry),
+    'department': (Department, ('pk', 'code', 'name'), coded_entry),
+    'program': (Program, ('pk', 'code', 'name'), coded_entry),
+}
+
+
+class TypeaheadIndex:
+    """
+    Sorted-array prefix index with per-entity-type reloads
+    """
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval
+        self.stats = {'lookups': 0, 'reloads': 0, 'version_checks': 0, 'local_changes': 0}
+        self._lock = threading.Lock()
+        self._versions = None
+        self._checked_at = 0.0
+        self._keys = []
+        self._entries = {}
+        # search_index.local_bumps as of the last time each version matched
+        self._seen_bumps = {}
+
+    def _interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return getattr(settings, 'SEARCH_TYPEAHEAD_CHECK_INTERVAL', 1.0)
+
+    def _refresh(self):
+        if self._versions is not None and time.monotonic() - self._checked_at < self._interval():
+            return
+
+        from .models import SearchIndexVersion
+
+        with self._lock:
+            if self._versions is not None and time.monotonic() - self._checked_at < self._interval():
+                return
+            versions = SearchIndexVersion.current()
+            self.stats['version_checks'] += 1
+            stale = [
+                entity_type for entity_type in SOURCES
+                if self._versions is None or versions.get(entity_type, 0) != self._versions.get(entity_type, 0)
+            ]
+            if stale:
+                self._reload(stale, versions)
+            self._checked_at = time.monotonic()
+
+    def _reload(self, entity_types, versions):
+        """Replace the keys of the given entity types with fresh rows"""
+        entity_types = set(entity_types)
+        keys = [key for key in self._keys if key[1] not in entity_types]
+        entries = {ref: entry for ref, entry in self._entries.items() if ref[0] not in entity_types}
+        for entity_type in entity_types:
+            model, fields, build = SOURCES[entity_type]
+            for row in model.objects.order_by().values_list(*fields).iterator(chunk_size=5000):
+                ref = (entity_type, row[0])
+                entry, entry_keys = build(*row)
+                entry['keys'] = self._key_set(entry_keys)
+                entries[ref] = entry
+                keys.extend((key, entity_type, row[0]) for key in entry['keys'])
+            self._seen_bumps[entity_type] = local_bumps.get(entity_type, 0)
+        keys.sort()
+
+        self._keys = keys
+        self._entries = entries
+        self._versions = {**(self._versions or {}), **{t: versions.get(t, 0) for t in entity_types}}
+        self.stats['reloads'] += 1
+
+    @staticmethod
+    def _key_set(keys):
+        return tuple(dict.fromkeys(key for key in map(normalize, keys) if key))
+
+    def _remove(self, keys, ref):
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            i = bisect_left(keys, (key, *ref))
+            if i < len(keys) and keys[i] == (key, *ref):
+                del keys[i]
+
+    def apply(self, entity_type, pk, values=None):
+        """
+        Apply one committed change made by this process
+
+        Args:
+            entity_type: Entity type of the changed row
+            pk: Primary key of the row
+            values: Row values in SOURCES order (without pk), None if deleted
+        """
+        with self._lock:
+            if self._versions is None:
+                return
+            # Lookups run without the lock, so change a copy and swap it in
+            keys = list(self._keys)
+            ref = (entity_type, pk)
+            self._remove(keys, ref)
+            if values is not None:
+                _, _, build = SOURCES[entity_type]
+                entry, entry_keys = build(pk, *values)
+                entry['keys'] = self._key_set(entry_keys)
+                for key in entry['keys']:
+                    insort(keys, (key, *ref))
+                self._entries[ref] = entry
+            self._keys = keys
+            self.stats['local_changes'] += 1
+            self._acknowledge(entity_type)
+
+    def remove(self, entity_type, pks):
+        """Apply one committed delete of many rows (one version bump) made by this process"""
+        refs = {(entity_type, pk) for pk in pks}
+        with self._lock:
+            if self._versions is None or not refs:
+                return
+            entries = {ref: entry for ref, entry in self._entries.items() if ref not in refs}
+            self._keys = [key for key in self._keys if key[1:] not in refs]
+            self._entries = entries
+            self.stats['local_changes'] += 1
+            self._acknowledge(entity_type)
+
+    def acknowledge(self, entity_type):
+        """Account for a committed version bump of this process that needs no key changes"""
+        with self._lock:
+            if self._versions is not None:
+                self._acknowledge(entity_type)
+
+    def _acknowledge(self, entity_type):
+        """
+        Adopt the database version of an entity type if every bump since
+        the index last matched it came from this process, so the next check
+        does not reload the entity type
+        """
+        from .models import SearchIndexVersion
+
+        bumps = local_bumps.get(entity_type, 0)
+        version = SearchIndexVersion.current().get(entity_type, 0)
+        if version == self._versions.get(entity_type, 0) + bumps - self._seen_bumps.get(entity_type, 0):
+            self._versions[entity_type] = version
+            self._seen_bumps[entity_type] = bumps
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT, entity_types=None):
+        """
+        Suggestions whose username, name, email or code starts with prefix
+
+        Exact matches come first, then shorter keys.
+
+        Returns:
+            list: [{'id', 'type', 'label', 'detail', 'url'}, ...]
+        """
+        self._refresh()
+        self.stats['lookups'] += 1
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        keys = self._keys
+        best = {}
+        i = bisect_left(keys, (prefix,))
+        scan_end = i + limit * SCAN_FACTOR
+        while i < min(len(keys), scan_end):
+            key, entity_type, pk = keys[i]
+            if not key.startswith(prefix):
+                break
+            i += 1
+            if entity_types and entity_type not in entity_types:
+                continue
+            rank = (key != prefix, len(key))
+            ref = (entity_type, pk)
+            if ref not in best or rank < best[ref]:
+                best[ref] = rank
+
+        suggestions = []
+        for ref, _ in sorted(best.items(), key=lambda item: (item[1], item[0])):
+            entry = self._entries.get(ref)
+            if entry is None:
+                continue
+            entity_type, pk = ref
+            suggestions.append({
+                'id': str(pk),
+                'type': entity_type,
+                'label': entry['label'],
+                'detail': entry['detail'],
+                'url': URLS[entity_type].format(id=pk),
+            })
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+    def invalidate(self):
+        """Drop the index so the next lookup reloads it"""
+        with self._lock:
+            self._versions = None
+            self._keys = []
+            self._entries = {}
+
+
+typeahead_index = TypeaheadIndex()
+
+
+def apply_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    entity_type = entity_type_of(sender)
+    if raw or not affects_index(entity_type, update_fields):
+        return
+    _, fields, _ = SOURCES[entity_type]
+    values = [getattr(instance, field) for field in fields[1:]]
+    transaction.on_commit(lambda: typeahead_index.apply(entity_type, instance.pk, values))
+
+
+def apply_deleted(sender, instance, **kwargs):
+    if receivers_suspended():
+        return
+    entity_type = entity_type_of(sender)
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead_index.apply(entity_type, pk))
+
+
+def acknowledge_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Profile writes bump the user version (see search_index) without changing any key"""
+    if raw or receivers_suspended() or not affects_index('profile', update_fields):
+        return
+    transaction.on_commit(lambda: typeahead_index.acknowledge('user'))
+
+
+def connect_typeahead_signals():
+    """Apply this process's own writes to its typeahead index after commit"""
+    for entity_type, (model, _, _) in SOURCES.items():
+        post_save.connect(apply_saved, sender=model, dispatch_uid=f'typeahead-save-{entity_type}')
+        post_delete.connect(apply_deleted, sender=model, dispatch_uid=f'typeahead-delete-{entity_type}')
+    post_save.connect(acknowledge_profile, sender=UserProfile, dispatch_uid='typeahead-save-profile')
+    post_delete.connect(acknowledge_profile, sender=UserProfile, dispatch_uid='typeahead-delete-profile')
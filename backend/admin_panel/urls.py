@@ -8,9 +8,9 @@ from .views_dashboard import dashboard_metrics, user_analytics, activity_logs
 from .views_users import AdminUserViewSet
 from .views_notifications import (
     get_notifications, mark_notification_read, mark_all_notifications_read,
-    delete_notification, create_notification
+    delete_notification, create_notification, notification_stream
 )
-from .views_search import search
+from .views_search import search, suggest, search_metrics
 from rbac.views import RoleViewSet, PermissionViewSet
 
 router = DefaultRouter()
@@ -37,7 +37,10 @@ urlpatterns = [
     path('notifications/mark-all-read/', mark_all_notifications_read, name='admin-mark-all-notifications-read'),
     path('notifications/<int:notification_id>/', delete_notification, name='admin-delete-notification'),
     path('notifications/create/', create_notification, name='admin-create-notification'),
+    path('notifications/stream/', notification_stream, name='admin-notification-stream'),
     
     # Search
     path('search/', search, name='admin-search'),
+    path('search/suggest/', suggest, name='admin-search-suggest'),
+    path('search/metrics/', search_metrics, name='admin-search-metrics'),
 ]
@@ -0,0 +1,162 @@
+"""
+Bulk activate, deactivate and delete of admin-selected users
+
+The selected profile ids are handled SYSTEM_USER_BULK_CHUNK_SIZE at a time,
+one transaction per chunk, with set-based statements only:
+
+- activate / deactivate update the profiles and their users (only rows not
+  already in the target state, so the counts are rows actually changed);
+  deactivating also revokes the users' API tokens
+- delete removes the users' tokens and role assignments and then the users,
+  which cascades to the profiles and everything else the users own
+
+Counts come from the rowcounts of update() and delete(). Rows changed with
+update() send no signals, so their search documents are rewritten here and
+the in-process search caches are told once per chunk after it commits.
+
+Deletes run with the per-row delete receivers suspended (core.row_signals):
+the rows the delete collects are known up front, so their backup
+tombstones are written with one bulk insert, search documents are dropped
+with one DELETE and one version bump per entity type, unread counters of
+the remaining users are adjusted once each, and the typeahead index and
+search caches are updated once after the chunk commits.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from communications import counters
+from core import row_signals
+from rbac.models import UserRoleAssignment
+from users.models import UserProfile
+
+from . import backup, search_index
+from .activity import log_activity
+from .models import BackupTombstone
+from .search_cache import search_cache
+from .typeahead import typeahead_index
+
+ACTIONS = {
+    'activate': 'Activated',
+    'deactivate': 'Deactivated',
+    'delete': 'Deleted',
+}
+# Ids kept in the audit entry's extra_data
+AUDIT_ID_LIMIT = 1000
+
+
+def chunk_size():
+    return getattr(settings, 'SYSTEM_USER_BULK_CHUNK_SIZE', 1000)
+
+
+def set_active(profile_ids, is_active):
+    """Activate or deactivate one chunk (in the caller's transaction)"""
+    user_ids = list(UserProfile.objects.filter(pk__in=profile_ids).values_list('user_id', flat=True))
+    changed_users = list(
+        User.objects.filter(pk__in=user_ids).exclude(is_active=is_active).values_list('pk', flat=True)
+    )
+    counts = {
+        'profiles': UserProfile.objects.filter(pk__in=profile_ids).exclude(is_active=is_active).update(
+            is_active=is_active, updated_at=timezone.now()
+        ),
+        'users': User.objects.filter(pk__in=changed_users).update(is_active=is_active),
+        'tokens': 0,
+    }
+    if not is_active:
+        counts['tokens'], _ = Token.objects.filter(user_id__in=user_ids).delete()
+    if changed_users:
+        search_index.index_updated('user', changed_users)
+    return counts
+
+
+def delete_users(profile_ids):
+    """Delete the users of one chunk of profiles (in the caller's transaction)"""
+    user_ids = list(UserProfile.objects.filter(pk__in=profile_ids).values_list('user_id', flat=True))
+    tokens, _ = Token.objects.filter(user_id__in=user_ids).delete()
+    assignments, _ = UserRoleAssignment.objects.filter(user_id__in=user_ids).delete()
+
+    users = User.objects.filter(pk__in=user_ids)
+    collector = Collector(using=users.db, origin=users)
+    collector.collect(users)
+    # Collector.delete() clears the pks of the collected instances
+    deleted_pks = {model: [instance.pk for instance in instances] for model, instances in collector.data.items()}
+    backup.write_tombstones(users.db, [
+        BackupTombstone(model=backup.model_label(model), object_pk=str(pk))
+        for model, pks in deleted_pks.items() if backup.tracks_deletes(model)
+        for pk in pks
+    ])
+    counters.adjust_deleted(collector.data)
+    indexed = {}
+    for model, pks in deleted_pks.items():
+        entity_type = search_index.entity_type_of(model)
+        if entity_type is not None:
+            indexed.setdefault(entity_type, []).extend(pks)
+    for entity_type, pks in indexed.items():
+        search_index.remove_many(entity_type, pks)
+    with row_signals.suspended():
+        _, deleted = collector.delete()
+
+    def after_delete():
+        for entity_type, pks in indexed.items():
+            typeahead_index.remove(entity_type, pks)
+        search_cache.recheck()
+
+    transaction.on_commit(after_delete)
+    return {
+        'profiles': deleted.get(UserProfile._meta.label, 0),
+        'users': deleted.get(User._meta.label, 0),
+        'tokens': tokens,
+        'role_assignments': assignments,
+    }
+
+
+def after_commit():
+    search_cache.recheck()
+    typeahead_index.acknowledge('user')
+
+
+def run_bulk_action(action, profile_ids, request=None):
+    """
+    Apply a bulk action to the given profile ids
+
+    Args:
+        action: One of ACTIONS
+        profile_ids: UserProfile ids (duplicates and unknown ids are ignored)
+        request: Request the action came from (audit log actor)
+
+    Returns:
+        dict: Rows affected per table ({'profiles': ..., 'users': ..., ...})
+    """
+    profile_ids = sorted(set(profile_ids))
+    size = chunk_size()
+    totals = {}
+    for start in range(0, len(profile_ids), size):
+        chunk = profile_ids[start:start + size]
+        with transaction.atomic():
+            if action == 'delete':
+                counts = delete_users(chunk)
+            else:
+                counts = set_active(chunk, action == 'activate')
+            if action != 'delete' and counts['users']:
+                transaction.on_commit(after_commit)
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+
+    log_activity(
+        'bulk_action',
+        f"Bulk action: {ACTIONS[action]} {totals.get('profiles', 0)} users",
+        request=request,
+        level='WARNING' if action == 'delete' else 'INFO',
+        category='USER',
+        extra_data={
+            'action': action,
+            'requested': len(profile_ids),
+            'affected': totals,
+            'profile_ids': profile_ids[:AUDIT_ID_LIMIT],
+            'profile_ids_truncated': len(profile_ids) > AUDIT_ID_LIMIT,
+        },
+    )
+    return totals
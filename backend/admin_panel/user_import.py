@@ -0,0 +1,633 @@
+"""
+Chunked bulk user import
+
+Rows are streamed from the uploaded file and handled a chunk at a time
+(SYSTEM_USER_IMPORT_CHUNK_SIZE rows): every row of a chunk is validated,
+the usernames, emails and student/employee ids it uses are looked up with
+one IN query each, and the valid rows are inserted with bulk_create (users,
+profiles, student/faculty profiles and audit log entries) in one
+transaction per chunk. If a chunk still hits a unique constraint (another
+import or signup raced it), that chunk is retried row by row so the
+offending rows are reported and the rest are kept.
+
+Uploads are not imported on the request thread: bulk_import stores the file
+and queues a UserImportJob, which the run_user_imports worker (or a
+background thread when SYSTEM_USER_IMPORT_RUN_IN_PROCESS is set) runs. Each
+chunk's users, rejected rows and the job's progress commit together, so a
+job whose worker died is picked up again after SYSTEM_USER_IMPORT_STALE_AFTER
+seconds and continues after the last committed row.
+"""
+import csv
+import io
+import logging
+import os
+import posixpath
+import threading
+import uuid
+import zipfile
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from users.models import UserProfile, StudentProfile, FacultyProfile
+
+from . import search_index
+from .activity import activity_entry
+from .mailer import send_templated_email, user_context
+from .models import SystemLog, UserImportError, UserImportJob
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['username', 'email', 'first_name', 'last_name']
+ROLES = {role for role, _ in UserProfile.ROLE_CHOICES}
+DESIGNATIONS = {designation for designation, _ in FacultyProfile.DESIGNATION_CHOICES}
+# Unique columns checked against the database and within the file:
+# row field -> (model, lookup, message)
+UNIQUE_FIELDS = {
+    'username': (User, 'username', 'Username already exists'),
+    'email': (User, 'email', 'Email already exists'),
+    'student_id': (UserProfile, 'student_id', 'Student ID already exists'),
+    'employee_id': (UserProfile, 'employee_id', 'Employee ID already exists'),
+}
+MAX_LENGTHS = {
+    'username': User._meta.get_field('username').max_length,
+    'email': User._meta.get_field('email').max_length,
+    'first_name': User._meta.get_field('first_name').max_length,
+    'last_name': User._meta.get_field('last_name').max_length,
+    'student_id': UserProfile._meta.get_field('student_id').max_length,
+    'employee_id': UserProfile._meta.get_field('employee_id').max_length,
+    'phone_number': UserProfile._meta.get_field('phone_number').max_length,
+    'emergency_contact': UserProfile._meta.get_field('emergency_contact').max_length,
+}
+
+
+class ImportFileError(Exception):
+    """The uploaded file cannot be read at all"""
+
+
+def read_csv(file):
+    """
+    Stream (row number, row dict) pairs from a CSV upload
+
+    The header is row 1. The file is decoded as it is read, so memory does
+    not grow with its size.
+    """
+    file.seek(0)
+    text = io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline='')
+    try:
+        for row_num, row in enumerate(csv.DictReader(text), start=2):
+            yield row_num, row
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(str(e))
+    finally:
+        # Leave the upload open for the caller; if the generator is closed
+        # after the upload itself, there is nothing left to detach
+        if not text.closed:
+            text.detach()
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(ref):
+    """Zero-based column of a cell reference such as 'AB12'"""
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def cell_number(value):
+    """Numeric cell text as the user typed it: 2024, not 2024.0"""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(number)) if number.is_integer() else value
+
+
+def xlsx_elements(stream, name):
+    """
+    Yield the completed <name> elements of an XML stream, each detached
+    from the tree once the caller has moved on so the tree never grows
+    """
+    parents = []
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        if local_name(element.tag) == name:
+            yield element
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+
+def xlsx_text(element):
+    """Text of a shared string or inline string, without phonetic runs"""
+    parts = []
+    for child in element:
+        tag = local_name(child.tag)
+        if tag == 't':
+            parts.append(child.text or '')
+        elif tag == 'r':
+            parts.extend(t.text or '' for t in child if local_name(t.tag) == 't')
+    return ''.join(parts)
+
+
+def xlsx_first_sheet(archive):
+    """Archive path of the workbook's first worksheet"""
+    try:
+        with archive.open('xl/workbook.xml') as workbook:
+            sheet = next(xlsx_elements(workbook, 'sheet'), None)
+            rel_id = next((value for key, value in sheet.attrib.items() if local_name(key) == 'id'), None) if sheet is not None else None
+        with archive.open('xl/_rels/workbook.xml.rels') as rels:
+            for rel in xlsx_elements(rels, 'Relationship'):
+                if rel.get('Id') == rel_id:
+                    target = rel.get('Target')
+                    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    except KeyError:
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def read_xlsx(file):
+    """
+    Stream (row number, row dict) pairs from the first sheet of an XLSX upload
+
+    The sheet XML is parsed incrementally straight out of the zip container
+    and every row is freed once yielded, so memory holds one row plus the
+    workbook's shared strings table (the distinct text values), not the
+    sheet. The first non-empty row is the header; row numbers are the
+    sheet's own.
+    """
+    file.seek(0)
+    try:
+        with zipfile.ZipFile(getattr(file, 'file', file)) as archive:
+            shared = []
+            if 'xl/sharedStrings.xml' in archive.namelist():
+                with archive.open('xl/sharedStrings.xml') as strings:
+                    shared = [xlsx_text(si) for si in xlsx_elements(strings, 'si')]
+
+            header = None
+            with archive.open(xlsx_first_sheet(archive)) as sheet:
+                for row_num, row in enumerate(xlsx_elements(sheet, 'row'), start=1):
+                    row_num = int(row.get('r') or row_num)
+                    values = {}
+                    for position, cell in enumerate(c for c in row if local_name(c.tag) == 'c'):
+                        ref = cell.get('r')
+                        kind = cell.get('t', 'n')
+                        value = ''
+                        for child in cell:
+                            tag = local_name(child.tag)
+                            if tag == 'v':
+                                value = child.text or ''
+                            elif tag == 'is':
+                                value = xlsx_text(child)
+                        if kind == 's' and value:
+                            value = shared[int(value)]
+                        elif kind == 'n' and value:
+                            value = cell_number(value)
+                        elif kind == 'b':
+                            value = 'true' if value == '1' else 'false'
+                        values[column_index(ref) if ref else position] = value
+                    if not any(value.strip() for value in values.values()):
+                        continue
+                    if header is None:
+                        header = {index: name.strip() for index, name in values.items() if name.strip()}
+                        continue
+                    yield row_num, {name: values.get(index, '') for index, name in header.items()}
+    except (zipfile.BadZipFile, ParseError, KeyError, IndexError, ValueError) as e:
+        raise ImportFileError(f'Invalid Excel file: {e}')
+
+
+def read_rows(file):
+    """Stream (row number, row dict) pairs from an uploaded import file"""
+    name = (file.name or '').lower()
+    if name.endswith('.csv'):
+        return read_csv(file)
+    if name.endswith('.xlsx'):
+        return read_xlsx(file)
+    raise ImportFileError('Only CSV and Excel (.xlsx) files are supported')
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else ('' if value is None else str(value).strip())
+
+
+class UserImporter:
+    """
+    Validate and insert uploaded user rows chunk by chunk
+
+    Args:
+        role: Role for every row (otherwise the row's role column, default STUDENT)
+        department: Department for faculty rows without one
+        send_welcome_email: Send the WELCOME template to imported users
+        validate_only: Check every row without inserting anything
+        admin_user: User running the import (audit log actor)
+        chunk_size: Rows per chunk (default SYSTEM_USER_IMPORT_CHUNK_SIZE)
+    """
+
+    def __init__(self, role=None, department=None, send_welcome_email=True, validate_only=False,
+                 admin_user=None, chunk_size=None):
+        self.role = role.upper() if role else None
+        self.department = department
+        self.send_welcome_email = send_welcome_email
+        self.validate_only = validate_only
+        self.admin_user = admin_user
+        self.chunk_size = chunk_size or getattr(settings, 'SYSTEM_USER_IMPORT_CHUNK_SIZE', 2000)
+        self.now = timezone.now()
+        # Unique values used by earlier rows of the file, to catch duplicates
+        # the database cannot see yet (validate_only) or that a chunk repeats
+        self.seen = {field: set() for field in UNIQUE_FIELDS}
+        self.result = {
+            'total_rows': 0,
+            'successful_imports': 0,
+            'failed_imports': 0,
+            'errors': [],
+            'warnings': [],
+            'imported_users': [],
+        }
+        self.welcome_recipients = []
+
+    def run(self, rows):
+        """
+        Import every row
+
+        Args:
+            rows: Iterable of (row number, row dict)
+
+        Returns:
+            dict: BulkUserImportResultSerializer data
+        """
+        try:
+            for chunk in chunks(rows, self.chunk_size):
+                self.process_chunk(chunk)
+        except ImportFileError as e:
+            self.result['errors'].append({'row': 0, 'field': 'file', 'message': f'Error reading file: {e}'})
+        self.send_welcome_emails()
+        return self.result
+
+    def error(self, row_num, field, message):
+        self.result['errors'].append({'row': row_num, 'field': field, 'message': message})
+
+    def process_chunk(self, chunk):
+        """Validate one chunk and insert its valid rows"""
+        self.result['total_rows'] += len(chunk)
+        valid = []
+        for row_num, row in chunk:
+            data = self.validate_row(row_num, row)
+            if data is None:
+                self.result['failed_imports'] += 1
+            else:
+                valid.append((row_num, data))
+
+        valid = self.drop_duplicates(valid)
+        if self.validate_only:
+            self.result['successful_imports'] += len(valid)
+            return
+        if not valid:
+            return
+        try:
+            with transaction.atomic():
+                users = self.insert(valid)
+            self.record_imported(users)
+        except IntegrityError:
+            # Something inserted a conflicting row since the lookup; find
+            # the offending rows one by one
+            for row in valid:
+                try:
+                    with transaction.atomic():
+                        users = self.insert([row])
+                    self.record_imported(users)
+                except IntegrityError as e:
+                    self.error(row[0], 'general', f'Error processing row: {e}')
+                    self.result['failed_imports'] += 1
+
+    def validate_row(self, row_num, row):
+        """
+        Check one row on its own (no database access)
+
+        Returns:
+            dict or None: Cleaned values, or None if the row has errors
+        """
+        data = {key: clean(value) for key, value in row.items() if key}
+        errors = [(field, f'{field} is required') for field in REQUIRED_FIELDS if not data.get(field)]
+
+        for field, max_length in MAX_LENGTHS.items():
+            if len(data.get(field, '')) > max_length:
+                errors.append((field, f'{field} must be at most {max_length} characters'))
+
+        if data.get('email'):
+            try:
+                validate_email(data['email'])
+            except ValidationError:
+                errors.append(('email', 'Enter a valid email address'))
+
+        data['role'] = self.role or data.get('role', '').upper() or 'STUDENT'
+        if data['role'] not in ROLES:
+            errors.append(('role', f"Invalid role: {data['role']}"))
+
+        if data['role'] == 'STUDENT':
+            try:
+                data['admission_year'] = int(data.get('admission_year') or self.now.year)
+            except ValueError:
+                errors.append(('admission_year', 'admission_year must be a year'))
+        elif data['role'] == 'FACULTY':
+            data['designation'] = data.get('designation', '').upper() or 'LECTURER'
+            if data['designation'] not in DESIGNATIONS:
+                errors.append(('designation', f"Invalid designation: {data['designation']}"))
+
+        for field, message in errors:
+            self.error(row_num, field, message)
+        return None if errors else data
+
+    def drop_duplicates(self, rows):
+        """
+        Reject rows whose unique values exist in the database or earlier in the file
+
+        One query per unique column for the whole chunk.
+        """
+        existing = {}
+        for field, (model, lookup, _) in UNIQUE_FIELDS.items():
+            values = {data[field] for _, data in rows if data.get(field)}
+            existing[field] = set(
+                model.objects.filter(**{f'{lookup}__in': values}).values_list(lookup, flat=True)
+            ) if values else set()
+
+        kept = []
+        for row_num, data in rows:
+            problems = []
+            for field, (_, _, message) in UNIQUE_FIELDS.items():
+                value = data.get(field)
+                if not value:
+                    continue
+                if value in existing[field]:
+                    problems.append((field, message))
+                elif value in self.seen[field]:
+                    problems.append((field, f'Duplicate {field} in file'))
+            if problems:
+                for field, message in problems:
+                    self.error(row_num, field, message)
+                self.result['failed_imports'] += 1
+                continue
+            for field in UNIQUE_FIELDS:
+                if data.get(field):
+                    self.seen[field].add(data[field])
+            kept.append((row_num, data))
+        return kept
+
+    def insert(self, rows):
+        """
+        Insert validated rows with one bulk_create per table (in the caller's transaction)
+
+        Returns:
+            list: The created users
+        """
+        users = User.objects.bulk_create([
+            User(
+                username=data['username'],
+                email=data['email'],
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                is_active=True,
+            )
+            for _, data in rows
+        ])
+        if any(user.pk is None for user in users):
+            # Backends that cannot return inserted ids
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        profiles = UserProfile.objects.bulk_create([
+            UserProfile(
+                user=user,
+                role=data['role'],
+                phone_number=data.get('phone_number', ''),
+                address=data.get('address', ''),
+                emergency_contact=data.get('emergency_contact', ''),
+                student_id=data.get('student_id') or None,
+                employee_id=data.get('employee_id') or None,
+            )
+            for user, (_, data) in zip(users, rows)
+        ])
+        if any(profile.pk is None for profile in profiles):
+            ids = dict(UserProfile.objects.filter(user__in=users).values_list('user_id', 'pk'))
+            for profile in profiles:
+                profile.pk = ids[profile.user_id]
+
+        StudentProfile.objects.bulk_create([
+            StudentProfile(user_profile=profile, admission_year=data['admission_year'])
+            for profile, (_, data) in zip(profiles, rows) if data['role'] == 'STUDENT'
+        ])
+        FacultyProfile.objects.bulk_create([
+            FacultyProfile(
+                user_profile=profile,
+                department=self.department or data.get('department', ''),
+                designation=data['designation'],
+                qualification=data.get('qualification', ''),
+            )
+            for profile, (_, data) in zip(profiles, rows) if data['role'] == 'FACULTY'
+        ])
+
+        admin_profile = getattr(self.admin_user, 'profile', None)
+        SystemLog.objects.bulk_create([
+            activity_entry(
+                'user_imported',
+                f'User imported: {user.username}',
+                user=self.admin_user,
+                category='USER',
+                ip_address=admin_profile.last_login_ip if admin_profile else None,
+                request_path='/admin/users/bulk-import/',
+                request_method='POST',
+            )
+            for user in users
+        ])
+
+        for user, profile in zip(users, profiles):
+            user.profile = profile
+        search_index.index_created('user', users)
+        return users
+
+    def record_imported(self, users):
+        self.result['successful_imports'] += len(users)
+        for user in users:
+            self.result['imported_users'].append({
+                'username': user.username,
+                'email': user.email,
+                'name': f"{user.first_name} {user.last_name}"
+            })
+            if self.send_welcome_email:
+                self.welcome_recipients.append((user.email, user_context(user)))
+
+    def send_welcome_emails(self):
+        if not self.welcome_recipients:
+            return
+        recipients, self.welcome_recipients = self.welcome_recipients, []
+        # Rendered from the cached WELCOME template and sent in batches
+        # over one mail connection each
+        try:
+            mail = send_templated_email('WELCOME', recipients)
+            if mail['failed']:
+                self.result['warnings'].append({
+                    'row': 0,
+                    'field': 'email',
+                    'message': f"{mail['failed']} welcome emails could not be sent"
+                })
+        except Exception as e:
+            logger.error(f"Welcome email error: {e}")
+            self.result['warnings'].append({'row': 0, 'field': 'email', 'message': 'Welcome emails could not be sent'})
+
+
+def import_root():
+    return Path(getattr(settings, 'SYSTEM_USER_IMPORT_ROOT', Path(settings.PRIVATE_ROOT) / 'imports'))
+
+
+def create_job(file, options, created_by=None):
+    """
+    Store an upload and queue a UserImportJob for it
+
+    Args:
+        file: Uploaded file (its type is checked before anything is written)
+        options: role, department, send_welcome_email and validate_only
+        created_by: User submitting the import
+
+    Raises:
+        ImportFileError: The file type is not supported
+    """
+    read_rows(file)
+    root = import_root()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / f"{uuid.uuid4().hex}_{get_valid_filename(os.path.basename(file.name))}"
+    size = 0
+    with open(path, 'wb') as out:
+        for part in file.chunks():
+            out.write(part)
+            size += len(part)
+    return UserImportJob.objects.create(
+        file_name=file.name,
+        file_path=str(path),
+        file_size=size,
+        options=options,
+        created_by=created_by,
+    )
+
+
+def run_job(job, chunk_size=None):
+    """
+    Run an import job to completion on the calling thread
+
+    A job that already committed some chunks skips the rows up to last_row.
+
+    Returns:
+        UserImportJob: The job, COMPLETED or FAILED
+    """
+    job.status = 'RUNNING'
+    job.started_at = job.started_at or timezone.now()
+    job.heartbeat_at = timezone.now()
+    job.error_message = ''
+    job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'error_message'])
+
+    importer = UserImporter(admin_user=job.created_by, chunk_size=chunk_size, **job.options)
+    try:
+        with open(job.file_path, 'rb') as file:
+            rows = (row for row in read_rows(file) if row[0] > job.last_row)
+            for chunk in chunks(rows, importer.chunk_size):
+                run_chunk(job, importer, chunk)
+                importer.send_welcome_emails()
+    except Exception as e:
+        logger.error(f"User import {job.pk} failed: {str(e)}")
+        job.status = 'FAILED'
+        job.error_message = f'Error reading file: {e}' if isinstance(e, ImportFileError) else str(e)
+        job.warnings = job.warnings + importer.result['warnings']
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'warnings', 'completed_at'])
+        return job
+
+    job.status = 'COMPLETED'
+    job.warnings = job.warnings + importer.result['warnings']
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'warnings', 'completed_at'])
+    try:
+        os.remove(job.file_path)
+    except OSError:
+        pass
+    return job
+
+
+def run_chunk(job, importer, chunk):
+    """Import one chunk and record it on the job in the same transaction"""
+    result = importer.result
+    before = result['successful_imports'], result['failed_imports']
+    with transaction.atomic():
+        importer.process_chunk(chunk)
+        UserImportError.objects.bulk_create([
+            UserImportError(job=job, row=error['row'], field=error['field'], message=error['message'])
+            for error in result['errors']
+        ])
+        job.processed_rows += len(chunk)
+        job.successful_imports += result['successful_imports'] - before[0]
+        job.failed_imports += result['failed_imports'] - before[1]
+        job.last_row = chunk[-1][0]
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['processed_rows', 'successful_imports', 'failed_imports', 'last_row', 'heartbeat_at'])
+    # Everything above is on the job now; keep the worker's memory flat
+    result['errors'].clear()
+    result['imported_users'].clear()
+
+
+def claim_next_job():
+    """
+    Atomically take the oldest queued job, or a running job whose worker
+    stopped sending heartbeats; None if there is neither
+    """
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'SYSTEM_USER_IMPORT_STALE_AFTER', 300))
+    with transaction.atomic():
+        job = (
+            UserImportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='QUEUED') | Q(status='RUNNING', heartbeat_at__lt=stale_before))
+            .order_by('created_at').first()
+        )
+        if job is not None:
+            job.status = 'RUNNING'
+            job.attempts += 1
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['status', 'attempts', 'heartbeat_at'])
+    return job
+
+
+def run_job_in_background(job):
+    """Run an import job on a daemon thread (SYSTEM_USER_IMPORT_RUN_IN_PROCESS)"""
+    def target():
+        try:
+            run_job(job)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=target, name=f'user-import-{job.pk}', daemon=True)
+    thread.start()
+    return thread
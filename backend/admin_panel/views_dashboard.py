@@ -17,6 +17,7 @@ from assignments.models import Assignment
 from academics.models import Department, Program
 from .models import SystemLog
 from rbac.decorators import require_permissions
+from core.pagination import paginate_keyset
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,10 @@ def dashboard_metrics(request):
         week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
         
+        # Range bounds on created_at let PostgreSQL prune SystemLog partitions
+        today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+        week_start = today_start - timedelta(days=7)
+        
         new_users_today = User.objects.filter(date_joined__date=today).count()
         new_users_this_week = User.objects.filter(date_joined__date__gte=week_ago).count()
         new_users_this_month = User.objects.filter(date_joined__date__gte=month_ago).count()
@@ -79,22 +84,20 @@ def dashboard_metrics(request):
         
         # Activity metrics
         logins_today = SystemLog.objects.filter(
-            category='AUTH',
-            message__icontains='login',
-            created_at__date=today
+            activity_type='user_login',
+            created_at__gte=today_start
         ).count()
         logins_this_week = SystemLog.objects.filter(
-            category='AUTH',
-            message__icontains='login',
-            created_at__date__gte=week_ago
+            activity_type='user_login',
+            created_at__gte=week_start
         ).count()
         api_requests_today = SystemLog.objects.filter(
             category='API',
-            created_at__date=today
+            created_at__gte=today_start
         ).count()
         error_count_today = SystemLog.objects.filter(
             level__in=['ERROR', 'CRITICAL'],
-            created_at__date=today
+            created_at__gte=today_start
         ).count()
         
         # System health data
@@ -282,44 +285,58 @@ def user_analytics(request):
 def activity_logs(request):
     """
     Get recent activity logs
+
+    Query params: type (comma-separated activity types), category, days,
+    limit and cursor (from the previous page's next_cursor)
     """
     try:
-        # Get recent system logs and convert to activity format
+        try:
+            days = int(request.GET.get('days', 7))
+            limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response(
+                {'error': 'days and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Activity type and actor are classified when the log is written, so
+        # the feed is a single indexed range scan
         recent_logs = SystemLog.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=7)
-        ).order_by('-created_at')[:50]
-        
+            created_at__gte=timezone.now() - timedelta(days=days)
+        ).select_related('user')
+
+        activity_types = request.GET.get('type')
+        if activity_types:
+            recent_logs = recent_logs.filter(activity_type__in=activity_types.split(','))
+
+        category = request.GET.get('category')
+        if category:
+            recent_logs = recent_logs.filter(category=category)
+
+        try:
+            logs, next_cursor = paginate_keyset(recent_logs, request.GET.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         activities = []
-        for log in recent_logs:
-            # Convert log to activity format
-            activity_type = log.category.lower()
-            if 'login' in log.message.lower():
-                activity_type = 'user_login'
-            elif 'register' in log.message.lower():
-                activity_type = 'user_registration'
-            elif 'create' in log.message.lower():
-                activity_type = 'course_created'
-            elif 'submit' in log.message.lower():
-                activity_type = 'assignment_submitted'
-            elif 'message' in log.message.lower():
-                activity_type = 'message_sent'
-            elif log.level in ['ERROR', 'CRITICAL']:
-                activity_type = 'system_alert'
-            
+        for log in logs:
             activities.append({
                 'id': log.id,
-                'type': activity_type,
+                'type': log.activity_type,
                 'title': log.message[:50] + '...' if len(log.message) > 50 else log.message,
                 'description': log.message,
                 'timestamp': log.created_at,
-                'user_name': log.user.get_full_name() if log.user else 'System',
-                'user_id': log.user.id if log.user else None,
+                'user_name': log.actor_display or (log.user.get_full_name() if log.user else 'System'),
+                'user_id': log.user_id,
                 'category': log.category,
                 'severity': log.level
             })
         
         serializer = ActivityLogSerializer(activities, many=True)
-        return Response(serializer.data)
+        return Response({
+            'results': serializer.data,
+            'next_cursor': next_cursor
+        })
         
     except Exception as e:
         logger.error(f"Error getting activity logs: {e}")
@@ -1,15 +1,25 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework import status, permissions
+from rest_framework import status, permissions, exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.db.models import Q
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
 from .models import Notification
+from communications import counters
+from .notification_stream import PAYLOAD_FIELDS, event_stream, notification_payload, publish_unread
 from .serializers import NotificationSerializer
 from rbac.decorators import require_permissions
+from rbac.permission_manager import PermissionManager
+from core.pagination import paginate_keyset, parse_since
 
 logger = logging.getLogger(__name__)
 
@@ -19,16 +29,31 @@ logger = logging.getLogger(__name__)
 @require_permissions(['can_access_admin_panel'])
 def get_notifications(request):
     """
-    Get notifications for the current user
+    Get notifications for the current user, newest first
+
+    Query params: cursor (the previous page's next_cursor), limit (default
+    50, max 200) and since (ISO datetime; only notifications created after
+    it). Rows use the same compact payload as the notification stream.
     """
     try:
-        notifications = Notification.objects.filter(
-            user=request.user
-        ).order_by('-created_at')[:50]
+        limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        notifications = Notification.objects.filter(user=request.user).values(*PAYLOAD_FIELDS)
+        since = request.query_params.get('since')
+        if since:
+            notifications = notifications.filter(created_at__gt=parse_since(since))
+        rows, next_cursor = paginate_keyset(notifications, request.query_params.get('cursor'), limit)
         
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return Response({
+            'results': [notification_payload(row) for row in rows],
+            'next_cursor': next_cursor
+        })
         
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error getting notifications: {e}")
         return Response(
@@ -45,12 +70,17 @@ def mark_notification_read(request, notification_id):
     Mark a notification as read
     """
     try:
-        notification = Notification.objects.get(
+        notifications = Notification.objects.filter(
             id=notification_id,
             user=request.user
         )
-        notification.is_read = True
-        notification.save()
+        with transaction.atomic():
+            # Only the request whose update flips the row lowers the counter
+            if notifications.filter(is_read=False).update(is_read=True):
+                counters.adjust(request.user.id, admin_notifications=-1)
+                publish_unread(request.user.id, delta=-1)
+            elif not notifications.exists():
+                raise Notification.DoesNotExist
         
         return Response({'success': True})
         
@@ -75,10 +105,14 @@ def mark_all_notifications_read(request):
     Mark all notifications as read for the current user
     """
     try:
-        Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            updated = Notification.objects.filter(
+                user=request.user,
+                is_read=False
+            ).update(is_read=True)
+            if updated:
+                counters.reset(request.user.id, 'admin_notifications')
+                publish_unread(request.user.id, count=0)
         
         return Response({'success': True})
         
@@ -103,6 +137,8 @@ def delete_notification(request, notification_id):
             user=request.user
         )
         notification.delete()
+        if not notification.is_read:
+            publish_unread(request.user.id, delta=-1)
         
         return Response({'success': True})
         
@@ -144,3 +180,57 @@ def create_notification(request):
             {'error': 'Failed to create notification'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+def authenticate_stream_request(request):
+    """
+    Authenticate a stream request the way the API views do
+
+    Returns:
+        tuple: (user, None) or (None, (error message, status code))
+    """
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.APIException as e:
+        return None, (str(e.detail), e.status_code)
+    if not user or not user.is_authenticated:
+        return None, ('Authentication required', status.HTTP_401_UNAUTHORIZED)
+    if not PermissionManager.user_has_permission(user, 'can_access_admin_panel'):
+        return None, ('Insufficient permissions', status.HTTP_403_FORBIDDEN)
+    return user, None
+
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of the current user's notifications
+
+    Replaces polling get_notifications when served by an ASGI server.
+    Under WSGI the stream would hold a worker for NOTIFICATION_STREAM_MAX_AGE
+    and its events would be buffered, so it answers 501 and clients keep
+    polling get_notifications. Clients resume with the Last-Event-ID header
+    (or last_event_id param).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Notification streaming needs an ASGI server'}, status=501)
+    
+    user, error = await sync_to_async(authenticate_stream_request)(request)
+    if error:
+        message, status_code = error
+        return JsonResponse({'error': message}, status=status_code)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid last event id'}, status=400)
+    
+    response = StreamingHttpResponse(event_stream(user, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
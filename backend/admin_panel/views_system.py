@@ -2,21 +2,51 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.db.models import Count, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
+from itertools import islice
 import logging
 
 from .models import SystemSettings, SystemLog, SystemBackup, SystemAnnouncement, EmailTemplate
+from .activity import log_activity
+from .settings_cache import system_settings
+from . import announcements
+from . import backup as backup_engine
+from . import log_archive, log_search, log_stats
 from .serializers import (
     SystemSettingsSerializer, SystemLogSerializer, SystemBackupSerializer,
     SystemAnnouncementSerializer, EmailTemplateSerializer
 )
 from rbac.decorators import require_permissions
+from core.pagination import KeysetPagination, paginate_keyset
 
 logger = logging.getLogger(__name__)
 
 
+def get_date_range(request):
+    """
+    Read the date, start and end query params as a [start, end) datetime range
+
+    Dates are YYYY-MM-DD; end is inclusive of the whole day given.
+    """
+    def read(name):
+        try:
+            return parse_date(request.query_params.get(name) or '')
+        except ValueError:
+            return None
+    
+    day = read('date')
+    start_day = day or read('start')
+    end_day = day or read('end')
+    
+    start = timezone.make_aware(datetime.combine(start_day, datetime.min.time())) if start_day else None
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), datetime.min.time())) if end_day else None
+    return start, end
+
+
 class SystemSettingsViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing system settings
@@ -35,18 +65,22 @@ class SystemSettingsViewSet(viewsets.ModelViewSet):
             return [require_permissions(['can_modify_system_settings'])(permission()) for permission in permission_classes]
         return [permission() for permission in self.permission_classes]
     
+    def perform_create(self, serializer):
+        serializer.save(updated_by=self.request.user)
+        system_settings.invalidate_on_commit()
+    
     def perform_update(self, serializer):
         serializer.save(updated_by=self.request.user)
+        system_settings.invalidate_on_commit()
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        system_settings.invalidate_on_commit()
     
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        """Get settings grouped by category"""
-        categories = {}
-        for setting in self.get_queryset():
-            if setting.category not in categories:
-                categories[setting.category] = []
-            categories[setting.category].append(SystemSettingsSerializer(setting).data)
-        return Response(categories)
+        """Get settings grouped by category (served from the in-process cache)"""
+        return Response(system_settings.by_category())
 
 
 class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -56,33 +90,144 @@ class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SystemLog.objects.all()
     serializer_class = SystemLogSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filterset_fields = ['level', 'category', 'user']
-    search_fields = ['message']
+    filterset_fields = ['level', 'category', 'activity_type', 'user']
+    # ?search= is handled with the full-text index in get_queryset
+    search_fields = []
     ordering_fields = ['created_at', 'level']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         permission_classes = [permissions.IsAuthenticated]
         return [require_permissions(['can_view_system_logs'])(permission()) for permission in permission_classes]
     
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('user')
+        
+        # Filter on created_at ranges (rather than __date) so PostgreSQL only
+        # scans the partitions covering the requested period
+        start, end = get_date_range(self.request)
+        if start:
+            queryset = queryset.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
+        
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            queryset = log_search.search_logs(queryset, search)
+        
+        return queryset
+    
     @action(detail=False, methods=['get'])
     def recent_errors(self, request):
         """Get recent error logs"""
-        errors = self.get_queryset().filter(
-            level__in=['ERROR', 'CRITICAL']
-        )[:50]
-        serializer = self.get_serializer(errors, many=True)
-        return Response(serializer.data)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        
+        errors = self.filter_queryset(self.get_queryset()).filter(
+            level__in=log_stats.ERROR_LEVELS
+        ).order_by('-created_at', '-id').values(*log_stats.COMPACT_FIELDS)[:limit]
+        return Response(list(errors))
     
     @action(detail=False, methods=['get'])
     def by_level(self, request):
-        """Get logs grouped by level"""
-        levels = {}
-        for log in self.get_queryset()[:1000]:  # Limit for performance
-            if log.level not in levels:
-                levels[log.level] = []
-            levels[log.level].append(SystemLogSerializer(log).data)
-        return Response(levels)
+        """Get per-level counts and the newest logs of each level"""
+        try:
+            per_level = min(max(int(request.query_params.get('per_level', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'per_level must be an integer'}, status=400)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        counts = log_stats.level_counts(queryset)
+        return Response({
+            'counts': counts,
+            'recent': log_stats.top_per_level(queryset, per_level, levels=counts),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def error_rates(self, request):
+        """
+        Get total and error counts per hour or day
+        
+        Query params: bucket (hour/day), hours (look-back window when no
+        date/start/end is given, default 24)
+        """
+        bucket = request.query_params.get('bucket', 'hour')
+        if bucket not in log_stats.BUCKETS:
+            return Response({'error': 'bucket must be hour or day'}, status=400)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        start, end = get_date_range(request)
+        if not start and not end:
+            try:
+                hours = min(max(int(request.query_params.get('hours', 24)), 1), 24 * 90)
+            except ValueError:
+                return Response({'error': 'hours must be an integer'}, status=400)
+            queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(hours=hours))
+        
+        return Response(log_stats.error_rates(queryset, bucket))
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search over log messages
+        
+        Query params: q, phrase (true/false), level, category, activity_type,
+        date/start/end, facets (true/false), limit and cursor
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        phrase = request.query_params.get('phrase', 'false').lower() == 'true'
+        matches = log_search.search_logs(queryset, query, phrase=phrase)
+        
+        try:
+            logs, next_cursor = paginate_keyset(
+                matches, request.query_params.get('cursor'), limit, ordering=('-rank', '-id')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        results = self.get_serializer(logs, many=True).data
+        for result, log in zip(results, logs):
+            result['rank'] = log.rank
+        
+        data = {'results': results, 'next_cursor': next_cursor}
+        if request.query_params.get('facets', 'false').lower() == 'true' and not request.query_params.get('cursor'):
+            data['facets'] = log_search.search_facets(matches)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """Read logs back from the cold archive for a date range"""
+        start, end = get_date_range(request)
+        if not start or not end:
+            return Response({'error': 'start and end dates are required'}, status=400)
+        if end - start > timedelta(days=366):
+            return Response({'error': 'Date range cannot exceed one year'}, status=400)
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        
+        records = log_archive.iter_archived_logs(
+            start, end,
+            level=request.query_params.get('level'),
+            category=request.query_params.get('category'),
+            activity_type=request.query_params.get('activity_type'),
+            search=request.query_params.get('search'),
+        )
+        return Response(list(islice(records, limit)))
 
 
 class SystemBackupViewSet(viewsets.ModelViewSet):
@@ -108,28 +253,30 @@ class SystemBackupViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def start_backup(self, request, pk=None):
-        """Start a backup process"""
+        """Queue a backup for the backup worker"""
         backup = self.get_object()
         if backup.status != 'PENDING':
             return Response({'error': 'Backup is not in pending status'}, status=400)
         
-        # Here you would implement the actual backup logic
-        backup.status = 'RUNNING'
-        backup.started_at = timezone.now()
-        backup.save()
+        # The backup itself is written by the run_backups worker, never on
+        # the request thread
+        backup.status = 'QUEUED'
+        backup.save(update_fields=['status'])
         
         # Log the backup start
-        SystemLog.objects.create(
-            level='INFO',
-            category='SYSTEM',
-            message=f'Backup started: {backup.name}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
+        log_activity(
+            'backup_started',
+            f'Backup started: {backup.name}',
+            request=request,
+            category='SYSTEM'
         )
         
-        return Response({'message': 'Backup started successfully'})
+        if getattr(settings, 'SYSTEM_BACKUP_RUN_IN_PROCESS', False):
+            claimed = SystemBackup.objects.filter(pk=backup.pk, status='QUEUED').update(status='RUNNING')
+            if claimed:
+                backup_engine.run_backup_in_background(backup)
+        
+        return Response({'message': 'Backup queued successfully', 'status': 'QUEUED'}, status=202)
 
 
 class SystemAnnouncementViewSet(viewsets.ModelViewSet):
@@ -155,23 +302,43 @@ class SystemAnnouncementViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def send_announcement(self, request, pk=None):
-        """Send an announcement to target users"""
+        """Queue an announcement for delivery to its target users"""
         announcement = self.get_object()
+        if not announcement.is_active:
+            return Response({'error': 'Announcement is not active'}, status=400)
+        if announcement.expires_at and announcement.expires_at <= timezone.now():
+            return Response({'error': 'Announcement has expired'}, status=400)
+        if announcement.delivery_status in ('QUEUED', 'SENDING'):
+            return Response({'error': 'Announcement is already being sent'}, status=400)
         
-        # Here you would implement the actual sending logic
-        # For now, just mark as sent and log it
-        
-        SystemLog.objects.create(
-            level='INFO',
-            category='SYSTEM',
-            message=f'Announcement sent: {announcement.title}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
+        # Notifications are created by the send_announcements worker once
+        # scheduled_at has passed, never on the request thread. Re-sending a
+        # SENT or FAILED announcement only reaches recipients it missed.
+        announcement.delivery_status = 'QUEUED'
+        announcement.recipients_delivered = 0
+        announcement.delivery_error = ''
+        announcement.save(update_fields=['delivery_status', 'recipients_delivered', 'delivery_error'])
+        
+        log_activity(
+            'announcement_sent',
+            f'Announcement queued: {announcement.title}',
+            request=request,
+            category='SYSTEM'
         )
         
-        return Response({'message': 'Announcement sent successfully'})
+        due = announcement.scheduled_at is None or announcement.scheduled_at <= timezone.now()
+        if due and getattr(settings, 'SYSTEM_ANNOUNCEMENT_RUN_IN_PROCESS', False):
+            claimed = SystemAnnouncement.objects.filter(
+                pk=announcement.pk, delivery_status='QUEUED'
+            ).update(delivery_status='SENDING')
+            if claimed:
+                announcements.deliver_in_background(announcement)
+        
+        return Response({
+            'message': 'Announcement queued for delivery',
+            'delivery_status': 'QUEUED',
+            'scheduled_at': announcement.scheduled_at,
+        }, status=202)
 
 
 class EmailTemplateViewSet(viewsets.ModelViewSet):
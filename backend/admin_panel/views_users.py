@@ -1,18 +1,23 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import logging
 import csv
-import io
 
-from .serializers import BulkUserImportSerializer, BulkUserImportResultSerializer
+from .activity import log_activity
+from .models import UserImportError, UserImportJob
+from .serializers import BulkUserImportSerializer, UserImportJobSerializer
+from . import user_actions, user_export, user_import
+from .user_import import ImportFileError
 from users.models import UserProfile, StudentProfile, FacultyProfile
 from users.serializers import UserProfileSerializer, UserSerializer
 from rbac.decorators import require_permissions
+from core.pagination import KeysetPagination
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +33,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name']
     ordering_fields = ['user__username', 'user__email', 'created_at', 'user__last_login']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -72,45 +78,34 @@ class AdminUserViewSet(viewsets.ModelViewSet):
             )
         
         # Log the user creation
-        from .models import SystemLog
-        SystemLog.objects.create(
-            level='INFO',
-            category='USER',
-            message=f'User created: {profile.user.username}',
-            user=self.request.user,
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            request_path=self.request.path,
-            request_method=self.request.method
+        log_activity(
+            'user_created',
+            f'User created: {profile.user.username}',
+            request=self.request,
+            category='USER'
         )
     
     def perform_update(self, serializer):
         profile = serializer.save()
         
         # Log the user update
-        from .models import SystemLog
-        SystemLog.objects.create(
-            level='INFO',
-            category='USER',
-            message=f'User updated: {profile.user.username}',
-            user=self.request.user,
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            request_path=self.request.path,
-            request_method=self.request.method
+        log_activity(
+            'user_updated',
+            f'User updated: {profile.user.username}',
+            request=self.request,
+            category='USER'
         )
     
     def perform_destroy(self, instance):
         username = instance.user.username
         
         # Log the user deletion
-        from .models import SystemLog
-        SystemLog.objects.create(
+        log_activity(
+            'user_deleted',
+            f'User deleted: {username}',
+            request=self.request,
             level='WARNING',
-            category='USER',
-            message=f'User deleted: {username}',
-            user=self.request.user,
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            request_path=self.request.path,
-            request_method=self.request.method
+            category='USER'
         )
         
         instance.delete()
@@ -123,15 +118,11 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         profile.save()
         
         # Log the activation
-        from .models import SystemLog
-        SystemLog.objects.create(
-            level='INFO',
-            category='USER',
-            message=f'User activated: {profile.user.username}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
+        log_activity(
+            'user_activated',
+            f'User activated: {profile.user.username}',
+            request=request,
+            category='USER'
         )
         
         return Response({'message': 'User activated successfully'})
@@ -144,15 +135,12 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         profile.save()
         
         # Log the deactivation
-        from .models import SystemLog
-        SystemLog.objects.create(
+        log_activity(
+            'user_deactivated',
+            f'User deactivated: {profile.user.username}',
+            request=request,
             level='WARNING',
-            category='USER',
-            message=f'User deactivated: {profile.user.username}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
+            category='USER'
         )
         
         return Response({'message': 'User deactivated successfully'})
@@ -171,264 +159,136 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         user.save()
         
         # Log the password reset
-        from .models import SystemLog
-        SystemLog.objects.create(
-            level='INFO',
-            category='USER',
-            message=f'Password reset for user: {user.username}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
+        log_activity(
+            'password_reset',
+            f'Password reset for user: {user.username}',
+            request=request,
+            category='USER'
         )
         
         return Response({'message': 'Password reset successfully'})
     
     @action(detail=False, methods=['post'])
     def bulk_import(self, request):
-        """Bulk import users from CSV/Excel file"""
+        """Queue a bulk import of users from a CSV/Excel file"""
         serializer = BulkUserImportSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
         
         file = request.FILES.get('file')
-        role = request.data.get('role')
-        department = request.data.get('department')
-        send_welcome_email = request.data.get('send_welcome_email', 'true').lower() == 'true'
-        validate_only = request.data.get('validate_only', 'false').lower() == 'true'
+        options = {
+            'role': request.data.get('role'),
+            'department': request.data.get('department'),
+            'send_welcome_email': request.data.get('send_welcome_email', 'true').lower() == 'true',
+            'validate_only': request.data.get('validate_only', 'false').lower() == 'true',
+        }
         
+        # The rows are imported by the run_user_imports worker, never on the
+        # request thread
         try:
-            result = self.process_bulk_import(
-                file, role, department, send_welcome_email, validate_only, request.user
-            )
-            
-            result_serializer = BulkUserImportResultSerializer(result)
-            return Response(result_serializer.data)
-            
-        except Exception as e:
-            logger.error(f"Bulk import error: {e}")
+            job = user_import.create_job(file, options, created_by=request.user)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=400)
+        except OSError as e:
+            logger.error(f"Bulk import upload error: {e}")
             return Response(
-                {'error': 'Failed to process import file'}, 
+                {'error': 'Failed to store import file'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def process_bulk_import(self, file, role, department, send_welcome_email, validate_only, admin_user):
-        """Process the bulk import file"""
-        errors = []
-        warnings = []
-        imported_users = []
-        successful_imports = 0
-        failed_imports = 0
         
-        # Read CSV file
-        try:
-            if file.name.endswith('.csv'):
-                content = file.read().decode('utf-8')
-                csv_reader = csv.DictReader(io.StringIO(content))
-                rows = list(csv_reader)
-            else:
-                # Handle Excel files here if needed
-                return {
-                    'total_rows': 0,
-                    'successful_imports': 0,
-                    'failed_imports': 0,
-                    'errors': [{'row': 0, 'field': 'file', 'message': 'Excel files not supported yet'}],
-                    'warnings': [],
-                    'imported_users': []
-                }
-        except Exception as e:
-            return {
-                'total_rows': 0,
-                'successful_imports': 0,
-                'failed_imports': 0,
-                'errors': [{'row': 0, 'field': 'file', 'message': f'Error reading file: {str(e)}'}],
-                'warnings': [],
-                'imported_users': []
-            }
+        log_activity(
+            'user_imported',
+            f'User import queued: {job.file_name}',
+            request=request,
+            category='USER',
+            extra_data={'import_job_id': job.pk}
+        )
         
-        total_rows = len(rows)
+        if getattr(settings, 'SYSTEM_USER_IMPORT_RUN_IN_PROCESS', False):
+            claimed = UserImportJob.objects.filter(pk=job.pk, status='QUEUED').update(status='RUNNING', attempts=1)
+            if claimed:
+                user_import.run_job_in_background(job)
         
-        for row_num, row_data in enumerate(rows, start=2):  # Start from 2 (header is row 1)
-            try:
-                # Validate required fields
-                required_fields = ['username', 'email', 'first_name', 'last_name']
-                for field in required_fields:
-                    if not row_data.get(field):
-                        errors.append({
-                            'row': row_num,
-                            'field': field,
-                            'message': f'{field} is required'
-                        })
-                        failed_imports += 1
-                        continue
-                
-                if any(error['row'] == row_num for error in errors):
-                    continue
-                
-                # Check for existing user
-                if User.objects.filter(username=row_data['username']).exists():
-                    errors.append({
-                        'row': row_num,
-                        'field': 'username',
-                        'message': 'Username already exists'
-                    })
-                    failed_imports += 1
-                    continue
-                
-                if User.objects.filter(email=row_data['email']).exists():
-                    errors.append({
-                        'row': row_num,
-                        'field': 'email',
-                        'message': 'Email already exists'
-                    })
-                    failed_imports += 1
-                    continue
-                
-                if not validate_only:
-                    # Create user
-                    user = User.objects.create(
-                        username=row_data['username'],
-                        email=row_data['email'],
-                        first_name=row_data['first_name'],
-                        last_name=row_data['last_name'],
-                        is_active=True
-                    )
-                    
-                    # Create profile
-                    user_role = role or row_data.get('role', 'STUDENT')
-                    profile = UserProfile.objects.create(
-                        user=user,
-                        role=user_role,
-                        phone_number=row_data.get('phone_number', ''),
-                        address=row_data.get('address', ''),
-                        emergency_contact=row_data.get('emergency_contact', ''),
-                        student_id=row_data.get('student_id', ''),
-                        employee_id=row_data.get('employee_id', ''),
-                    )
-                    
-                    # Create role-specific profile
-                    if user_role == 'STUDENT':
-                        StudentProfile.objects.create(
-                            user_profile=profile,
-                            admission_year=int(row_data.get('admission_year', timezone.now().year))
-                        )
-                    elif user_role == 'FACULTY':
-                        FacultyProfile.objects.create(
-                            user_profile=profile,
-                            department=department or row_data.get('department', ''),
-                            designation=row_data.get('designation', 'LECTURER'),
-                            qualification=row_data.get('qualification', '')
-                        )
-                    
-                    imported_users.append({
-                        'username': user.username,
-                        'email': user.email,
-                        'name': f"{user.first_name} {user.last_name}"
-                    })
-                    
-                    successful_imports += 1
-                    
-                    # Log the import
-                    from .models import SystemLog
-                    SystemLog.objects.create(
-                        level='INFO',
-                        category='USER',
-                        message=f'User imported: {user.username}',
-                        user=admin_user,
-                        ip_address=admin_user.profile.last_login_ip,
-                        request_path='/admin/users/bulk-import/',
-                        request_method='POST'
-                    )
-                else:
-                    # Validation only
-                    successful_imports += 1
-                    
-            except Exception as e:
-                errors.append({
-                    'row': row_num,
-                    'field': 'general',
-                    'message': f'Error processing row: {str(e)}'
-                })
-                failed_imports += 1
+        return Response(
+            {'message': 'Import queued successfully', 'job_id': job.pk, 'status': 'QUEUED'},
+            status=202
+        )
+    
+    @action(detail=False, methods=['get'], url_path=r'import-jobs/(?P<job_id>\d+)')
+    def import_job(self, request, job_id=None):
+        """Status and row counts of a bulk import job"""
+        try:
+            job = UserImportJob.objects.select_related('created_by').get(pk=job_id)
+        except UserImportJob.DoesNotExist:
+            return Response({'error': 'Import job not found'}, status=404)
+        data = UserImportJobSerializer(job).data
+        data['error_count'] = job.row_errors.count()
+        return Response(data)
+    
+    @action(detail=False, methods=['get'], url_path=r'import-jobs/(?P<job_id>\d+)/errors')
+    def import_job_errors(self, request, job_id=None):
+        """Download the rejected rows of a bulk import job as CSV"""
+        if not UserImportJob.objects.filter(pk=job_id).exists():
+            return Response({'error': 'Import job not found'}, status=404)
+        
+        writer = csv.writer(user_export.Echo())
+        errors = (
+            UserImportError.objects.filter(job_id=job_id)
+            .order_by('row', 'id').values_list('row', 'field', 'message').iterator(chunk_size=2000)
+        )
         
-        return {
-            'total_rows': total_rows,
-            'successful_imports': successful_imports,
-            'failed_imports': failed_imports,
-            'errors': errors,
-            'warnings': warnings,
-            'imported_users': imported_users
-        }
+        def lines():
+            yield writer.writerow(['Row', 'Field', 'Message'])
+            for error in errors:
+                yield writer.writerow(error)
+        
+        response = StreamingHttpResponse(lines(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="import_{job_id}_errors.csv"'
+        return response
     
     @action(detail=False, methods=['get'])
     def export(self, request):
-        """Export users to CSV"""
-        from django.http import HttpResponse
-        import io
-        
-        queryset = self.get_queryset()
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="users_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Role', 
-            'Active', 'Date Joined', 'Last Login', 'Student ID', 'Employee ID'
-        ])
-        
-        for profile in queryset:
-            user = profile.user
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                profile.role,
-                profile.is_active,
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '',
-                profile.student_id or '',
-                profile.employee_id or '',
-            ])
-        
+        """
+        Stream users as CSV, NDJSON or XLSX
+        
+        Takes the list view's filters, search and ordering, plus
+        export_format (csv, ndjson or xlsx; default csv) and compress=gzip
+        for CSV and NDJSON.
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in user_export.FORMATS:
+            return Response({'error': f'Unsupported export format: {export_format}'}, status=400)
+        gzip = request.query_params.get('compress', '').lower() == 'gzip'
+        if gzip and export_format == 'xlsx':
+            return Response({'error': 'XLSX exports are already compressed'}, status=400)
+        
+        stream, content_type, extension = user_export.FORMATS[export_format]
+        content = stream(user_export.export_rows(self.filter_queryset(self.get_queryset())))
+        filename = f'users_export.{extension}'
+        if gzip:
+            content = user_export.gzip_stream(content)
+            content_type = 'application/gzip'
+            filename += '.gz'
+        
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
     
     @action(detail=False, methods=['post'])
     def bulk_action(self, request):
-        """Perform bulk actions on selected users"""
+        """Perform bulk actions on selected users (see admin_panel.user_actions)"""
         profile_ids = request.data.get('user_ids', [])
         action = request.data.get('action')
         
         if not profile_ids:
             return Response({'error': 'No users selected'}, status=400)
-        
-        profiles = UserProfile.objects.filter(id__in=profile_ids)
-        
-        if action == 'activate':
-            profiles.update(is_active=True)
-            message = f'Activated {profiles.count()} users'
-        elif action == 'deactivate':
-            profiles.update(is_active=False)
-            message = f'Deactivated {profiles.count()} users'
-        elif action == 'delete':
-            count = profiles.count()
-            profiles.delete()
-            message = f'Deleted {count} users'
-        else:
+        if action not in user_actions.ACTIONS:
             return Response({'error': 'Invalid action'}, status=400)
+        try:
+            profile_ids = [int(profile_id) for profile_id in profile_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'user_ids must be a list of ids'}, status=400)
         
-        # Log the bulk action
-        from .models import SystemLog
-        SystemLog.objects.create(
-            level='INFO',
-            category='USER',
-            message=f'Bulk action: {message}',
-            user=request.user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            request_path=request.path,
-            request_method=request.method
-        )
-        
-        return Response({'message': message})
+        affected = user_actions.run_bulk_action(action, profile_ids, request=request)
+        message = f"{user_actions.ACTIONS[action]} {affected.get('profiles', 0)} users"
+        return Response({'message': message, 'affected': affected})
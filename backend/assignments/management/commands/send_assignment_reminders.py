@@ -0,0 +1,109 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from admin_panel.mailer import BatchMailer, build_messages, user_context
+from assignments.models import Assignment, AssignmentReminder
+
+
+class Command(BaseCommand):
+    help = 'Email enrolled students who have not submitted assignments that are due soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Remind about assignments due within this many hours (default: 24)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many reminders would be sent',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        assignments = (
+            Assignment.objects.filter(
+                published=True,
+                reminder_sent_at__isnull=True,
+                due_date__gt=now,
+                due_date__lte=now + timedelta(hours=options['hours']),
+            )
+            .select_related('course_offering__course', 'course_offering__semester')
+            .order_by('due_date')
+        )
+
+        total = {'assignments': 0, 'sent': 0, 'failed': 0}
+        started = time.monotonic()
+        for assignment in assignments:
+            students = (
+                User.objects.filter(
+                    is_active=True,
+                    enrollments__course_offering_id=assignment.course_offering_id,
+                    enrollments__status='ENROLLED',
+                )
+                .exclude(email='')
+                .exclude(submissions__assignment=assignment)
+                .exclude(assignment_reminders__assignment=assignment)
+                .select_related('profile')
+                .distinct()
+            )
+            context = {
+                'assignment_title': assignment.title,
+                'course': str(assignment.course_offering.course),
+                'due_date': assignment.due_date,
+            }
+            if options['dry_run']:
+                self.stdout.write(f'{assignment}: {students.count()} reminders')
+                continue
+
+            mail = self.send_reminders(assignment, students, context)
+            if not mail['failed']:
+                Assignment.objects.filter(pk=assignment.pk).update(reminder_sent_at=now)
+            total['assignments'] += 1
+            total['sent'] += mail['sent']
+            total['failed'] += mail['failed']
+            self.stdout.write(f"{assignment}: {mail['sent']} sent, {mail['failed']} failed")
+
+        if options['dry_run']:
+            return
+        message = (
+            f"Sent {total['sent']} reminders for {total['assignments']} assignments "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        if total['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"{message}; {total['failed']} failed (those students are retried on the next run)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def send_reminders(self, assignment, students, context):
+        """
+        Email the students and record an AssignmentReminder for each
+        delivered message, batch by batch
+
+        Returns:
+            dict: BatchMailer totals
+        """
+        # Student ids waiting for delivery, by address
+        waiting = defaultdict(list)
+
+        def recipients():
+            for student in students.iterator(chunk_size=500):
+                waiting[student.email].append(student.pk)
+                yield student.email, user_context(student, **context)
+
+        def record(messages):
+            AssignmentReminder.objects.bulk_create(
+                [AssignmentReminder(assignment=assignment, student_id=waiting[message.to[0]].pop()) for message in messages],
+                ignore_conflicts=True,
+            )
+
+        return BatchMailer().send(build_messages('ASSIGNMENT_DUE', recipients()), on_sent=record)
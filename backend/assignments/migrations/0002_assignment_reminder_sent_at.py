@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When due-date reminders were sent', null=True),
+        ),
+    ]
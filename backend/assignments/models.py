@@ -56,6 +56,7 @@ class Assignment(models.Model):
     rubric = models.JSONField(default=dict, blank=True, null=True, help_text="Grading rubric")
     auto_grade = models.BooleanField(default=False, help_text="Whether assignment can be auto-graded")
     published = models.BooleanField(default=False, help_text="Whether assignment is published to students")
+    reminder_sent_at = models.DateTimeField(blank=True, null=True, help_text="When due-date reminders were sent")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -91,6 +92,23 @@ class Assignment(models.Model):
         ]
 
 
+class AssignmentReminder(models.Model):
+    """
+    Due-date reminder delivered to a student, so reruns only email the rest
+    """
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='reminders')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assignment_reminders')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.assignment} - {self.student.username}"
+
+    class Meta:
+        verbose_name = "Assignment Reminder"
+        verbose_name_plural = "Assignment Reminders"
+        unique_together = ['assignment', 'student']
+
+
 class Submission(models.Model):
     """
     Assignment submission model
@@ -1,3 +1,78 @@
-from django.test import TestCase
+import io
+from datetime import time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from academics.models import Department, Semester
+from courses.models import Course, CourseOffering, Enrollment
+
+from .models import Assignment, AssignmentReminder
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_BATCH_SIZE=2, EMAIL_MAX_RETRIES=0
+)
+class AssignmentReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        department = Department.objects.create(
+            code='CS', name='Computer Science', established_date='2000-01-01', contact_email='cs@uni.edu',
+            contact_phone='555', location='Main',
+        )
+        course = Course.objects.create(
+            code='CS201', name='Data Structures', department=department, credit_hours=3,
+            description='Lists and trees', learning_outcomes='Trees',
+        )
+        semester = Semester.objects.create(
+            name='Fall', code='FA26', start_date=now.date() - timedelta(days=30), end_date=now.date() + timedelta(days=60),
+            registration_start=now - timedelta(days=30), registration_end=now,
+        )
+        instructor = User.objects.create_user(username='instructor')
+        [offering] = CourseOffering.objects.bulk_create([CourseOffering(
+            course=course, semester=semester, section='A', instructor=instructor, max_enrollment=30,
+            room_number='101', meeting_pattern='MWF', start_time=time(9), end_time=time(10),
+        )])
+        cls.students = [User.objects.create_user(username=f'student{i}', email=f'student{i}@uni.edu') for i in range(5)]
+        Enrollment.objects.bulk_create([Enrollment(student=student, course_offering=offering) for student in cls.students])
+        [cls.assignment] = Assignment.objects.bulk_create([Assignment(
+            course_offering=offering, title='Lab 1', description='Linked lists', assignment_type='HOMEWORK',
+            total_points=10, due_date=now + timedelta(hours=6), instructions='Submit a zip', published=True,
+        )])
+
+    def run_command(self):
+        call_command('send_assignment_reminders', stdout=io.StringIO())
+        self.assignment.refresh_from_db()
+
+    def test_reminders_are_sent_once_per_student(self):
+        self.run_command()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(s.email for s in self.students))
+        self.assertEqual(AssignmentReminder.objects.filter(assignment=self.assignment).count(), 5)
+        self.assertIsNotNone(self.assignment.reminder_sent_at)
+
+    def test_rerun_after_a_failure_only_emails_the_students_who_missed_it(self):
+        send = mail.backends.locmem.EmailBackend.send_messages
+
+        def failing(backend, messages):
+            if messages[0].to == [self.students[3].email]:
+                raise OSError('connection reset')
+            return send(backend, messages)
+
+        with mock.patch.object(mail.backends.locmem.EmailBackend, 'send_messages', failing):
+            self.run_command()
+        self.assertIsNone(self.assignment.reminder_sent_at)
+        reminded = set(AssignmentReminder.objects.values_list('student__username', flat=True))
+        self.assertNotIn('student3', reminded)
+        delivered = len(mail.outbox)
+        self.assertEqual(len(reminded), delivered)
+
+        self.run_command()
+        retried = [message.to[0] for message in mail.outbox[delivered:]]
+        self.assertEqual(sorted(retried), sorted(s.email for s in self.students if s.username not in reminded))
+        self.assertEqual(AssignmentReminder.objects.count(), 5)
+        self.assertIsNotNone(self.assignment.reminder_sent_at)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
+from core.pagination import KeysetPagination
 from .models import Assignment, Submission
 from .serializers import AssignmentSerializer, AssignmentDetailSerializer, SubmissionSerializer
 
@@ -157,6 +158,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     search_fields = ['assignment__title', 'student__first_name', 'student__last_name']
     ordering_fields = ['submission_date', 'grade', 'attempt_number']
     ordering = ['-submission_date']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
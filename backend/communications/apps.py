@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommunicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'communications'
+
+    def ready(self):
+        from .counters import connect_counter_signals
+        connect_counter_signals()
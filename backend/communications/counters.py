@@ -0,0 +1,259 @@
+"""
+Maintenance of the per-user UnreadCounter rows
+
+Counters are changed with F() expressions in the same transaction as the
+row that changed them, so concurrent updates never lose increments:
+
+- creating and deleting notifications/messages is tracked by signals
+  (connected in CommunicationsConfig.ready)
+- read-state changes and soft deletes are reported by the views that make
+  them, through adjust() and reset()
+- bulk inserts that skip signals (announcement fan-out) call increment_many()
+
+A user's row is created on first use by counting the source tables once.
+"""
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from core.row_signals import receivers_suspended
+
+from .models import Notification, PrivateMessage, UnreadCounter
+
+COUNTER_FIELDS = ('notifications', 'messages', 'admin_notifications')
+
+
+def admin_notification_model():
+    return apps.get_model('admin_panel', 'Notification')
+
+
+def unread_querysets():
+    """The rows each counter counts, as {counter field: (queryset, user field)}"""
+    return {
+        'notifications': (Notification.objects.filter(read=False), 'recipient_id'),
+        'messages': (
+            PrivateMessage.objects.filter(is_read=False, is_deleted_by_recipient=False),
+            'recipient_id',
+        ),
+        'admin_notifications': (admin_notification_model().objects.filter(is_read=False), 'user_id'),
+    }
+
+
+def count_unread(user_ids):
+    """
+    Count unread rows with one grouped query per source table
+
+    Returns:
+        dict: {user id: {counter field: count}}, only users with unread rows
+    """
+    counts = {}
+    for field, (queryset, user_field) in unread_querysets().items():
+        if user_ids is not None:
+            queryset = queryset.filter(**{f'{user_field}__in': user_ids})
+        rows = queryset.order_by().values(user_field).annotate(total=Count('pk')).values_list(user_field, 'total')
+        for user_id, total in rows:
+            counts.setdefault(user_id, {})[field] = total
+    return counts
+
+
+def create_counters(user_ids):
+    """Create missing counter rows from the source tables"""
+    counts = count_unread(user_ids)
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, **counts.get(user_id, {})) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def get_counts(user):
+    """
+    The user's unread counts: a primary key lookup, plus one count per
+    table the first time
+
+    Unread notifications stay counted until sweep_notifications removes
+    them (and lowers the counter), but feeds hide them as soon as they
+    expire, so those are left out here with one more count over the
+    user's unread rows while the counter is not zero.
+
+    Returns:
+        dict: {counter field: count}
+    """
+    row = UnreadCounter.objects.filter(pk=user.pk).values(*COUNTER_FIELDS).first()
+    if row is None:
+        create_counters([user.pk])
+        row = UnreadCounter.objects.filter(pk=user.pk).values(*COUNTER_FIELDS).first()
+    if row['notifications']:
+        expired = Notification.objects.filter(recipient_id=user.pk, read=False, expires_at__lte=timezone.now()).count()
+        row['notifications'] = max(row['notifications'] - expired, 0)
+    return row
+
+
+def adjust(user_id, **deltas):
+    """
+    Add to a user's counters, e.g. adjust(user.id, messages=-1)
+
+    Increments create the row when the user has none yet (counting the
+    already saved change); decrements of a missing row are ignored.
+    """
+    updates = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if not updates or user_id is None:
+        return
+    updated = UnreadCounter.objects.filter(pk=user_id).update(updated_at=timezone.now(), **updates)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        create_counters([user_id])
+
+
+def reset(user_id, *fields):
+    """Set counters to zero (after mark-all-read)"""
+    UnreadCounter.objects.filter(pk=user_id).update(updated_at=timezone.now(), **{field: 0 for field in fields})
+
+
+def increment_many(user_ids, field):
+    """Add one to a counter for every user in user_ids (one UPDATE, plus creating missing rows)"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    UnreadCounter.objects.filter(pk__in=user_ids).update(updated_at=timezone.now(), **{field: F(field) + 1})
+    existing = set(UnreadCounter.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        create_counters(missing)
+
+
+def decrement_many(counts, field):
+    """
+    Subtract per-user amounts from a counter, one UPDATE per distinct amount
+
+    Args:
+        counts: {user id: amount}
+        field: Counter field
+    """
+    by_amount = {}
+    for user_id, amount in counts.items():
+        if amount:
+            by_amount.setdefault(amount, []).append(user_id)
+    now = timezone.now()
+    for amount, user_ids in by_amount.items():
+        UnreadCounter.objects.filter(pk__in=user_ids).update(
+            updated_at=now, **{field: Greatest(F(field) - amount, 0)}
+        )
+
+
+def rebuild(batch_size=5000):
+    """
+    Rewrite every user's counters from the source tables
+
+    Only missing or wrong rows are written.
+
+    Returns:
+        tuple: (users checked, existing counters that had drifted)
+    """
+    counts = count_unread(None)
+    checked = drifted = 0
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            drifted += _write_counts(batch, counts)
+            checked += len(batch)
+            batch = []
+    if batch:
+        drifted += _write_counts(batch, counts)
+        checked += len(batch)
+    return checked, drifted
+
+
+def _write_counts(user_ids, counts):
+    current = {
+        row[0]: row[1:]
+        for row in UnreadCounter.objects.filter(pk__in=user_ids).values_list('pk', *COUNTER_FIELDS)
+    }
+    now = timezone.now()
+    rows = []
+    drifted = 0
+    for user_id in user_ids:
+        values = counts.get(user_id, {})
+        expected = tuple(values.get(field, 0) for field in COUNTER_FIELDS)
+        if current.get(user_id) != expected:
+            drifted += user_id in current
+            rows.append(UnreadCounter(user_id=user_id, updated_at=now, **dict(zip(COUNTER_FIELDS, expected))))
+    UnreadCounter.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*COUNTER_FIELDS, 'updated_at'],
+    )
+    return drifted
+
+
+def notification_saved(sender, instance, created, **kwargs):
+    if created and not instance.read:
+        adjust(instance.recipient_id, notifications=1)
+
+
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.read and not receivers_suspended():
+        adjust(instance.recipient_id, notifications=-1)
+
+
+def message_saved(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        adjust(instance.recipient_id, messages=1)
+
+
+def message_deleted(sender, instance, **kwargs):
+    if not instance.is_read and not instance.is_deleted_by_recipient and not receivers_suspended():
+        adjust(instance.recipient_id, messages=-1)
+
+
+def admin_notification_saved(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        adjust(instance.user_id, admin_notifications=1)
+
+
+def admin_notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read and not receivers_suspended():
+        adjust(instance.user_id, admin_notifications=-1)
+
+
+def adjust_deleted(rows):
+    """
+    Apply the decrements the delete receivers would have made for rows
+    deleted with them suspended (see core.row_signals), one UPDATE per
+    affected user
+
+    Args:
+        rows: {model: deleted instances}, e.g. a deletion Collector's data
+    """
+    # Users whose own counter row goes too need no decrements
+    gone = {counter.pk for counter in rows.get(UnreadCounter, ())}
+    # (model, counter field, user field, whether a row was counted), as in the receivers below
+    sources = [
+        (Notification, 'notifications', 'recipient_id', lambda row: not row.read),
+        (PrivateMessage, 'messages', 'recipient_id', lambda row: not row.is_read and not row.is_deleted_by_recipient),
+        (admin_notification_model(), 'admin_notifications', 'user_id', lambda row: not row.is_read),
+    ]
+    deltas = {}
+    for model, field, user_field, counted in sources:
+        for instance in rows.get(model, ()):
+            user_id = getattr(instance, user_field)
+            if user_id not in gone and counted(instance):
+                user_deltas = deltas.setdefault(user_id, {})
+                user_deltas[field] = user_deltas.get(field, 0) - 1
+    for user_id, user_deltas in deltas.items():
+        adjust(user_id, **user_deltas)
+
+
+def connect_counter_signals():
+    """Track created and deleted rows (called from AppConfig.ready)"""
+    admin_notification = admin_notification_model()
+    post_save.connect(notification_saved, sender=Notification, dispatch_uid='unread_notification_saved')
+    post_delete.connect(notification_deleted, sender=Notification, dispatch_uid='unread_notification_deleted')
+    post_save.connect(message_saved, sender=PrivateMessage, dispatch_uid='unread_message_saved')
+    post_delete.connect(message_deleted, sender=PrivateMessage, dispatch_uid='unread_message_deleted')
+    post_save.connect(admin_notification_saved, sender=admin_notification, dispatch_uid='unread_admin_saved')
+    post_delete.connect(admin_notification_deleted, sender=admin_notification, dispatch_uid='unread_admin_deleted')
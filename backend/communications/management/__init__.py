@@ -0,0 +1 @@
+# Management package for communications app
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from communications import notification_expiry
+
+
+class Command(BaseCommand):
+    help = 'Delete (or archive) expired notifications and read notifications past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--read-retention-days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_READ_RETENTION_DAYS', 90),
+            help='Remove read notifications older than this many days, 0 to keep them '
+                 '(default: NOTIFICATION_READ_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows deleted per transaction (default: 2000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches to spread the load (default: 0)',
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Write removed rows to NOTIFICATION_ARCHIVE_ROOT before deleting them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many notifications would be removed without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            querysets = notification_expiry.sweep_querysets(timezone.now(), options['read_retention_days'])
+            for reason, queryset in querysets.items():
+                self.stdout.write(f'Would remove {queryset.count()} {reason} notifications')
+            return
+
+        stats = notification_expiry.sweep(
+            read_retention_days=options['read_retention_days'],
+            batch_size=options['batch_size'],
+            archive=options['archive'],
+            pause=options['pause'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        if stats['archive']:
+            self.stdout.write(f"Archived removed notifications to {stats['archive']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {stats['expired']} expired and {stats.get('read', 0)} old read notifications "
+            f"in {stats['seconds']:.1f}s"
+        ))
@@ -195,8 +195,11 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'read', 'created_at']),
+            models.Index(fields=['recipient', 'created_at', 'id']),
             models.Index(fields=['category', 'notification_type']),
             models.Index(fields=['expires_at']),
+            # Read notifications past the retention window, for the sweeper
+            models.Index(fields=['created_at'], condition=models.Q(read=True), name='comm_notif_read_created_idx'),
         ]
 
 
@@ -243,4 +246,25 @@ class PrivateMessage(models.Model):
             models.Index(fields=['sender', 'created_at']),
             models.Index(fields=['recipient', 'is_read', 'created_at']),
             models.Index(fields=['parent_message']),
-        ]
\ No newline at end of file
+        ]
+
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized unread counts shown in the header badges
+
+    Kept up to date by communications.counters; rebuilt from the source
+    tables by the reconcile_unread_counters command.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    notifications = models.PositiveIntegerField(default=0, help_text="Unread notifications")
+    messages = models.PositiveIntegerField(default=0, help_text="Unread received private messages")
+    admin_notifications = models.PositiveIntegerField(default=0, help_text="Unread admin panel notifications")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.notifications}/{self.messages}/{self.admin_notifications}"
+
+    class Meta:
+        verbose_name = "Unread Counter"
+        verbose_name_plural = "Unread Counters"
@@ -0,0 +1,133 @@
+"""
+Removal of expired and aged-out read notifications
+
+Rows are removed in bounded batches: each batch selects at most batch_size
+primary keys (LIMIT) through the expires_at or read/created_at index and
+deletes exactly those rows in its own short transaction, so locks are only
+held for one batch. Removed rows can be written to gzip-compressed NDJSON
+files under NOTIFICATION_ARCHIVE_ROOT first.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import counters
+from .models import Notification
+
+
+def archive_root():
+    return Path(getattr(settings, 'NOTIFICATION_ARCHIVE_ROOT', Path(settings.PRIVATE_ROOT) / 'notifications'))
+
+
+def archive_fields():
+    return [field.attname for field in Notification._meta.concrete_fields]
+
+
+def visible(queryset, now=None):
+    """Exclude expired notifications from a queryset"""
+    now = now or timezone.now()
+    return queryset.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+
+
+def sweep_querysets(now, read_retention_days):
+    """The rows to remove, as {reason: queryset}; each is served by its own index"""
+    querysets = {'expired': Notification.objects.filter(expires_at__lte=now)}
+    if read_retention_days:
+        querysets['read'] = Notification.objects.filter(
+            read=True, created_at__lt=now - timedelta(days=read_retention_days)
+        )
+    return querysets
+
+
+class ArchiveWriter:
+    """Append removed rows to one compressed NDJSON file per sweep"""
+
+    def __init__(self, now):
+        directory = archive_root() / now.strftime('%Y')
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"notifications_{now.strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.fields = archive_fields()
+        self.file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        self.count = 0
+
+    def write(self, ids):
+        rows = Notification.objects.filter(pk__in=ids).order_by('pk').values_list(*self.fields)
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(self.fields, row)), cls=DjangoJSONEncoder))
+            self.file.write('\n')
+            self.count += 1
+
+    def close(self):
+        self.file.close()
+        if self.count:
+            os.replace(self.tmp_path, self.path)
+            return self.path
+        os.remove(self.tmp_path)
+        return None
+
+
+def delete_batch(ids, archive=None):
+    """
+    Delete one batch of notifications by primary key
+
+    Unread counters of the recipients are lowered in the same transaction.
+
+    Returns:
+        int: Number of rows deleted
+    """
+    with transaction.atomic():
+        batch = Notification.objects.filter(pk__in=ids)
+        if archive is not None:
+            archive.write(ids)
+        unread = dict(
+            batch.filter(read=False).order_by().values('recipient_id')
+            .annotate(total=Count('pk')).values_list('recipient_id', 'total')
+        )
+        counters.decrement_many(unread, 'notifications')
+        # Nothing references notifications, so the rows can go in one DELETE
+        # without collecting them (and running post_delete) one by one
+        return batch._raw_delete(batch.db)
+
+
+def sweep(read_retention_days=None, batch_size=2000, archive=False, pause=0, now=None, stdout=None):
+    """
+    Remove expired notifications and read ones older than read_retention_days
+
+    Returns:
+        dict: Rows removed per reason, the archive path and elapsed seconds
+    """
+    now = now or timezone.now()
+    if read_retention_days is None:
+        read_retention_days = getattr(settings, 'NOTIFICATION_READ_RETENTION_DAYS', 90)
+
+    started = time.monotonic()
+    writer = ArchiveWriter(now) if archive else None
+    stats = {}
+    try:
+        for reason, queryset in sweep_querysets(now, read_retention_days).items():
+            stats[reason] = 0
+            while True:
+                ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                stats[reason] += delete_batch(ids, writer)
+                if stdout is not None:
+                    stdout.write(f'Removed {stats[reason]} {reason} notifications so far')
+                if len(ids) < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+    finally:
+        stats['archive'] = writer.close() if writer is not None else None
+    stats['seconds'] = time.monotonic() - started
+    return stats
@@ -104,6 +104,17 @@ class NotificationSerializer(serializers.ModelSerializer):
         return None
 
 
+class NotificationListSerializer(NotificationSerializer):
+    """
+    Compact Notification payload for feeds (expects sender to be select_related)
+    """
+    class Meta(NotificationSerializer.Meta):
+        fields = [
+            'id', 'title', 'message', 'notification_type', 'category',
+            'read', 'action_url', 'sender_name', 'created_at'
+        ]
+
+
 class PrivateMessageSerializer(serializers.ModelSerializer):
     """
     Serializer for PrivateMessage model
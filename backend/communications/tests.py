@@ -1,3 +1,174 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from admin_panel.models import Notification as AdminNotification
+
+from . import counters, notification_expiry
+from .models import Notification, PrivateMessage, UnreadCounter
+
+
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, **fields):
+        return Notification.objects.create(recipient=self.user, title='t', message='m', **fields)
+
+    def message(self):
+        return PrivateMessage.objects.create(sender=self.other, recipient=self.user, subject='s', content='c', attachments=['a'])
+
+    def counts(self):
+        return counters.get_counts(self.user)
+
+    def test_counter_row_is_created_from_existing_rows(self):
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, title='t', message='m') for _ in range(3)
+        ])
+        self.assertEqual(self.counts()['notifications'], 3)
+
+    def test_create_read_and_delete_keep_counts(self):
+        first = self.notify()
+        self.notify()
+        self.notify(read=True)
+        message = self.message()
+        AdminNotification.objects.create(user=self.user, title='t', message='m')
+        self.assertEqual(self.counts(), {'notifications': 2, 'messages': 1, 'admin_notifications': 1})
+
+        self.client.post(f'/api/v1/communications/notifications/{first.pk}/mark_read/')
+        self.client.post(f'/api/v1/communications/notifications/{first.pk}/mark_read/')
+        self.assertEqual(self.counts()['notifications'], 1)
+
+        self.client.post(f'/api/v1/communications/messages/{message.pk}/delete_for_me/')
+        self.assertEqual(self.counts()['messages'], 0)
+
+        self.client.post('/api/v1/communications/notifications/mark_all_read/')
+        self.assertEqual(self.counts()['notifications'], 0)
+
+        AdminNotification.objects.filter(user=self.user).delete()
+        self.assertEqual(self.counts()['admin_notifications'], 0)
+
+    def test_badge_endpoint_is_one_lookup(self):
+        self.message()
+        self.counts()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/communications/notifications/unread_counts/')
+        self.assertEqual(response.data['messages'], 1)
+
+    def test_badge_leaves_out_expired_notifications(self):
+        self.notify()
+        self.notify(expires_at=timezone.now() - timedelta(minutes=1))
+        self.counts()
+        # The counter lookup and the count of expired unread rows
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/communications/notifications/unread_counts/')
+        self.assertEqual(response.data['notifications'], 1)
+
+    def test_mark_read_lowers_the_counter_only_for_the_update_that_flips_the_row(self):
+        notification = self.notify()
+        message = self.message()
+        self.counts()
+        # A concurrent request already flipped the rows after these views loaded them
+        Notification.objects.filter(pk=notification.pk).update(read=True)
+        PrivateMessage.objects.filter(pk=message.pk).update(is_read=True)
+        with mock.patch('communications.views.NotificationViewSet.get_object', return_value=notification), \
+                mock.patch('communications.views.PrivateMessageViewSet.get_object', return_value=message):
+            self.client.post(f'/api/v1/communications/notifications/{notification.pk}/mark_read/')
+            self.client.post(f'/api/v1/communications/messages/{message.pk}/mark_read/')
+            self.client.post(f'/api/v1/communications/messages/{message.pk}/delete_for_me/')
+        self.assertEqual(self.counts(), {'notifications': 1, 'messages': 1, 'admin_notifications': 0})
+        self.assertTrue(PrivateMessage.objects.get(pk=message.pk).is_deleted_by_recipient)
+
+    def test_rebuild_repairs_drift(self):
+        self.notify()
+        self.message()
+        UnreadCounter.objects.filter(pk=self.user.pk).update(notifications=7, messages=0)
+        checked, drifted = counters.rebuild()
+        self.assertEqual((checked, drifted), (2, 1))
+        self.assertEqual(self.counts(), {'notifications': 1, 'messages': 1, 'admin_notifications': 0})
+
+
+class NotificationFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='feed-reader')
+        cls.sender = User.objects.create_user(username='feed-sender', first_name='Ada', last_name='Admin')
+        Notification.objects.bulk_create([
+            Notification(recipient=cls.user, sender=cls.sender, title=f'n{i}', message='m') for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/v1/communications/notifications/', params)
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        ids = list(Notification.objects.filter(recipient=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, ids)
+        self.assertEqual(response.data['results'][-1]['sender_name'], 'Ada Admin')
+
+    def test_since_returns_only_newer_rows(self):
+        newest = Notification.objects.filter(recipient=self.user).order_by('-created_at', '-id').first()
+        newer = Notification.objects.create(recipient=self.user, title='new', message='m')
+        response = self.client.get(
+            '/api/v1/communications/notifications/', {'since': newest.created_at.isoformat()}
+        )
+        self.assertEqual([row['id'] for row in response.data['results']], [newer.id])
+
+    def test_bad_cursor(self):
+        response = self.client.get('/api/v1/communications/notifications/', {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationSweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sweep-reader')
+
+    def notify(self, **fields):
+        return Notification.objects.create(recipient=self.user, title='t', message='m', **fields)
+
+    def test_sweep_removes_expired_and_old_read_in_batches(self):
+        now = timezone.now()
+        for _ in range(3):
+            self.notify(expires_at=now - timedelta(hours=1))
+        old_read = self.notify(read=True)
+        Notification.objects.filter(pk=old_read.pk).update(created_at=now - timedelta(days=120))
+        kept = [self.notify(), self.notify(read=True), self.notify(expires_at=now + timedelta(days=1))]
+        self.assertEqual(UnreadCounter.objects.get(pk=self.user.pk).notifications, 5)
+        self.assertEqual(counters.get_counts(self.user)['notifications'], 2)
+
+        stats = notification_expiry.sweep(read_retention_days=90, batch_size=2, now=now)
+
+        self.assertEqual((stats['expired'], stats['read']), (3, 1))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('pk', flat=True)), sorted(n.pk for n in kept)
+        )
+        self.assertEqual(counters.get_counts(self.user)['notifications'], 2)
 
-# Create your tests here.
+    def test_feed_hides_expired_rows(self):
+        self.notify(expires_at=timezone.now() - timedelta(minutes=1))
+        live = self.notify()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/communications/notifications/')
+        self.assertEqual([row['id'] for row in response.data['results']], [live.id])
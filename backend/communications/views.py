@@ -3,14 +3,18 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db import transaction
 from django.utils import timezone
+from core.pagination import paginate_keyset, parse_since
+from . import counters
+from .notification_expiry import visible
 from .models import (
     DiscussionForum, DiscussionThread, DiscussionReply,
     Notification, PrivateMessage
 )
 from .serializers import (
     DiscussionForumSerializer, DiscussionThreadSerializer, DiscussionReplySerializer,
-    NotificationSerializer, PrivateMessageSerializer
+    NotificationSerializer, NotificationListSerializer, PrivateMessageSerializer
 )
 
 
@@ -113,9 +117,41 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Filter notifications for current user
+        Filter notifications for current user, leaving out expired ones
         """
-        return Notification.objects.filter(recipient=self.request.user)
+        return visible(Notification.objects.filter(recipient=self.request.user))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Newest notifications first, paginated by cursor instead of page number
+
+        Query params: cursor (from the previous page's next_cursor), limit
+        (default 50, max 200) and since (ISO datetime; only notifications
+        created after it, for incremental sync).
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset()).select_related('sender')
+        try:
+            since = request.query_params.get('since')
+            if since:
+                queryset = queryset.filter(created_at__gt=parse_since(since))
+            notifications, next_cursor = paginate_keyset(queryset, request.query_params.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = NotificationListSerializer(notifications, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        was_read = serializer.instance.read
+        notification = serializer.save()
+        if notification.read != was_read:
+            counters.adjust(notification.recipient_id, notifications=-1 if notification.read else 1)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -123,9 +159,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Mark notification as read
         """
         notification = self.get_object()
-        notification.read = True
-        notification.read_at = timezone.now()
-        notification.save()
+        with transaction.atomic():
+            # Only the request whose update flips the row lowers the counter
+            if Notification.objects.filter(pk=notification.pk, read=False).update(read=True, read_at=timezone.now()):
+                counters.adjust(request.user.id, notifications=-1)
         return Response({'message': 'Notification marked as read'})
 
     @action(detail=False, methods=['post'])
@@ -133,15 +170,24 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """
         Mark all notifications as read
         """
-        updated = Notification.objects.filter(
-            recipient=request.user,
-            read=False
-        ).update(
-            read=True,
-            read_at=timezone.now()
-        )
+        with transaction.atomic():
+            updated = Notification.objects.filter(
+                recipient=request.user,
+                read=False
+            ).update(
+                read=True,
+                read_at=timezone.now()
+            )
+            counters.reset(request.user.id, 'notifications')
         return Response({'message': f'{updated} notifications marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def unread_counts(self, request):
+        """
+        Unread notification and message counts for the header badges
+        """
+        return Response(counters.get_counts(request.user))
+
 
 class PrivateMessageViewSet(viewsets.ModelViewSet):
     """
@@ -167,6 +213,13 @@ class PrivateMessageViewSet(viewsets.ModelViewSet):
             recipient=user
         )
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        message = serializer.save()
+        if message.is_read != was_read and not message.is_deleted_by_recipient:
+            counters.adjust(message.recipient_id, messages=-1 if message.is_read else 1)
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """
@@ -174,9 +227,14 @@ class PrivateMessageViewSet(viewsets.ModelViewSet):
         """
         message = self.get_object()
         if message.recipient == request.user:
-            message.is_read = True
-            message.read_at = timezone.now()
-            message.save()
+            now = timezone.now()
+            unread = PrivateMessage.objects.filter(pk=message.pk, is_read=False)
+            with transaction.atomic():
+                # Only the request whose update flips a counted row lowers the counter
+                if unread.filter(is_deleted_by_recipient=False).update(is_read=True, read_at=now):
+                    counters.adjust(request.user.id, messages=-1)
+                else:
+                    unread.update(is_read=True, read_at=now)
             return Response({'message': 'Message marked as read'})
         return Response(
             {'error': 'You can only mark your own received messages as read'}, 
@@ -190,16 +248,21 @@ class PrivateMessageViewSet(viewsets.ModelViewSet):
         """
         message = self.get_object()
         user = request.user
+        rows = PrivateMessage.objects.filter(pk=message.pk)
         
         if message.sender == user:
-            message.is_deleted_by_sender = True
+            rows.update(is_deleted_by_sender=True)
         elif message.recipient == user:
-            message.is_deleted_by_recipient = True
+            with transaction.atomic():
+                # As in mark_read, only the update that hides a counted row lowers the counter
+                if rows.filter(is_read=False, is_deleted_by_recipient=False).update(is_deleted_by_recipient=True):
+                    counters.adjust(user.id, messages=-1)
+                else:
+                    rows.update(is_deleted_by_recipient=True)
         else:
             return Response(
                 {'error': 'You can only delete your own messages'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        message.save()
         return Response({'message': 'Message deleted'})
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Keyset (cursor) pagination helpers shared across apps
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def cursor_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    """Encode a tuple of ordering values into an opaque URL-safe cursor"""
+    payload = [cursor_value(value) for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+
+    if not isinstance(payload, list):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for value in payload:
+        if isinstance(value, str):
+            parsed = parse_datetime(value)
+            values.append(parsed if parsed is not None else value)
+        else:
+            values.append(value)
+    return values
+
+
+def keyset_filter(ordering, values, nullable=()):
+    """
+    Build the Q object selecting rows strictly after the given position
+
+    Args:
+        ordering: Ordering fields, e.g. ('-created_at', '-id')
+        values: Values of those fields for the last row already returned
+        nullable: Ordering fields that can be NULL; these must be ordered
+            with NULLs last ascending and first descending (see
+            order_expressions), as PostgreSQL does by default
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        if value is None:
+            # NULLs sort after every value ascending, before every value descending
+            after = Q(**{f'{name}__isnull': False}) if descending else None
+        else:
+            after = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if name in nullable and not descending:
+                after |= Q(**{f'{name}__isnull': True})
+        if after is not None:
+            condition |= equal & after
+        equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+    return condition
+
+
+def order_expressions(ordering, nullable=()):
+    """order_by() arguments for ordering, with the NULL placement keyset_filter expects"""
+    expressions = []
+    for field in ordering:
+        name = field.lstrip('-')
+        if name not in nullable:
+            expressions.append(field)
+        elif field.startswith('-'):
+            expressions.append(F(name).desc(nulls_first=True))
+        else:
+            expressions.append(F(name).asc(nulls_last=True))
+    return expressions
+
+
+def ordering_value(row, field):
+    """Value of an ordering field (possibly spanning relations) on a model instance or values() dict"""
+    name = field.lstrip('-')
+    if isinstance(row, dict):
+        return row[name]
+    for part in name.split('__'):
+        row = getattr(row, part)
+        if row is None:
+            break
+    return row
+
+
+def parse_since(value):
+    """
+    Parse a since= query param (ISO 8601 datetime) for incremental sync
+
+    Raises:
+        ValueError: If the value is not a datetime
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError('since must be an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def paginate_keyset(queryset, cursor=None, limit=50, ordering=('-created_at', '-id')):
+    """
+    Return one page of rows and the cursor for the next page
+
+    The queryset must be ordered by a unique key; the final ordering field
+    should be the primary key so that ties are broken deterministically.
+    Rows may be model instances or values() dicts.
+
+    Returns:
+        tuple: (list of rows, next cursor or None)
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor)))
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([ordering_value(last, field) for field in ordering])
+    return rows, next_cursor
+
+
+def nullable_fields(model, ordering):
+    """Ordering fields whose value can be NULL (nullable columns or nullable joins)"""
+    nullable = set()
+    for field in ordering:
+        name = field.lstrip('-')
+        opts = model._meta
+        for part in name.split('__'):
+            try:
+                model_field = opts.get_field(part)
+            except Exception:
+                # Annotations; treat as NOT NULL
+                break
+            if getattr(model_field, 'null', False):
+                nullable.add(name)
+                break
+            if model_field.is_relation and model_field.related_model is not None:
+                opts = model_field.related_model._meta
+    return nullable
+
+
+def table_estimate(model, using='default'):
+    """
+    Row count of a model's table from PostgreSQL planner statistics
+
+    Partitioned tables are summed over their partitions. Returns None on
+    other backends and for tables that have never been analyzed.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind, reltuples FROM pg_class WHERE oid = %s::regclass "
+            "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+            [table, table],
+        )
+        rows = [(kind, tuples) for kind, tuples in cursor.fetchall() if kind != 'p']
+    if not rows or any(tuples < 0 for _, tuples in rows):
+        return None
+    return int(sum(tuples for _, tuples in rows))
+
+
+def plan_estimate(queryset):
+    """Row count of a queryset as estimated by the PostgreSQL planner, or None"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on the view's ordering, with an estimated total
+
+    Pages are selected with a WHERE on the ordering values of the last row
+    seen instead of an OFFSET, so every page costs the same. The ordering
+    (from ?ordering= or the view's default) gets the primary key appended
+    as a tie-breaker. The total is an estimate unless ?count=exact is
+    given:
+
+    - unfiltered querysets: planner statistics for the table
+      (pg_class.reltuples), or a cached COUNT(*) when there are none
+    - filtered querysets: the planner's row estimate for the query
+
+    Estimates below PAGINATION_EXACT_COUNT_THRESHOLD are replaced with an
+    exact count, which is cheap at that size.
+
+    Query params: limit, cursor, count (exact)
+    """
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE') or 20
+        try:
+            return min(max(int(request.query_params.get(self.page_size_query_param, default)), 1), self.max_page_size)
+        except ValueError:
+            return default
+
+    def get_ordering(self, queryset, view):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str) and field != '?']
+        if not ordering:
+            ordering = list(getattr(view, 'ordering', None) or queryset.model._meta.ordering or [])
+        pk = queryset.model._meta.pk.name
+        if not ordering or ordering[-1].lstrip('-') not in (pk, 'pk'):
+            ordering.append(f"{'-' if ordering and ordering[-1].startswith('-') else ''}{pk}")
+        return [f"{'-' if field.startswith('-') else ''}{pk}" if field.lstrip('-') == 'pk' else field for field in ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_page_size(request)
+        ordering = self.get_ordering(queryset, view)
+        nullable = nullable_fields(queryset.model, ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        backwards = False
+        page = queryset
+        if cursor:
+            try:
+                direction, *values = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound('Invalid cursor')
+            if direction not in ('next', 'previous') or len(values) != len(ordering):
+                raise NotFound('Invalid cursor')
+            backwards = direction == 'previous'
+            if backwards:
+                ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+            page = page.filter(keyset_filter(ordering, values, nullable))
+
+        rows = list(page.order_by(*order_expressions(ordering, nullable))[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if more or backwards:
+                self.next_cursor = encode_cursor(['next', *(ordering_value(rows[-1], field) for field in ordering)])
+            if cursor and (more or not backwards):
+                self.previous_cursor = encode_cursor(['previous', *(ordering_value(rows[0], field) for field in ordering)])
+
+        self.count, self.count_is_estimate = self.get_count(queryset, request)
+        return rows
+
+    def get_count(self, queryset, request):
+        """
+        Returns:
+            tuple: (count, whether it is an estimate)
+        """
+        if request.query_params.get(self.count_query_param) == 'exact':
+            return queryset.count(), False
+
+        if not queryset.query.where:
+            estimate = table_estimate(queryset.model, queryset.db)
+            if estimate is None:
+                key = f'pagination-count:{queryset.db}:{queryset.model._meta.label}'
+                estimate = cache.get(key)
+                if estimate is None:
+                    count = queryset.count()
+                    cache.set(key, count, getattr(settings, 'PAGINATION_COUNT_CACHE_TTL', 60))
+                    return count, False
+        else:
+            estimate = plan_estimate(queryset)
+            if estimate is None:
+                return queryset.count(), False
+
+        if estimate < getattr(settings, 'PAGINATION_EXACT_COUNT_THRESHOLD', 10000):
+            return queryset.count(), False
+        return estimate, True
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
+            'next': self.get_link(self.next_cursor),
+            'previous': self.get_link(self.previous_cursor),
+            'results': data,
+        })
@@ -0,0 +1,27 @@
+"""
+Per-thread switch for the per-row delete receivers shared across apps
+
+Bulk deletes that do the receivers' bookkeeping themselves, once per batch
+(admin_panel.user_actions.delete_users), run the delete inside suspended()
+so every collected row does not also cost the receivers' own queries.
+Only the current thread is affected; receivers check receivers_suspended()
+and return early.
+"""
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+def receivers_suspended():
+    return getattr(_state, 'suspended', False)
+
+
+@contextmanager
+def suspended():
+    previous = receivers_suspended()
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
@@ -190,6 +190,13 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Large admin list views (users, system logs, enrollments, submissions) use
+# core.pagination.KeysetPagination: totals are planner estimates unless
+# ?count=exact, except below this many rows where an exact count is cheap
+PAGINATION_EXACT_COUNT_THRESHOLD = config('PAGINATION_EXACT_COUNT_THRESHOLD', default=10000, cast=int)
+# Seconds an unfiltered COUNT(*) is cached when the database has no planner statistics
+PAGINATION_COUNT_CACHE_TTL = config('PAGINATION_COUNT_CACHE_TTL', default=60, cast=int)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://127.0.0.1:3000').split(',')
 
@@ -242,6 +249,14 @@ EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='webmaster@localhost')
+# Bulk mail (admin_panel.mailer): messages per SMTP connection, messages per
+# second (0 for no limit), retries for a failed batch and the first retry
+# delay in seconds (doubled for each further retry)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=100, cast=int)
+EMAIL_RATE_LIMIT = config('EMAIL_RATE_LIMIT', default=0, cast=float)
+EMAIL_MAX_RETRIES = config('EMAIL_MAX_RETRIES', default=3, cast=int)
+EMAIL_RETRY_BACKOFF = config('EMAIL_RETRY_BACKOFF', default=2.0, cast=float)
 
 # Supabase Configuration
 SUPABASE_URL = 'https://cweioqxunsoopnvfbrhq.supabase.co'
@@ -252,6 +267,107 @@ SUPABASE_SERVICE_ROLE_KEY = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdX
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
+# Files that must never be served (log archives, backups, uploaded imports,
+# notification archives); keep this outside MEDIA_ROOT and STATIC_ROOT
+PRIVATE_ROOT = Path(config('PRIVATE_ROOT', default=str(BASE_DIR / 'private')))
+
+# System Log Writer
+# SystemLog entries are buffered in memory and written in batches from a
+# background thread; set SYSTEM_LOG_ASYNC=False to write synchronously
+SYSTEM_LOG_ASYNC = config('SYSTEM_LOG_ASYNC', default=True, cast=bool)
+SYSTEM_LOG_BUFFER_SIZE = config('SYSTEM_LOG_BUFFER_SIZE', default=10000, cast=int)
+SYSTEM_LOG_BATCH_SIZE = config('SYSTEM_LOG_BATCH_SIZE', default=500, cast=int)
+SYSTEM_LOG_FLUSH_INTERVAL = config('SYSTEM_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+
+# System Log Retention
+# On PostgreSQL the SystemLog table is range-partitioned by created_at ('day'
+# or 'month'); rotate_system_logs archives periods older than the retention
+# window to gzip NDJSON under SYSTEM_LOG_ARCHIVE_ROOT and drops them
+SYSTEM_LOG_PARTITION_INTERVAL = config('SYSTEM_LOG_PARTITION_INTERVAL', default='month')
+SYSTEM_LOG_RETENTION_DAYS = config('SYSTEM_LOG_RETENTION_DAYS', default=90, cast=int)
+SYSTEM_LOG_ARCHIVE_ROOT = PRIVATE_ROOT / 'system_logs'
+
+# Seconds between checks of the SystemSettings version counter by each
+# process's in-memory settings cache
+SYSTEM_SETTINGS_CHECK_INTERVAL = config('SYSTEM_SETTINGS_CHECK_INTERVAL', default=1.0, cast=float)
+
+# System backups
+# Queued backups are written by `manage.py run_backups` (run it from cron or
+# as a long-running worker with --loop). Each backup is a directory of gzip
+# NDJSON chunks per model plus a tar.gz of MEDIA_ROOT for file backups.
+# Backups hold password hashes and tokens, so they live under PRIVATE_ROOT.
+SYSTEM_BACKUP_ROOT = PRIVATE_ROOT / 'backups'
+SYSTEM_BACKUP_CHUNK_ROWS = config('SYSTEM_BACKUP_CHUNK_ROWS', default=100000, cast=int)
+SYSTEM_BACKUP_COMPRESSLEVEL = config('SYSTEM_BACKUP_COMPRESSLEVEL', default=6, cast=int)
+# Run queued backups on a background thread of the web process instead of the worker
+SYSTEM_BACKUP_RUN_IN_PROCESS = config('SYSTEM_BACKUP_RUN_IN_PROCESS', default=False, cast=bool)
+# INCREMENTAL backups export rows whose updated_at is newer than the previous
+# database backup's watermark (minus this overlap, in seconds) plus tombstones
+# for deleted rows; tombstones are pruned after this many days
+SYSTEM_BACKUP_WATERMARK_OVERLAP = config('SYSTEM_BACKUP_WATERMARK_OVERLAP', default=300, cast=int)
+SYSTEM_BACKUP_TOMBSTONE_RETENTION_DAYS = config('SYSTEM_BACKUP_TOMBSTONE_RETENTION_DAYS', default=35, cast=int)
+
+# System announcements
+# Queued announcements are fanned out into notifications by
+# `manage.py send_announcements` (from cron or with --loop), once scheduled_at
+# has passed; notifications are created this many at a time
+SYSTEM_ANNOUNCEMENT_CHUNK_SIZE = config('SYSTEM_ANNOUNCEMENT_CHUNK_SIZE', default=2000, cast=int)
+# Seconds a SENDING announcement may go without progress before the queue
+# takes it over from a worker that died (deliveries resume where they stopped)
+SYSTEM_ANNOUNCEMENT_STALE_AFTER = config('SYSTEM_ANNOUNCEMENT_STALE_AFTER', default=600, cast=int)
+# Deliver due announcements on a background thread of the web process instead of the worker
+SYSTEM_ANNOUNCEMENT_RUN_IN_PROCESS = config('SYSTEM_ANNOUNCEMENT_RUN_IN_PROCESS', default=False, cast=bool)
+
+# Bulk user import
+# Uploads are stored under SYSTEM_USER_IMPORT_ROOT and imported by
+# `manage.py run_user_imports` (from cron or with --loop); rows are validated
+# and inserted SYSTEM_USER_IMPORT_CHUNK_SIZE per transaction
+SYSTEM_USER_IMPORT_ROOT = PRIVATE_ROOT / 'imports'
+SYSTEM_USER_IMPORT_CHUNK_SIZE = config('SYSTEM_USER_IMPORT_CHUNK_SIZE', default=2000, cast=int)
+# Run queued imports on a background thread of the web process instead of the worker
+SYSTEM_USER_IMPORT_RUN_IN_PROCESS = config('SYSTEM_USER_IMPORT_RUN_IN_PROCESS', default=False, cast=bool)
+# A running import whose last committed chunk is older than this many seconds
+# is taken over by the next worker and resumed after its last committed row
+SYSTEM_USER_IMPORT_STALE_AFTER = config('SYSTEM_USER_IMPORT_STALE_AFTER', default=300, cast=int)
+# Rows fetched per server-side cursor round trip by the streaming user export
+SYSTEM_USER_EXPORT_CHUNK_SIZE = config('SYSTEM_USER_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Selected users handled per transaction by the admin bulk activate/deactivate/delete
+SYSTEM_USER_BULK_CHUNK_SIZE = config('SYSTEM_USER_BULK_CHUNK_SIZE', default=1000, cast=int)
+
+# Admin search
+# Seconds between checks of the search index versions by each process's
+# in-memory typeahead index (GET /api/v1/admin/search/suggest/)
+SEARCH_TYPEAHEAD_CHECK_INTERVAL = config('SEARCH_TYPEAHEAD_CHECK_INTERVAL', default=1.0, cast=float)
+# GET /api/v1/admin/search/ returns up to this many results per entity type,
+# searching the entity types on this many threads (1 to search them in turn;
+# each thread keeps its own database connection)
+SEARCH_RESULTS_PER_TYPE = config('SEARCH_RESULTS_PER_TYPE', default=5, cast=int)
+SEARCH_FANOUT_WORKERS = config('SEARCH_FANOUT_WORKERS', default=4, cast=int)
+# Each process caches search and suggestion results per query and
+# permission set (LRU of this many entries, each kept at most SEARCH_CACHE_TTL
+# seconds); entries of an entity type are dropped once its search index
+# version moves, which is checked every SEARCH_CACHE_CHECK_INTERVAL seconds
+SEARCH_CACHE_MAX_ENTRIES = config('SEARCH_CACHE_MAX_ENTRIES', default=2000, cast=int)
+SEARCH_CACHE_TTL = config('SEARCH_CACHE_TTL', default=300, cast=int)
+SEARCH_CACHE_CHECK_INTERVAL = config('SEARCH_CACHE_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Notifications
+# sweep_notifications (run it from cron) deletes expired notifications and
+# read ones older than this many days, optionally archiving them as gzip
+# NDJSON under NOTIFICATION_ARCHIVE_ROOT
+NOTIFICATION_READ_RETENTION_DAYS = config('NOTIFICATION_READ_RETENTION_DAYS', default=90, cast=int)
+NOTIFICATION_ARCHIVE_ROOT = PRIVATE_ROOT / 'notifications'
+
+# Notification stream (GET /api/v1/admin/notifications/stream/); only served
+# under ASGI (core.asgi), it answers 501 under WSGI and clients poll instead.
+# Seconds between checks for notifications saved by other processes (0 turns
+# the check off for single-process deployments), between keepalive comments,
+# before the server closes a stream for the client to reconnect, and that
+# clients wait before reconnecting
+NOTIFICATION_STREAM_POLL_INTERVAL = config('NOTIFICATION_STREAM_POLL_INTERVAL', default=5.0, cast=float)
+NOTIFICATION_STREAM_KEEPALIVE = config('NOTIFICATION_STREAM_KEEPALIVE', default=15, cast=int)
+NOTIFICATION_STREAM_MAX_AGE = config('NOTIFICATION_STREAM_MAX_AGE', default=300, cast=int)
+NOTIFICATION_STREAM_RETRY = config('NOTIFICATION_STREAM_RETRY', default=3, cast=int)
 
 # Logging Configuration
 LOGGING = {
@@ -278,6 +394,11 @@ LOGGING = {
             'formatter': 'simple',
             'level': 'INFO',
         },
+        # Records are written to the SystemLog table through the buffered writer
+        'system_log': {
+            'class': 'admin_panel.log_writer.SystemLogHandler',
+            'level': 'ERROR',
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -299,5 +420,11 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': False,
         },
+        # Unhandled exceptions in views (500 responses) also become SystemLog entries
+        'django.request': {
+            'handlers': ['console', 'system_log'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
@@ -6,6 +6,7 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Q
 from rbac.permission_manager import PermissionManager
 from rbac.decorators import require_permissions, require_roles
+from core.pagination import KeysetPagination
 from .models import Course, CourseOffering, Enrollment
 from .serializers import (
     CourseSerializer, CourseDetailSerializer,
@@ -165,6 +166,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     search_fields = ['student__first_name', 'student__last_name', 'course_offering__course__name']
     ordering_fields = ['enrollment_date', 'status', 'grade']
     ordering = ['-enrollment_date']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
@@ -17,7 +17,7 @@ interface AdminHeaderProps {
 export default function AdminHeader({ onMenuClick, user }: AdminHeaderProps) {
   const { logout } = useAuth();
   const { notifications, unreadCount, markAsRead, markAllAsRead, deleteNotification } = useNotifications();
-  const { query, results, loading: searchLoading, setQuery, clearResults } = useSearch();
+  const { query, results, suggestions, submitted, loading: searchLoading, setQuery, submit, clearResults } = useSearch();
   
   const [showUserMenu, setShowUserMenu] = useState(false);
   const [showNotifications, setShowNotifications] = useState(false);
@@ -85,14 +85,22 @@ export default function AdminHeader({ onMenuClick, user }: AdminHeaderProps) {
                 <div className="absolute inset-y-0 left-0 pl-3 flex items-center pointer-events-none">
                   <Search className="h-4 w-4 text-gray-400" />
                 </div>
-                <input
-                  type="text"
-                  placeholder="Search users, courses, reports..."
-                  value={query}
-                  onChange={(e) => setQuery(e.target.value)}
-                  onFocus={() => setShowSearch(true)}
-                  className="block w-full pl-10 pr-3 py-2 border border-gray-300 rounded-md leading-5 bg-white placeholder-gray-500 focus:outline-none focus:placeholder-gray-400 focus:ring-1 focus:ring-blue-500 focus:border-blue-500 sm:text-sm"
-                />
+                <form
+                  onSubmit={(e) => {
+                    e.preventDefault();
+                    setShowSearch(true);
+                    submit();
+                  }}
+                >
+                  <input
+                    type="text"
+                    placeholder="Search users, courses, reports..."
+                    value={query}
+                    onChange={(e) => setQuery(e.target.value)}
+                    onFocus={() => setShowSearch(true)}
+                    className="block w-full pl-10 pr-3 py-2 border border-gray-300 rounded-md leading-5 bg-white placeholder-gray-500 focus:outline-none focus:placeholder-gray-400 focus:ring-1 focus:ring-blue-500 focus:border-blue-500 sm:text-sm"
+                  />
+                </form>
                 
                 {/* Search Results Dropdown */}
                 {showSearch && (query || results.length > 0) && (
@@ -130,10 +138,41 @@ export default function AdminHeader({ onMenuClick, user }: AdminHeaderProps) {
                           </Link>
                         ))}
                       </div>
-                    ) : query ? (
+                    ) : suggestions.length > 0 ? (
+                      <div className="py-1">
+                        {suggestions.map((suggestion) => (
+                          <Link
+                            key={`${suggestion.type}-${suggestion.id}`}
+                            href={suggestion.url}
+                            className="flex items-center px-4 py-2 hover:bg-gray-50 transition-colors"
+                            onClick={() => {
+                              setShowSearch(false);
+                              clearResults();
+                            }}
+                          >
+                            <div className="flex-1 min-w-0">
+                              <p className="text-sm text-gray-900 truncate">
+                                {suggestion.label}
+                              </p>
+                              <p className="text-xs text-gray-500 truncate">
+                                {suggestion.detail}
+                              </p>
+                            </div>
+                            <span className="ml-2 text-xs text-gray-400 capitalize">
+                              {suggestion.type}
+                            </span>
+                          </Link>
+                        ))}
+                        <p className="px-4 py-2 text-xs text-gray-400">Press Enter to search everything</p>
+                      </div>
+                    ) : submitted ? (
                       <div className="p-4 text-center text-gray-500">
                         <p className="text-sm">No results found for "{query}"</p>
                       </div>
+                    ) : query ? (
+                      <div className="p-4 text-center text-gray-500">
+                        <p className="text-sm">Press Enter to search for "{query}"</p>
+                      </div>
                     ) : null}
                   </div>
                 )}
@@ -1,9 +1,44 @@
 'use client';
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { apiClient } from '@/lib/api';
 import { Notification } from '@/types/admin';
 
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
+const STREAM_PATH = '/admin/notifications/stream/';
+const MAX_NOTIFICATIONS = 50;
+// Polling interval while the stream is unavailable (e.g. a WSGI deployment)
+const POLL_INTERVAL = 30000;
+
+interface NotificationPage {
+  results: Notification[];
+  next_cursor: string | null;
+}
+
+interface StreamEvent {
+  id?: string;
+  event: string;
+  data: string;
+}
+
+// Split a Server-Sent Events buffer into complete events, returning the
+// unfinished remainder
+function parseEvents(buffer: string): [StreamEvent[], string] {
+  const events: StreamEvent[] = [];
+  const blocks = buffer.split('\n\n');
+  const rest = blocks.pop() ?? '';
+  for (const block of blocks) {
+    const event: StreamEvent = { event: 'message', data: '' };
+    for (const line of block.split('\n')) {
+      if (line.startsWith('id: ')) event.id = line.slice(4);
+      else if (line.startsWith('event: ')) event.event = line.slice(7);
+      else if (line.startsWith('data: ')) event.data += line.slice(6);
+    }
+    if (event.data) events.push(event);
+  }
+  return [events, rest];
+}
+
 interface UseNotificationsReturn {
   notifications: Notification[];
   unreadCount: number;
@@ -17,15 +52,23 @@ interface UseNotificationsReturn {
 
 export function useNotifications(): UseNotificationsReturn {
   const [notifications, setNotifications] = useState<Notification[]>([]);
+  const [unreadCount, setUnreadCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const lastEventIdRef = useRef<string | null>(null);
+  const knownIdsRef = useRef<Set<string>>(new Set());
+  // While the stream is connected and has sent a count it is the source of
+  // truth; otherwise the count is derived from the loaded list
+  const streamCountRef = useRef(false);
   
   const fetchNotifications = useCallback(async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await apiClient.get<Notification[]>('/admin/notifications/');
-      setNotifications(response || []);
+      const response = await apiClient.get<NotificationPage>(`/admin/notifications/?limit=${MAX_NOTIFICATIONS}`);
+      const results = (response?.results || []).map(n => ({ ...n, id: String(n.id) }));
+      setNotifications(results);
+      results.forEach(n => knownIdsRef.current.add(n.id));
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch notifications');
     } finally {
@@ -36,6 +79,8 @@ export function useNotifications(): UseNotificationsReturn {
   const markAsRead = useCallback(async (id: string) => {
     try {
       await apiClient.post(`/admin/notifications/${id}/mark-read/`);
+      // The unread count follows from the stream's unread event, or from
+      // the list when polling
       setNotifications(prev => 
         prev.map(notification => 
           notification.id === id 
@@ -51,6 +96,7 @@ export function useNotifications(): UseNotificationsReturn {
   const markAllAsRead = useCallback(async () => {
     try {
       await apiClient.post('/admin/notifications/mark-all-read/');
+      setUnreadCount(0);
       setNotifications(prev => 
         prev.map(notification => ({ ...notification, is_read: true }))
       );
@@ -76,16 +122,98 @@ export function useNotifications(): UseNotificationsReturn {
     fetchNotifications();
   }, [fetchNotifications]);
 
-  // Set up real-time updates (polling for now, can be upgraded to WebSocket)
   useEffect(() => {
-    const interval = setInterval(() => {
-      fetchNotifications();
-    }, 30000); // Poll every 30 seconds
+    if (!streamCountRef.current) {
+      setUnreadCount(notifications.filter(n => !n.is_read).length);
+    }
+  }, [notifications]);
+
+  // Real-time updates over Server-Sent Events. fetch() is used instead of
+  // EventSource so the auth token can be sent as a header; the server closes
+  // the stream every few minutes and we resume from the last event id.
+  // While the stream is failing, or for good if the server does not stream
+  // (501 under WSGI), the list is polled instead.
+  useEffect(() => {
+    const controller = new AbortController();
+    let retryDelay = 3000;
+    let pollTimer: ReturnType<typeof setInterval> | null = null;
 
-    return () => clearInterval(interval);
-  }, [fetchNotifications]);
+    const startPolling = () => {
+      streamCountRef.current = false;
+      if (pollTimer === null) pollTimer = setInterval(fetchNotifications, POLL_INTERVAL);
+    };
+
+    const stopPolling = () => {
+      if (pollTimer !== null) clearInterval(pollTimer);
+      pollTimer = null;
+    };
+
+    const handleEvent = (event: StreamEvent) => {
+      if (event.id) lastEventIdRef.current = event.id;
+      const data = JSON.parse(event.data);
+      if (event.event === 'notification') {
+        const notification = { ...data, id: String(data.id) } as Notification;
+        if (knownIdsRef.current.has(notification.id)) return;
+        knownIdsRef.current.add(notification.id);
+        setNotifications(prev => [notification, ...prev].slice(0, MAX_NOTIFICATIONS));
+        if (!notification.is_read) setUnreadCount(count => count + 1);
+      } else if (event.event === 'unread') {
+        if (typeof data.count === 'number') {
+          streamCountRef.current = true;
+          setUnreadCount(data.count);
+        } else {
+          setUnreadCount(count => Math.max(0, count + data.delta));
+        }
+      }
+    };
 
-  const unreadCount = notifications.filter(n => !n.is_read).length;
+    const connect = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const token = localStorage.getItem('auth_token');
+          const headers: Record<string, string> = { Accept: 'text/event-stream' };
+          if (token) headers.Authorization = `Token ${token}`;
+          if (lastEventIdRef.current) headers['Last-Event-ID'] = lastEventIdRef.current;
+
+          const response = await fetch(`${API_BASE_URL}${STREAM_PATH}`, {
+            headers,
+            credentials: 'include',
+            signal: controller.signal,
+          });
+          if (response.status === 401 || response.status === 403) return;
+          if (response.status === 404 || response.status === 501) {
+            startPolling();
+            return;
+          }
+          if (!response.ok || !response.body) throw new Error(`Stream failed: ${response.status}`);
+          stopPolling();
+
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+          while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            const [events, rest] = parseEvents(buffer + decoder.decode(value, { stream: true }));
+            buffer = rest;
+            events.forEach(handleEvent);
+          }
+          retryDelay = 3000;
+        } catch (err) {
+          if (controller.signal.aborted) return;
+          startPolling();
+          retryDelay = Math.min(retryDelay * 2, 60000);
+        }
+        await new Promise(resolve => setTimeout(resolve, retryDelay));
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      stopPolling();
+    };
+  }, [fetchNotifications]);
 
   return {
     notifications,
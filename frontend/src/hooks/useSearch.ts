@@ -2,15 +2,18 @@
 
 import { useState, useCallback, useRef, useEffect } from 'react';
 import { apiClient } from '@/lib/api';
-import { SearchResult } from '@/types/admin';
+import { SearchResult, SearchSuggestion } from '@/types/admin';
 
 interface UseSearchReturn {
   query: string;
   results: SearchResult[];
+  suggestions: SearchSuggestion[];
+  submitted: boolean;
   loading: boolean;
   error: string | null;
   setQuery: (query: string) => void;
   search: (query: string) => Promise<void>;
+  submit: () => Promise<void>;
   clearResults: () => void;
   isSearching: boolean;
 }
@@ -18,6 +21,8 @@ interface UseSearchReturn {
 export function useSearch(): UseSearchReturn {
   const [query, setQuery] = useState('');
   const [results, setResults] = useState<SearchResult[]>([]);
+  const [suggestions, setSuggestions] = useState<SearchSuggestion[]>([]);
+  const [submitted, setSubmitted] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [isSearching, setIsSearching] = useState(false);
@@ -47,23 +52,52 @@ export function useSearch(): UseSearchReturn {
     }
   }, []);
 
-  const debouncedSearch = useCallback((searchQuery: string) => {
+  // Suggestions come from the in-memory typeahead index; the full search
+  // only runs on submit
+  const suggest = useCallback(async (searchQuery: string) => {
+    if (!searchQuery.trim()) {
+      setSuggestions([]);
+      return;
+    }
+
+    try {
+      const response = await apiClient.get<SearchSuggestion[]>(`/admin/search/suggest/?q=${encodeURIComponent(searchQuery)}`);
+      setSuggestions(response || []);
+    } catch (err) {
+      setSuggestions([]);
+    }
+  }, []);
+
+  const debouncedSuggest = useCallback((searchQuery: string) => {
     if (debounceTimeoutRef.current) {
       clearTimeout(debounceTimeoutRef.current);
     }
     
     debounceTimeoutRef.current = setTimeout(() => {
-      search(searchQuery);
-    }, 300); // 300ms debounce
-  }, [search]);
+      suggest(searchQuery);
+    }, 100); // 100ms debounce
+  }, [suggest]);
 
   const handleSetQuery = useCallback((newQuery: string) => {
     setQuery(newQuery);
-    debouncedSearch(newQuery);
-  }, [debouncedSearch]);
+    setResults([]);
+    setSubmitted(false);
+    debouncedSuggest(newQuery);
+  }, [debouncedSuggest]);
+
+  const submit = useCallback(async () => {
+    if (debounceTimeoutRef.current) {
+      clearTimeout(debounceTimeoutRef.current);
+    }
+    setSuggestions([]);
+    setSubmitted(true);
+    await search(query);
+  }, [search, query]);
 
   const clearResults = useCallback(() => {
     setResults([]);
+    setSuggestions([]);
+    setSubmitted(false);
     setQuery('');
     setError(null);
   }, []);
@@ -80,10 +114,13 @@ export function useSearch(): UseSearchReturn {
   return {
     query,
     results,
+    suggestions,
+    submitted,
     loading,
     error,
     setQuery: handleSetQuery,
     search,
+    submit,
     clearResults,
     isSearching
   };
@@ -262,6 +262,14 @@ export interface SearchResult {
   metadata?: Record<string, any>;
 }
 
+export interface SearchSuggestion {
+  id: string;
+  type: 'user' | 'course' | 'department' | 'program';
+  label: string;
+  detail: string;
+  url: string;
+}
+
 export interface ApiResponse<T> {
   data: T;
   message?: string;